@@ -6,20 +6,34 @@ Plan/Executor パターンを使用した安全なdotfilesインストーラー
 
 from __future__ import annotations
 
-import argparse
+import os
 import sys
-from pathlib import Path
 
-from scripts.install.pkg.backup_store import BackupManager
-from scripts.install.pkg.logger import ColoredLogger
-from scripts.install.pkg.plan.builder import PlanBuilder
-from scripts.install.pkg.plan.executor import PlanExecutor
-from scripts.install.pkg.rollback_manager import RollbackManager
-from scripts.install.pkg.ui import UserInterface
+# シェルのフックからも呼ばれるため、起動時に読み込むのは os と sys だけにする.
+# argparse や各インストーラーモジュールは必要になった経路で関数内から読み込む.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import argparse
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from scripts.install.pkg.digests import DigestCache
+    from scripts.install.pkg.events import EventWriter
+    from scripts.install.pkg.plan.executor import ExecutionReport
+    from scripts.install.pkg.plan.model import PlanEntry
+    from scripts.install.pkg.retention import RetentionPolicy
+    from scripts.install.pkg.stats import IOStats
+
+REPO_ROOT = os.path.dirname(os.path.realpath(__file__))
 
 
 def create_argument_parser() -> argparse.ArgumentParser:
     """コマンドライン引数パーサーを作成."""
+    import argparse
+    from pathlib import Path
+
+    from scripts.install.pkg.retention import parse_count, parse_size
+
     parser = argparse.ArgumentParser(
         description="Dotfiles installer - source/ ディレクトリを使った安全なインストーラー",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -27,8 +41,28 @@ def create_argument_parser() -> argparse.ArgumentParser:
 使用例:
   %(prog)s                    # インタラクティブモードでインストール
   %(prog)s --dry-run          # 実際の処理を行わずにプレビュー
+  %(prog)s --copy             # リンクの代わりにコピーしてインストール
+  %(prog)s --overlay work     # source/ に source.work/ を重ねてインストール
+  %(prog)s --generations      # 世代を作ってインストール（切り替えは rename 1回）
+  %(prog)s --bundle           # シェルの起動ファイルを読み込み先ごと1ファイルにまとめてリンク
+  %(prog)s --git-index        # git で追跡中のファイルだけをインストール（source/ を走査しない）
+  %(prog)s --switch-generation
+                              # 1つ前の世代に戻す
+  %(prog)s --check            # 前回インストールしたリンクが変わっていないか確認
   %(prog)s --force            # 確認なしでインストール
+  %(prog)s --show-diff        # 確認ごとに既存ファイルとの差分を表示
   %(prog)s --rollback         # 最新のバックアップからロールバック
+  %(prog)s --resume           # 中断されたインストールを再開
+  %(prog)s --save-plan plan.jsonl
+                              # 現在の計画をスナップショットとして保存
+  %(prog)s --diff-plan plan.jsonl ../candidate/source
+                              # 保存した計画と候補の source/ の計画を比較
+  %(prog)s --bake home.tar.gz # 空のホームへのインストール結果を tar として書き出す
+  %(prog)s --daemon &         # 問い合わせ用のデーモンを起動
+  %(prog)s --query managed ~/.zshrc
+                              # デーモンに管理対象かどうかを問い合わせ
+  %(prog)s --gc-rollbacks --keep-last 5
+                              # 古いバックアップを削除（最新5件を保持）
 
 注意:
   - source/ ディレクトリのファイルをホームディレクトリにシンボリックリンク
@@ -51,6 +85,26 @@ def create_argument_parser() -> argparse.ArgumentParser:
         help="確認なしで実行",
     )
 
+    parser.add_argument(
+        "--show-diff",
+        action="store_true",
+        help="確認を求めるときに既存ファイルと source の差分を表示（--dry-run では確認の一覧に表示）",
+    )
+
+    parser.add_argument(
+        "--policy",
+        type=Path,
+        metavar="FILE",
+        help="確認への回答をパスとアクション種別ごとに定義したポリシーファイル (JSON)",
+    )
+
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="前回インストールしたリンクが変わっていないか確認"
+        "（終了コード 0: 変更なし / 1: 変更あり / 3: 記録なし）",
+    )
+
     parser.add_argument(
         "--rollback",
         nargs="?",
@@ -59,6 +113,82 @@ def create_argument_parser() -> argparse.ArgumentParser:
         help="バックアップからロールバック（省略時は最新）",
     )
 
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="中断されたインストールをジャーナルから再開（source/ は再走査しない）",
+    )
+
+    parser.add_argument(
+        "--save-plan",
+        type=Path,
+        metavar="FILE",
+        help="インストール計画をスナップショットとして保存して終了（--diff-plan で比較できる）",
+    )
+
+    parser.add_argument(
+        "--diff-plan",
+        nargs=2,
+        type=Path,
+        metavar=("A", "B"),
+        help="2つの計画の差分を表示（A・B はスナップショットか source ディレクトリ. 差分があれば終了コード 1）",
+    )
+
+    parser.add_argument(
+        "--bake",
+        metavar="OUT.tar",
+        help="空のホームへのインストール結果を tar に書き出して終了（実際のファイルは変更しない. "
+        "'-' は標準出力. .gz / .bz2 / .xz で圧縮. リンク先は source/ の絶対パス）",
+    )
+
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="計画をメモリに保持し、Unix ソケットで問い合わせに答える常駐プロセスとして起動",
+    )
+
+    parser.add_argument(
+        "--query",
+        nargs="+",
+        metavar=("OP", "PATH"),
+        help="起動中のデーモンに問い合わせて JSON で表示（OP: managed PATH / drift / status）",
+    )
+
+    parser.add_argument(
+        "--gc-rollbacks",
+        action="store_true",
+        help="保持ポリシーに従って古いバックアップを削除（ポリシー未指定時は最新10件を保持）",
+    )
+
+    retention = parser.add_argument_group(
+        "バックアップ保持ポリシー",
+        "指定するとインストール成功後にも古いバックアップを削除します",
+    )
+    retention.add_argument(
+        "--keep-last",
+        type=parse_count,
+        metavar="N",
+        help="最新 N 件を保持",
+    )
+    retention.add_argument(
+        "--keep-daily",
+        type=parse_count,
+        metavar="N",
+        help="直近 N 日分、各日の最新を保持",
+    )
+    retention.add_argument(
+        "--keep-weekly",
+        type=parse_count,
+        metavar="N",
+        help="直近 N 週分、各週の最新を保持",
+    )
+    retention.add_argument(
+        "--max-rollback-size",
+        type=parse_size,
+        metavar="SIZE",
+        help="バックアップ合計サイズの上限（例: 500M, 2G）",
+    )
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -66,6 +196,95 @@ def create_argument_parser() -> argparse.ArgumentParser:
         help="詳細なログを出力",
     )
 
+    parser.add_argument(
+        "--log-file",
+        type=Path,
+        metavar="FILE",
+        help="ログをファイルにも出力（バックグラウンドでまとめて書き込み）",
+    )
+
+    parser.add_argument(
+        "--events",
+        metavar="FILE|-",
+        help="計画・実行結果を JSON Lines で出力（'-' は標準出力. その場合の通常出力は標準エラーへ）",
+    )
+
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        default=30.0,
+        metavar="SECONDS",
+        help="同じインストール先を他プロセスが使用中の場合に待機する秒数（デフォルト: 30）",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="フェーズごとのファイルシステム操作（stat / lstat / readlink / mkdir / symlink / コピーなど）の"
+        "回数とバイト数を標準エラーに表示",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="エントリごとの出力を省略し、進捗表示とサマリーのみ表示（警告・エラーは表示）",
+    )
+
+    parser.add_argument(
+        "--copy",
+        action="store_true",
+        help="シンボリックリンクの代わりにファイルをコピーしてインストール（内容が同じものは書き換えない）",
+    )
+
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="シェルの起動ファイル（.bashrc / .zshrc など）が source で読み込む管理下のファイルを"
+        "展開したバンドルを生成し、それにリンクする",
+    )
+
+    parser.add_argument(
+        "--git-index",
+        action="store_true",
+        help="source/ を走査せず、git のインデックスから追跡中のファイルだけを列挙する"
+        "（git 管理外のレイヤーは従来どおり走査）",
+    )
+
+    parser.add_argument(
+        "--no-tool-links",
+        action="store_true",
+        help="~/tools のプログラムへのリンクを ~/bin に張らない（リンク先のない ~/bin のリンクも削除しない）",
+    )
+
+    parser.add_argument(
+        "--generations",
+        action="store_true",
+        help="リンクファームを新しい世代として作り、各ファイルを世代の current 経由でリンクする",
+    )
+
+    parser.add_argument(
+        "--switch-generation",
+        nargs="?",
+        const="previous",
+        metavar="N",
+        help="世代 N に切り替える（省略時は1つ前の世代. 管理するファイル数によらず rename 1回）",
+    )
+
+    parser.add_argument(
+        "--list-generations",
+        action="store_true",
+        help="世代の一覧を表示",
+    )
+
+    parser.add_argument(
+        "--overlay",
+        action="append",
+        metavar="NAME",
+        help="source/ に source.NAME/ をレイヤーとして重ねる（複数指定可. 後のものが優先）. "
+        "source.<ホスト名>/ があれば最後に自動で重ねる",
+    )
+
     parser.add_argument(
         "--source-dir",
         type=Path,
@@ -83,18 +302,299 @@ def create_argument_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def main() -> int:
+def retention_policy_from_args(args: argparse.Namespace) -> RetentionPolicy:
+    """コマンドライン引数から保持ポリシーを組み立てる."""
+    from scripts.install.pkg.retention import RetentionPolicy
+
+    return RetentionPolicy(
+        keep_last=args.keep_last,
+        keep_daily=args.keep_daily,
+        keep_weekly=args.keep_weekly,
+        max_total_bytes=args.max_rollback_size,
+    )
+
+
+def collect_rollbacks(
+    rollbacks_dir: Path,
+    policy: RetentionPolicy,
+    *,
+    dry_run: bool,
+    state_root: Path,
+    lock_timeout: float,
+) -> None:
+    """保持ポリシーを適用して結果を表示.
+
+    state_root の下の中断されたインストールが --resume で使うアーカイブは削除しない。
+    """
+    from scripts.install.pkg.retention import RollbackGarbageCollector
+
+    collector = RollbackGarbageCollector(
+        rollbacks_root=rollbacks_dir, state_root=state_root, lock_timeout=lock_timeout
+    )
+    report = collector.collect(policy, dry_run=dry_run)
+
+    prefix = "[DRY-RUN] " if dry_run else ""
+    if not report.removed:
+        print(f"{prefix}削除対象のバックアップはありません（保持: {len(report.kept)}件）")
+        return
+    print(f"{prefix}削除するバックアップ:")
+    for info in report.removed:
+        print(f"  - {info.path.name} ({info.size} bytes)")
+    print(
+        f"{prefix}削除: {len(report.removed)}件 / 保持: {len(report.kept)}件 / "
+        f"解放: {report.freed_bytes} bytes"
+    )
+
+
+def run_phase(events: EventWriter | None, name: str, func, stats: IOStats | None = None):
+    """イベント出力が有効ならフェーズの開始・終了を記録しながら func を実行.
+
+    stats を渡すと、func の中のファイルシステム操作を name のフェーズとして数える。
+    """
+    from contextlib import nullcontext
+
+    counting = stats.phase(name) if stats is not None else nullcontext()
+    if events is None:
+        with counting:
+            return func()
+    from scripts.install.pkg.bake import BakeReport
+    from scripts.install.pkg.plan.builder import LayerIndex
+    from scripts.install.pkg.plan.executor import ExecutionReport
+    from scripts.install.pkg.plan.model import Plan
+
+    with events.phase(name) as extra:
+        with counting as counter:
+            result = func()
+        if counter:
+            extra.update(io=dict(counter))
+        if isinstance(result, ExecutionReport):
+            extra.update(applied=result.applied, skipped=result.skipped, errors=result.errors)
+        elif isinstance(result, Plan):
+            extra.update(entries=len(result.entries))
+        elif isinstance(result, LayerIndex):
+            extra.update(
+                paths=len(result.entries),
+                shadowed=len(result.shadowed),
+                conflicts=len(result.conflicts),
+            )
+        elif isinstance(result, BakeReport):
+            extra.update(
+                directories=result.directories,
+                links=result.links,
+                files=result.files,
+                bytes=result.bytes,
+                errors=len(result.errors),
+            )
+        return result
+
+
+def plan_entries_for(target: Path, dest_dir: Path) -> Iterable[PlanEntry]:
+    """--diff-plan の入力（スナップショットか source ディレクトリ）から昇順のエントリ列を返す."""
+    from scripts.install.pkg.plan.builder import PlanBuilder
+    from scripts.install.pkg.plan.diff import sorted_entries
+    from scripts.install.pkg.plan.snapshot import is_snapshot, iter_snapshot
+
+    if is_snapshot(target):
+        return iter_snapshot(target)
+    if target.is_dir():
+        return sorted_entries(PlanBuilder(source_dir=target, dest_dir=dest_dir).build().entries)
+    raise ValueError(f"スナップショットでも source ディレクトリでもありません: {target}")
+
+
+def diff_plan_targets(before: Path, after: Path, dest_dir: Path) -> int:
+    """2つの計画の差分を表示し、差分があれば 1 を返す."""
+    from scripts.install.pkg.plan.diff import ChangeKind, diff_plans
+
+    counts = dict.fromkeys(ChangeKind, 0)
+    changes = diff_plans(plan_entries_for(before, dest_dir), plan_entries_for(after, dest_dir))
+    for change in changes:
+        counts[change.kind] += 1
+        print(change.describe())
+    print(
+        f"追加: {counts[ChangeKind.ADDED]}件 / 削除: {counts[ChangeKind.REMOVED]}件 / "
+        f"変更: {counts[ChangeKind.CHANGED]}件"
+    )
+    return 1 if any(counts.values()) else 0
+
+
+def print_execution_report(report: ExecutionReport) -> bool:
+    """実行結果を表示し、エラーがなければ True を返す."""
+    print()
+    print("=" * 60)
+    print("インストール完了")
+    print("=" * 60)
+    print(f"適用: {report.applied}件")
+    print(f"スキップ: {report.skipped}件")
+    if report.errors > 0:
+        print(f"エラー: {report.errors}件")
+        return False
+    return True
+
+
+def parse_check_args(argv: list[str]) -> dict[str, str] | None:
+    """--check と --dest-dir だけの呼び出しなら、そのオプションを返す.
+
+    シェルのフックから呼ばれる典型的な形だけを手で解析し、argparse の読み込みを省く.
+    それ以外の引数が含まれる場合は None を返し、通常の引数解析に任せる.
+    """
+    if "--check" not in argv:
+        return None
+    options: dict[str, str] = {}
+    args = iter(argv)
+    for arg in args:
+        if arg == "--check":
+            continue
+        name, sep, value = arg.partition("=")
+        if name != "--dest-dir":
+            return None
+        if not sep:
+            value = next(args, "")
+        if not value:
+            return None
+        options[name] = value
+    return options
+
+
+def run_check(dest_dir: str | None) -> int:
+    """前回のインストールで張ったリンクが変わっていないか確認する.
+
+    終了コードは 0 (変更なし) / 1 (変更あり) / 3 (記録がなく不明).
+    source/ は走査せず、記録したリンクを readlink で比べるだけにする.
+    """
+    from scripts.install.pkg.manifest import (
+        CHECK_CONVERGED,
+        CHECK_DRIFTED,
+        CHECK_UNKNOWN,
+        MANIFEST_NAME,
+        find_drift,
+        load_manifest,
+    )
+    from scripts.install.pkg.state import state_dir_name, state_root
+
+    dest = dest_dir or os.path.expanduser("~")
+    links = load_manifest(os.path.join(state_root(REPO_ROOT), state_dir_name(dest), MANIFEST_NAME))
+    if links is None:
+        print(f"インストールの記録がありません: {dest}", file=sys.stderr)
+        return CHECK_UNKNOWN
+
+    drifted = find_drift(links)
+    if not drifted:
+        return CHECK_CONVERGED
+    print(
+        f"dotfiles のリンクが前回のインストールから変わっています（{len(drifted)}件）:",
+        file=sys.stderr,
+    )
+    for path in drifted:
+        print(f"  - {path}", file=sys.stderr)
+    print("install.py を実行すると元に戻せます", file=sys.stderr)
+    return CHECK_DRIFTED
+
+
+def main(argv: list[str] | None = None) -> int:
     """メイン処理."""
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # 変更のないホストでの --check は、重いモジュールを読み込まずに終える
+    check_options = parse_check_args(argv)
+    if check_options is not None:
+        return run_check(check_options.get("--dest-dir"))
+    return run_cli(argv)
+
+
+def run_cli(argv: list[str]) -> int:
+    """通常の引数解析を行い、各モードを実行する."""
+    from contextlib import suppress
+    from pathlib import Path
+
+    from scripts.install.pkg.backup_store import BackupManager, list_archives
+    from scripts.install.pkg.bundle import BUNDLE_CACHE_NAME, BUNDLE_DIR_NAME, ShellBundler
+    from scripts.install.pkg.digests import DigestCache, digest_cache_path
+    from scripts.install.pkg.events import EventWriter
+    from scripts.install.pkg.fs import FileSystem, PosixFS
+    from scripts.install.pkg.generations import (
+        DEFAULT_KEEP,
+        GENERATIONS_DIR_NAME,
+        GenerationStore,
+    )
+    from scripts.install.pkg.gitindex import GitIndexEnumerator
+    from scripts.install.pkg.locking import DestinationLock, LockTimeoutError, RollbacksLock
+    from scripts.install.pkg.logger import ColoredLogger
+    from scripts.install.pkg.manifest import (
+        MANIFEST_NAME,
+        links_from_entries,
+        load_manifest,
+        remove_manifest,
+        write_manifest,
+    )
+    from scripts.install.pkg.plan.builder import PlanBuilder, overlay_dirs
+    from scripts.install.pkg.plan.executor import PlanExecutor
+    from scripts.install.pkg.plan.journal import JOURNAL_NAME, InstallJournal
+    from scripts.install.pkg.policy import Answer, AnswerPolicy
+    from scripts.install.pkg.preview import DiffPreviewer
+    from scripts.install.pkg.progress import ProgressRenderer
+    from scripts.install.pkg.retention import RetentionPolicy
+    from scripts.install.pkg.rollback_manager import RollbackManager
+    from scripts.install.pkg.state import state_dir_for
+    from scripts.install.pkg.stats import CountingFS, IOStats
+    from scripts.install.pkg.templates import (
+        GENERATED_DIR_NAME,
+        RENDER_CACHE_NAME,
+        VARS_FILE_NAME,
+        TemplateRenderer,
+        host_variables,
+    )
+    from scripts.install.pkg.toolbin import ToolLinker
+    from scripts.install.pkg.ui import UserInterface
+
+    lock: DestinationLock | None = None
+    logger: ColoredLogger | None = None
+    events: EventWriter | None = None
+    stats: IOStats | None = None
+    digests: DigestCache | None = None
     try:
         # 引数解析
         parser = create_argument_parser()
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
+
+        if args.check:
+            return run_check(str(args.dest_dir) if args.dest_dir else None)
+
+        if args.bake == "-" and args.events == "-":
+            print(
+                "エラー: --bake - と --events - はどちらも標準出力を使うため同時に指定できません",
+                file=sys.stderr,
+            )
+            return 2
+
+        # イベント出力（標準出力に流す場合、人間向けの出力は標準エラーへ逃がす）
+        if args.events:
+            events = EventWriter.open(args.events)
+            if args.events == "-":
+                sys.stdout = sys.stderr
 
         # ディレクトリ設定
-        repo_root = Path(__file__).resolve().parent
+        repo_root = Path(REPO_ROOT)
         source_dir = args.source_dir if args.source_dir else repo_root / "source"
         dest_dir = args.dest_dir if args.dest_dir else Path.home()
         rollbacks_dir = repo_root / "rollbacks"
+        # ダイジェストのキャッシュは内容を比べるまで読まない（GC や問い合わせでは触れない）
+        digests = DigestCache.open(digest_cache_path(rollbacks_dir))
+        state_dir = state_dir_for(repo_root, dest_dir)
+        journal_path = state_dir / JOURNAL_NAME
+        manifest_path = state_dir / MANIFEST_NAME
+        generations = GenerationStore(state_dir / GENERATIONS_DIR_NAME)
+
+        # 内容の比較は rollbacks/ の隣のダイジェストキャッシュを使う.
+        # --stats のときだけファイルシステム操作を数える（指定しなければ包まない）
+        fs: FileSystem = PosixFS(digests)
+        if args.stats:
+            stats = IOStats()
+            fs = CountingFS(fs, stats)
+
+        if args.generations and args.copy:
+            print("エラー: --generations と --copy は同時に指定できません", file=sys.stderr)
+            return 2
 
         # source/ が存在しない場合はエラー
         if not source_dir.exists():
@@ -104,19 +604,269 @@ def main() -> int:
             )
             return 1
 
+        # source/ に重ねるレイヤー（source.<名前>/ と source.<ホスト名>/）
+        overlays = overlay_dirs(source_dir, args.overlay or [])
+        missing = [layer for layer in overlays if not layer.is_dir()]
+        if missing:
+            print(f"エラー: レイヤーのディレクトリが見つかりません: {missing[0]}")
+            return 1
+        if overlays:
+            print(f"レイヤー: {' → '.join(p.name for p in [source_dir, *overlays])}")
+
+        # *.tmpl を生成するレンダラー（生成物とキャッシュはインストール先ごとの状態ディレクトリへ）
+        renderer = TemplateRenderer(
+            generated_dir=state_dir / GENERATED_DIR_NAME,
+            variables=host_variables(repo_root / VARS_FILE_NAME),
+            cache_path=state_dir / RENDER_CACHE_NAME,
+        )
+        # --bundle でシェルの起動ファイルを1ファイルにまとめるバンドラー（生成物は同じく状態ディレクトリへ）
+        bundler = ShellBundler(
+            layers=[source_dir, *overlays],
+            generated_dir=state_dir / BUNDLE_DIR_NAME,
+            cache_path=state_dir / BUNDLE_CACHE_NAME,
+        )
+        # ~/tools のプログラムを ~/bin にリンクする（--no-tool-links で無効）
+        tool_linker = None if args.no_tool_links else ToolLinker(dest_dir)
+        # --git-index では source/ を走査せず、git のインデックスから追跡中のファイルを列挙する
+        git_index = GitIndexEnumerator() if args.git_index else None
+
         # UI・ログ設定
-        ui = UserInterface()
-        logger = ColoredLogger(name="dotfiles_installer")
+        ui = UserInterface(force_mode=args.force)
+        answer_policy = AnswerPolicy.load(args.policy) if args.policy else None
+        # --force またはポリシー指定時は全体の確認・選択プロンプトを出さない
+        unattended = args.force or answer_policy is not None
+        logger = ColoredLogger(name="dotfiles_installer", log_file=args.log_file, use_queue=True)
         if args.verbose:
             import logging
 
             logger.set_level(logging.DEBUG)
 
+        # 同じインストール先への同時実行を防ぐロック（変更を伴う処理の直前に取得）
+        lock = DestinationLock(
+            dest_root=dest_dir,
+            timeout=args.lock_timeout,
+            on_wait=lambda: print(f"他のインストール処理の終了を待機中: {dest_dir}"),
+        )
+
+        # バックアップ GC モード
+        if args.gc_rollbacks:
+            policy = retention_policy_from_args(args)
+            if policy.is_empty():
+                policy = RetentionPolicy(keep_last=10)
+            collect_rollbacks(
+                rollbacks_dir,
+                policy,
+                dry_run=args.dry_run,
+                state_root=state_dir.parent,
+                lock_timeout=args.lock_timeout,
+            )
+            return 0
+
+        # 世代の一覧・切り替えモード
+        if args.list_generations:
+            current = generations.current()
+            numbers = generations.list()
+            if not numbers:
+                print("世代はまだありません")
+            for number in numbers:
+                print(f"{'*' if number == current else ' '} {number}")
+            return 0
+
+        if args.switch_generation is not None:
+            if args.switch_generation == "previous":
+                target = generations.previous()
+                if target is None:
+                    print("エラー: 1つ前の世代がありません", file=sys.stderr)
+                    return 1
+            else:
+                try:
+                    target = int(args.switch_generation)
+                except ValueError:
+                    print(
+                        f"エラー: 世代の番号が不正です: {args.switch_generation}", file=sys.stderr
+                    )
+                    return 2
+            if args.dry_run:
+                print(f"[DRY-RUN] 世代 {generations.current()} → {target} に切り替える予定")
+                return 0
+            lock.acquire()
+            try:
+                generations.activate(target)
+            except ValueError as e:
+                print(f"エラー: {e}", file=sys.stderr)
+                return 1
+            logger.success(f"世代 {target} に切り替えました")
+            return 0
+
+        # 計画の比較・保存モード
+        if args.diff_plan:
+            try:
+                return diff_plan_targets(*args.diff_plan, dest_dir)
+            except ValueError as e:
+                print(f"エラー: {e}", file=sys.stderr)
+                return 2
+
+        if args.save_plan:
+            from scripts.install.pkg.plan.snapshot import write_snapshot
+
+            builder = PlanBuilder(
+                source_dir=source_dir,
+                dest_dir=dest_dir,
+                overlays=overlays,
+                renderer=renderer,
+                bundler=bundler if args.bundle else None,
+                tool_linker=tool_linker,
+                git_index=git_index,
+                copy_mode=args.copy,
+                fs=fs,
+            )
+            plan = run_phase(events, "plan", builder.build, stats)
+            write_snapshot(args.save_plan, plan.entries, source=str(source_dir), dest=str(dest_dir))
+            print(f"計画を保存しました: {args.save_plan}（{len(plan.entries)}件）")
+            return 0
+
+        # 空のホームへのインストール結果を tar に書き出すモード
+        if args.bake:
+            from scripts.install.pkg.bake import Baker, open_bake_output
+
+            builder = PlanBuilder(
+                source_dir=source_dir,
+                dest_dir=dest_dir,
+                overlays=overlays,
+                renderer=renderer,
+                bundler=bundler if args.bundle else None,
+                git_index=git_index,
+                copy_mode=args.copy,
+                assume_empty=True,
+                fs=fs,
+            )
+            index = run_phase(events, "scan", builder.build_index, stats)
+            plan = run_phase(events, "plan", lambda: builder.build(index), stats)
+            tar = open_bake_output(args.bake)
+            if args.bake == "-":
+                # tar を標準出力に流すので、人間向けの出力は標準エラーへ逃がす
+                sys.stdout = sys.stderr
+            with tar:
+                baker = Baker(
+                    tar,
+                    index,
+                    renderer=renderer,
+                    bundler=bundler if args.bundle else None,
+                    copy_mode=args.copy,
+                )
+                report = run_phase(events, "bake", lambda: baker.bake(plan.entries), stats)
+            for error in report.errors:
+                print(f"エラー: {error}", file=sys.stderr)
+            print(
+                f"書き出しました: {args.bake}（ディレクトリ {report.directories}件 / "
+                f"リンク {report.links}件 / ファイル {report.files}件, {report.bytes} bytes）"
+            )
+            return 1 if report.errors else 0
+
+        # デーモンへの問い合わせ
+        if args.query:
+            import json
+
+            from scripts.install.pkg.daemon import DAEMON_SOCKET_NAME, query
+
+            op, *operands = args.query
+            request = {"op": op, **({"path": operands[0]} if operands else {})}
+            try:
+                response = query(state_dir / DAEMON_SOCKET_NAME, request)
+            except OSError as error:
+                print(f"エラー: デーモンに接続できません: {error}", file=sys.stderr)
+                return 1
+            print(json.dumps(response, ensure_ascii=False, indent=2))
+            return 0 if response.get("ok") else 1
+
+        # デーモンモード
+        if args.daemon:
+            import signal
+
+            from scripts.install.pkg.daemon import (
+                DAEMON_SOCKET_NAME,
+                DaemonAlreadyRunningError,
+                PlanDaemon,
+            )
+
+            daemon = PlanDaemon(
+                source_dir=source_dir,
+                dest_dir=dest_dir,
+                overlays=overlays,
+                renderer=renderer,
+                bundler=bundler if args.bundle else None,
+                tool_linker=tool_linker,
+                git_index=git_index,
+                copy_mode=args.copy,
+                socket_path=state_dir / DAEMON_SOCKET_NAME,
+            )
+            # SIGTERM でも Ctrl-C と同じようにソケットを片付けて終了する
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            print(f"デーモンを起動します: {daemon.socket_path}")
+            try:
+                daemon.serve_forever()
+            except DaemonAlreadyRunningError as e:
+                print(f"エラー: {e}", file=sys.stderr)
+                return 1
+            except KeyboardInterrupt:
+                print("デーモンを停止しました")
+            return 0
+
+        # 中断されたインストールの再開モード
+        if args.resume:
+            state = InstallJournal.load(journal_path)
+            if state is None or state.finished:
+                print("再開できる中断されたインストールはありません")
+                return 0
+
+            pending = state.pending()
+            print(f"中断されたインストールを再開します（残り {len(pending)} 件）")
+            if args.dry_run:
+                for _, entry in pending:
+                    print(f"  - {entry.describe()}")
+                print("\n[DRY-RUN] 実際の処理は行われません")
+                return 0
+
+            lock.acquire()
+            backup_manager = BackupManager(
+                rollbacks_root=rollbacks_dir,
+                fs=fs,
+                lock=RollbacksLock(rollbacks_dir, timeout=args.lock_timeout),
+                digests=digests,
+            )
+            executor = PlanExecutor(
+                ui=ui,
+                logger=logger,
+                backup_manager=backup_manager,
+                journal=InstallJournal.reopen(journal_path),
+                events=events,
+                progress=ProgressRenderer() if args.quiet else None,
+                policy=answer_policy,
+                renderer=renderer,
+                bundler=bundler if state.header.get("bundle", False) else None,
+                copy_mode=state.header.get("copy", False),
+                generations=generations if state.header.get("generations", False) else None,
+                fs=fs,
+            )
+            report = run_phase(events, "resume", lambda: executor.resume(state), stats)
+            if stats is not None:
+                # 中断前の実行が書き込んだ分は除き、今回の書き込みだけを数える
+                written = backup_manager.bytes_written - backup_manager.resumed_bytes
+                stats.counts["resume"]["backup_bytes"] += written
+            if not print_execution_report(report):
+                return 1
+            # 前回の記録に、再開したインストールで張ったリンクを加える
+            links = load_manifest(manifest_path) or {}
+            links.update(links_from_entries(state.intents.values()))
+            write_manifest(manifest_path, links)
+            logger.success("✨ 中断されたインストールを完了しました")
+            return 0
+
         # ロールバックモード
         if args.rollback is not None:
             if args.rollback == "latest":
                 # 利用可能なバックアップを一覧表示
-                archives = sorted(rollbacks_dir.glob("*"), reverse=True)
+                archives = list_archives(rollbacks_dir)
                 if not archives:
                     print("エラー: 利用可能なバックアップが見つかりません")
                     return 1
@@ -131,8 +881,8 @@ def main() -> int:
                         print(f"  {i}. {archive.name}")
                     print()
 
-                    if args.force:
-                        # --force の場合は最新を自動選択
+                    if unattended:
+                        # --force / --policy の場合は最新を自動選択
                         archive_path = archives[0]
                         print(f"最新のバックアップを選択: {archive_path.name}")
                     else:
@@ -163,7 +913,9 @@ def main() -> int:
             # dry-run モード
             if args.dry_run:
                 print(f"\n[DRY-RUN] {archive_path.name} から復元される予定のファイル:")
-                rollback_manager = RollbackManager(target_root=dest_dir, ui=ui)
+                rollback_manager = RollbackManager(
+                    target_root=dest_dir, ui=ui, policy=answer_policy, fs=fs
+                )
                 for entry, info in rollback_manager._iter_backup_entries(archive_path):
                     file_type = "symlink" if info == "symlink" else "file"
                     current_file = dest_dir / entry
@@ -186,21 +938,54 @@ def main() -> int:
                 print("\n[DRY-RUN] 実際の処理は行われません")
                 return 0
 
-            if not args.force and not ui.confirm(
+            if not unattended and not ui.confirm(
                 f"{archive_path.name} からロールバックしますか？", default_yes=False
             ):
                 print("キャンセルされました")
                 return 0
 
-            rollback_manager = RollbackManager(target_root=dest_dir, ui=ui)
-            rollback_manager.restore_archive(archive_path, restore_all=args.force)
+            lock.acquire()
+            rollback_manager = RollbackManager(
+                target_root=dest_dir, ui=ui, policy=answer_policy, fs=fs
+            )
+            run_phase(
+                events,
+                "rollback",
+                lambda: rollback_manager.restore_archive(archive_path, restore_all=args.force),
+                stats,
+            )
+            # 復元でリンクが置き換わるため、インストールの記録は無効になる
+            remove_manifest(manifest_path)
             logger.success("ロールバック完了")
             return 0
 
-        # Plan 生成
+        # Plan 生成（計画と実行の間に他プロセスが割り込まないよう先にロックする）
+        if not args.dry_run:
+            lock.acquire()
         logger.info("インストール計画を生成中...")
-        builder = PlanBuilder(source_dir=source_dir, dest_dir=dest_dir)
-        plan = builder.build()
+        builder = PlanBuilder(
+            source_dir=source_dir,
+            dest_dir=dest_dir,
+            overlays=overlays,
+            renderer=renderer,
+            bundler=bundler if args.bundle else None,
+            tool_linker=tool_linker,
+            git_index=git_index,
+            copy_mode=args.copy,
+            link_root=generations.current_path if args.generations else None,
+            fs=fs,
+        )
+        index = run_phase(events, "scan", builder.build_index, stats)
+        plan = run_phase(events, "plan", lambda: builder.build(index), stats)
+        if events is not None:
+            for entry in plan.entries:
+                events.plan_entry(entry)
+
+        if journal_path.exists():
+            logger.warning(
+                "前回のインストールが中断されています（--resume で再開できます）。"
+                "このまま実行すると新しい計画で上書きされます"
+            )
 
         # サマリー表示
         print()
@@ -212,12 +997,40 @@ def main() -> int:
             print(line)
         print()
 
+        # レイヤーで上書きされるファイルを表示
+        if index.shadowed:
+            print(f"レイヤーで上書きされるファイル: {len(index.shadowed)}件")
+            for relative, layers in sorted(index.shadowed.items()):
+                print(f"  - {relative}: {' → '.join(index.layer_name(n) for n in layers)}")
+            print()
+
         # 確認が必要なエントリを表示
-        confirmations = list(plan.iter_confirmations())
+        confirmations = [
+            (
+                entry,
+                answer_policy.decide(entry.spec.relative_path, entry.action.name)
+                if answer_policy is not None
+                else Answer.ASK,
+            )
+            for entry in plan.iter_confirmations()
+        ]
+        asking = [entry for entry, answer in confirmations if answer is Answer.ASK]
         if confirmations:
             print("⚠️  以下のファイルは確認が必要です:")
-            for entry in confirmations:
-                print(f"  - {entry.spec.relative_path}: {entry.message}")
+            # ドライランでは確認を求めないので、差分はこの一覧に表示する
+            listing_diff = args.show_diff and args.dry_run
+            # 生成予定のテンプレートとバンドルは、まだ書かれていないのでメモリ上で展開して比べる
+            with DiffPreviewer(
+                asking if listing_diff else [],
+                renders=plan.entries,
+                renderer=renderer,
+                bundler=bundler if args.bundle else None,
+            ) as previewer:
+                for entry, answer in confirmations:
+                    suffix = "" if answer is Answer.ASK else f" → ポリシー: {answer.value}"
+                    print(f"  - {entry.spec.relative_path}: {entry.message}{suffix}")
+                    if listing_diff and answer is Answer.ASK:
+                        print(previewer.preview(entry))
             print()
 
         if summary.total == 0:
@@ -230,31 +1043,86 @@ def main() -> int:
             return 0
 
         # 実行確認
-        if not args.force and not ui.confirm(
+        if not unattended and not ui.confirm(
             f"{summary.total}個のファイルをインストールしますか？", default_yes=True
         ):
             print("キャンセルされました")
             return 0
 
         # 実行
-        backup_manager = BackupManager(rollbacks_root=rollbacks_dir)
-        executor = PlanExecutor(ui=ui, logger=logger, backup_manager=backup_manager)
+        # rollbacks/ はインストール先によらず共有なので、アーカイブの作成は GC とロックで直列化する
+        backup_manager = BackupManager(
+            rollbacks_root=rollbacks_dir,
+            fs=fs,
+            lock=RollbacksLock(rollbacks_dir, timeout=args.lock_timeout),
+            digests=digests,
+        )
+        journal = InstallJournal.create(
+            journal_path,
+            {
+                "source": str(source_dir),
+                "dest": str(dest_dir),
+                "copy": args.copy,
+                "generations": args.generations,
+                "bundle": args.bundle,
+            },
+        )
+        previewer = (
+            DiffPreviewer(
+                asking,
+                renders=plan.entries,
+                renderer=renderer,
+                bundler=bundler if args.bundle else None,
+            )
+            if args.show_diff and not args.force
+            else None
+        )
+        executor = PlanExecutor(
+            ui=ui,
+            logger=logger,
+            backup_manager=backup_manager,
+            journal=journal,
+            events=events,
+            progress=ProgressRenderer() if args.quiet else None,
+            policy=answer_policy,
+            renderer=renderer,
+            bundler=bundler if args.bundle else None,
+            copy_mode=args.copy,
+            generations=generations if args.generations else None,
+            fs=fs,
+            previewer=previewer,
+        )
 
         print()
         print("=" * 60)
         print("インストール実行中...")
         print("=" * 60)
-        report = executor.execute(plan, dry_run=False)
+        try:
+            report = run_phase(
+                events, "execute", lambda: executor.execute(plan, dry_run=False), stats
+            )
+        finally:
+            if previewer is not None:
+                previewer.close()
+        if stats is not None:
+            stats.counts["execute"]["backup_bytes"] += backup_manager.bytes_written
 
-        print()
-        print("=" * 60)
-        print("インストール完了")
-        print("=" * 60)
-        print(f"適用: {report.applied}件")
-        print(f"スキップ: {report.skipped}件")
-        if report.errors > 0:
-            print(f"エラー: {report.errors}件")
+        if not print_execution_report(report):
             return 1
+        write_manifest(manifest_path, links_from_entries(plan.entries))
+        if args.generations:
+            generations.prune(DEFAULT_KEEP)
+
+        policy = retention_policy_from_args(args)
+        if not policy.is_empty():
+            print()
+            collect_rollbacks(
+                rollbacks_dir,
+                policy,
+                dry_run=False,
+                state_root=state_dir.parent,
+                lock_timeout=args.lock_timeout,
+            )
 
         logger.success("✨ インストールが完了しました")
         return 0
@@ -262,12 +1130,33 @@ def main() -> int:
     except KeyboardInterrupt:
         print("\n\n操作がキャンセルされました")
         return 130
+    except LockTimeoutError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 75
     except Exception as e:
         print(f"\n予期しないエラー: {e}", file=sys.stderr)
         import traceback
 
         traceback.print_exc()
         return 1
+    finally:
+        # 共有のキャッシュなので、rollbacks/ のロックを取って保存する（ドライランでは書かない）
+        if digests is not None and not args.dry_run:
+            with (
+                suppress(LockTimeoutError),
+                RollbacksLock(rollbacks_dir, timeout=args.lock_timeout),
+            ):
+                digests.save()
+        if stats is not None:
+            print("\nファイルシステム操作:", file=sys.stderr)
+            for line in stats.format_lines():
+                print(line, file=sys.stderr)
+        if events is not None:
+            events.close()
+        if lock is not None:
+            lock.release()
+        if logger is not None:
+            logger.close()
 
 
 if __name__ == "__main__":
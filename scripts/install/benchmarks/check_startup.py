@@ -0,0 +1,114 @@
+"""install.py --check の import 時間の計測.
+
+実行: python3 -m scripts.install.benchmarks.check_startup [-n 回数] [--budget マイクロ秒]
+
+一時ディレクトリにインストール済みの状態（リンクとその記録）を作り、
+`python -X importtime install.py --check` を繰り返し起動する。インタープリター自体の
+起動で読み込むモジュールを除いた import 時間の合計を集計し、最小値が --budget を
+超えていれば終了コード 1 を返す。壁時計の計測なので、負荷の高いマシンではぶれる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from ..pkg.manifest import MANIFEST_NAME, links_from_entries, write_manifest
+from ..pkg.plan.builder import PlanBuilder
+from ..pkg.state import STATE_ROOT_ENV, state_dir_name
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+INSTALL_PY = REPO_ROOT / "install.py"
+
+# インタープリター自体の起動を除いた、--check が読み込むモジュールの import 時間の上限
+IMPORT_BUDGET_US = 15_000
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """-X importtime の出力を (モジュール名, インデント, 累積マイクロ秒) のリストにする."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(cumulative_us)))
+    return imports
+
+
+def prepare(root: Path) -> Path:
+    """root の下にインストール済みのホームと状態を作り、ホームのパスを返す."""
+    source = root / "source"
+    dest = root / "dest"
+    source.mkdir()
+    dest.mkdir()
+    for name in (".bashrc", ".vimrc", ".zshrc"):
+        (source / name).write_text(f"# {name}\n")
+        (dest / name).symlink_to((source / name).resolve())
+    plan = PlanBuilder(source_dir=source, dest_dir=dest).build()
+    write_manifest(
+        root / "state" / state_dir_name(dest) / MANIFEST_NAME, links_from_entries(plan.entries)
+    )
+    return dest
+
+
+def measure(dest: Path, env: dict[str, str]) -> int:
+    """--check を1回起動し、起動時に読み込む分を除いた import 時間（マイクロ秒）を返す."""
+    baseline = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True
+    )
+    preloaded = {name for name, _, _ in parse_importtime(baseline.stderr)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(INSTALL_PY), "--check", "--dest-dir", str(dest)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=REPO_ROOT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"--check が失敗しました（終了コード {result.returncode}）")
+    return sum(
+        cumulative
+        for name, depth, cumulative in parse_importtime(result.stderr)
+        if depth == 0 and name not in preloaded
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="install.py --check の import 時間を計測する")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="起動回数（デフォルト: 5）")
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=IMPORT_BUDGET_US,
+        help=f"最小値の上限（マイクロ秒. デフォルト: {IMPORT_BUDGET_US}）",
+    )
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs は 1 以上を指定してください")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        dest = prepare(root)
+        env = {
+            **os.environ,
+            "PYTHONDONTWRITEBYTECODE": "1",
+            STATE_ROOT_ENV: str(root / "state"),
+        }
+        costs = [measure(dest, env) for _ in range(args.runs)]
+
+    best = min(costs)
+    print(f"install.py --check の import 時間（{args.runs}回, µs）")
+    print(f"  最小 {best:>8} / 最大 {max(costs):>8} / 予算 {args.budget:>8}")
+    if best >= args.budget:
+        print("予算を超えています", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""ColoredLogger のオーバーヘッド計測.
+
+実行: python3 -m scripts.install.benchmarks.logger_overhead [件数]
+
+1エントリ1行のログを想定し、同期書き込み（毎回 flush）とキュー経由の
+バッチ書き込みで1件あたりの呼び出しコストを比較する。
+コンソール出力は /dev/null に捨てる。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ..pkg.logger import ColoredLogger
+
+
+def measure(
+    count: int, *, log_file: Path | None, use_queue: bool, method: str
+) -> tuple[float, float]:
+    """count 回ログを出したときの1件あたりの時間（マイクロ秒）を返す.
+
+    (呼び出し側がブロックされた時間, ファイルへの書き込み完了までの時間) の組。
+    """
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        logger = ColoredLogger(
+            name=f"bench_{method}_{use_queue}", log_file=log_file, use_queue=use_queue
+        )
+        log = getattr(logger, method)
+        start = time.perf_counter()
+        for i in range(count):
+            log(f"適用: .config/app/file{i}.conf")
+        caller = time.perf_counter() - start
+        # キューに残っている分を書き終えるまで
+        logger.flush()
+        total = time.perf_counter() - start
+        logger.close()
+    return caller / count * 1e6, total / count * 1e6
+
+
+def main() -> int:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"ColoredLogger オーバーヘッド（{count}件, 1件あたり µs: 呼び出し側 / 書き込み完了）")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = Path(tmp) / "bench.log"
+        cases = [
+            ("console のみ / info", None, False, "info"),
+            ("console のみ / success", None, False, "success"),
+            ("console + file 同期 / info", log_file, False, "info"),
+            ("console + file キュー / info", log_file, True, "info"),
+            ("console + file キュー / success", log_file, True, "success"),
+        ]
+        for label, path, use_queue, method in cases:
+            caller, total = measure(count, log_file=path, use_queue=use_queue, method=method)
+            print(f"  {label:<32} {caller:8.2f} / {total:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""インストールした設定でのシェル起動時間の計測.
+
+実行: python3 -m scripts.install.benchmarks.shell_startup [-n 回数] [--shell bash] [--xtrace]
+
+一時ディレクトリを HOME として source/ をインストールし、その中で `<shell> -i -c exit` を
+繰り返し起動して起動時間の分布を表示する。設定ファイルを読まない起動
+（bash --norc / zsh -f）も同じ回数計測し、設定による増分がわかるようにする。
+
+--xtrace を指定すると xtrace 付きで1回起動し、各行のタイムスタンプの差から
+読み込んだファイルごと・行ごとの所要時間を集計する。
+
+結果は state/bench/shell-startup.jsonl（DOTFILES_STATE_DIR があればその下の bench/）に追記し、
+前回（同じホスト・シェル）の中央値より --max-regression を超えて遅くなっていれば終了コード 1 を返す。
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from ..pkg.backup_store import BackupManager
+from ..pkg.logger import ColoredLogger
+from ..pkg.plan.builder import PlanBuilder, overlay_dirs
+from ..pkg.plan.executor import PlanExecutor
+from ..pkg.state import state_root
+from ..pkg.templates import (
+    GENERATED_DIR_NAME,
+    RENDER_CACHE_NAME,
+    VARS_FILE_NAME,
+    TemplateRenderer,
+    host_variables,
+)
+from ..pkg.ui import UserInterface
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+RESULTS_PATH = Path(state_root(REPO_ROOT)) / "bench" / "shell-startup.jsonl"
+
+SHELLS = ("bash", "zsh")
+# 設定ファイルを読まない起動の引数
+BARE_ARGS = {"bash": ["--norc", "--noprofile"], "zsh": ["-f"]}
+
+# xtrace の各行の先頭（タイムスタンプ, ファイル, 行番号）
+BASH_PS4 = "+${EPOCHREALTIME} ${BASH_SOURCE[0]:-?}:${LINENO} "
+ZSH_PS4 = "+%D{%s.%6.} %x:%I> "
+XTRACE_LINE = re.compile(r"^\++(\d+(?:\.\d+)?) (.+?):(\d+)>? (.*)$")
+
+
+def install_home(source_dir: Path, sandbox: Path) -> Path:
+    """sandbox/home に source/ をインストールしてそのパスを返す（実際のホームには触れない）."""
+
+    home = sandbox / "home"
+    state = sandbox / "state"
+    home.mkdir()
+    variables = host_variables(REPO_ROOT / VARS_FILE_NAME)
+    variables["HOME"] = str(home)
+    renderer = TemplateRenderer(
+        generated_dir=state / GENERATED_DIR_NAME,
+        variables=variables,
+        cache_path=state / RENDER_CACHE_NAME,
+    )
+    builder = PlanBuilder(
+        source_dir=source_dir,
+        dest_dir=home,
+        overlays=overlay_dirs(source_dir, []),
+        renderer=renderer,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        logger = ColoredLogger(name="bench_shell_startup")
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=logger,
+            backup_manager=BackupManager(rollbacks_root=state / "rollbacks"),
+            renderer=renderer,
+        )
+        report = executor.execute(builder.build(), dry_run=False)
+        logger.close()
+    if report.errors:
+        raise RuntimeError(f"一時ホームへのインストールに失敗しました（{report.errors}件）")
+    return home
+
+
+def sandbox_env(home: Path, shell: str) -> dict[str, str]:
+    """一時ホームで起動するための最小限の環境変数."""
+
+    env = {
+        "HOME": str(home),
+        "PATH": os.environ.get("PATH", os.defpath),
+        "SHELL": shell,
+        "TERM": os.environ.get("TERM", "xterm-256color"),
+        "LANG": os.environ.get("LANG", "C.UTF-8"),
+    }
+    for name in ("USER", "LOGNAME"):
+        if name in os.environ:
+            env[name] = os.environ[name]
+    return env
+
+
+def time_runs(command: list[str], env: dict[str, str], cwd: Path, runs: int) -> list[float]:
+    """command を runs 回起動し、それぞれの所要時間（ミリ秒）を返す."""
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            command,
+            env=env,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """起動時間の分布（ミリ秒）."""
+
+    ordered = sorted(samples)
+    p90 = ordered[min(len(ordered) - 1, round(0.9 * (len(ordered) - 1)))]
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p90": p90,
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def format_summary(summary: dict[str, float]) -> str:
+    return " ".join(f"{key}={value:.1f}" for key, value in summary.items())
+
+
+def trace_startup(shell: str, name: str, home: Path, sandbox: Path) -> list[str]:
+    """xtrace 付きで1回起動し、トレースの行を返す.
+
+    PS4 は環境変数からは読まない（root の bash など）ことがあるため、計測用の起動ファイルで
+    設定してから本来の設定を読み込む。
+    """
+
+    wrapper = sandbox / "xtrace"
+    wrapper.mkdir(exist_ok=True)
+    env = sandbox_env(home, shell)
+    if name == "bash":
+        rcfile = wrapper / "bashrc"
+        rcfile.write_text(f"PS4='{BASH_PS4}'\nset -x\n. \"$HOME/.bashrc\"\n")
+        command = [shell, "--rcfile", str(rcfile), "-i", "-c", "exit"]
+    else:
+        # .zshenv で ZDOTDIR を戻すと、以降の .zshrc などは $HOME から読まれる
+        (wrapper / ".zshenv").write_text(
+            f"PS4='{ZSH_PS4}'\nsetopt xtrace\nZDOTDIR=\"$HOME\"\n"
+            '[[ -f "$HOME/.zshenv" ]] && source "$HOME/.zshenv"\n'
+        )
+        env["ZDOTDIR"] = str(wrapper)
+        command = [shell, "-i", "-c", "exit"]
+    result = subprocess.run(
+        command,
+        env=env,
+        cwd=home,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    return result.stderr.decode("utf-8", errors="replace").splitlines()
+
+
+def attribute(lines: list[str]) -> tuple[dict[str, float], dict[tuple[str, int, str], float]]:
+    """トレースの行から、ファイルごと・行ごとの所要時間（ミリ秒）を集計する.
+
+    各行の時間は次のトレース行までの時間とする（外部コマンドの実行時間はその行に入る）。
+    """
+
+    events = []
+    for line in lines:
+        match = XTRACE_LINE.match(line)
+        if match:
+            timestamp, path, lineno, command = match.groups()
+            events.append((float(timestamp), path, int(lineno), command))
+
+    by_file: dict[str, float] = defaultdict(float)
+    by_line: dict[tuple[str, int, str], float] = defaultdict(float)
+    for (timestamp, path, lineno, command), following in zip(events, events[1:]):
+        elapsed = (following[0] - timestamp) * 1000
+        by_file[path] += elapsed
+        by_line[(path, lineno, command)] += elapsed
+    return by_file, by_line
+
+
+def display_path(path: str, home: Path, sandbox: Path) -> str:
+    if path.startswith(f"{home}/"):
+        return "~/" + path[len(str(home)) + 1 :]
+    if path.startswith(f"{sandbox}/xtrace/"):
+        return "(計測用の起動ファイル)"
+    return path
+
+
+def print_attribution(lines: list[str], home: Path, sandbox: Path, top: int) -> None:
+    by_file, by_line = attribute(lines)
+    if not by_file:
+        print("    xtrace の出力を解析できませんでした")
+        return
+    print("    ファイルごと (ms):")
+    for path, elapsed in sorted(by_file.items(), key=lambda item: -item[1])[:top]:
+        print(f"      {elapsed:8.1f}  {display_path(path, home, sandbox)}")
+    print("    行ごと (ms):")
+    slowest = sorted(by_line.items(), key=lambda item: -item[1])[:top]
+    for (path, lineno, command), elapsed in slowest:
+        location = f"{display_path(path, home, sandbox)}:{lineno}"
+        print(f"      {elapsed:8.1f}  {location}  {command[:60]}")
+
+
+def shell_version(shell: str) -> str:
+    result = subprocess.run(
+        [shell, "--version"], capture_output=True, text=True, check=False, stdin=subprocess.DEVNULL
+    )
+    return result.stdout.splitlines()[0] if result.stdout else ""
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(
+        ["git", "-C", str(REPO_ROOT), "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def previous_result(results_path: Path, host: str, shell: str) -> dict | None:
+    """同じホスト・シェルの直近の記録."""
+
+    try:
+        lines = results_path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("host") == host and record.get("shell") == shell:
+            return record
+    return None
+
+
+def append_result(results_path: Path, record: dict) -> None:
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with results_path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="インストールした設定でのシェル起動時間を計測")
+    parser.add_argument("-n", "--runs", type=int, default=20, help="計測する回数（デフォルト: 20）")
+    parser.add_argument(
+        "--warmup", type=int, default=2, help="計測前の空回しの回数（デフォルト: 2）"
+    )
+    parser.add_argument(
+        "--shell",
+        action="append",
+        choices=SHELLS,
+        help="計測するシェル（複数指定可. デフォルト: インストールされているもの全て）",
+    )
+    parser.add_argument(
+        "--source-dir", type=Path, default=REPO_ROOT / "source", help="インストールする source/"
+    )
+    parser.add_argument(
+        "--xtrace", action="store_true", help="xtrace でファイルごと・行ごとの所要時間を表示"
+    )
+    parser.add_argument("--top", type=int, default=10, help="--xtrace で表示する件数")
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=RESULTS_PATH,
+        help=f"結果を追記する JSON Lines（デフォルト: {RESULTS_PATH}）",
+    )
+    parser.add_argument("--no-save", action="store_true", help="結果を記録しない")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20.0,
+        metavar="PERCENT",
+        help="前回の中央値からこの割合を超えて遅くなったら終了コード 1（デフォルト: 20）",
+    )
+    args = parser.parse_args(argv)
+    if args.runs < 1:
+        parser.error("--runs は1以上を指定してください")
+
+    shells = [(name, shutil.which(name)) for name in (args.shell or SHELLS)]
+    shells = [(name, path) for name, path in shells if path is not None]
+    if not shells:
+        print("計測できるシェルが見つかりません", file=sys.stderr)
+        return 2
+
+    host = platform.node()
+    commit = git_commit()
+    regressed = False
+    with tempfile.TemporaryDirectory(prefix="shell-startup-") as tmp:
+        sandbox = Path(tmp)
+        home = install_home(args.source_dir, sandbox)
+        print(f"シェル起動時間（{args.runs}回, ms. HOME={home}）")
+        for name, shell in shells:
+            env = sandbox_env(home, shell)
+            command = [shell, "-i", "-c", "exit"]
+            bare = [shell, *BARE_ARGS[name], "-i", "-c", "exit"]
+            time_runs(command, env, home, args.warmup)
+            config = summarize(time_runs(command, env, home, args.runs))
+            baseline = summarize(time_runs(bare, env, home, args.runs))
+
+            version = shell_version(shell)
+            print(f"  {name} ({version})")
+            print(f"    設定あり: {format_summary(config)}")
+            print(f"    設定なし: {format_summary(baseline)}")
+            print(f"    設定による増分（中央値）: {config['median'] - baseline['median']:.1f}")
+
+            previous = previous_result(args.results, host, name)
+            if previous is not None:
+                change = (config["median"] / previous["config"]["median"] - 1) * 100
+                print(
+                    f"    前回（{previous['time']}, {previous.get('commit') or '-'}）比: "
+                    f"{change:+.1f}%"
+                )
+                if change > args.max_regression:
+                    print(f"    ⚠️  {args.max_regression:.0f}% を超えて遅くなっています")
+                    regressed = True
+
+            if args.xtrace:
+                print_attribution(
+                    trace_startup(shell, name, home, sandbox), home, sandbox, args.top
+                )
+
+            if not args.no_save:
+                append_result(
+                    args.results,
+                    {
+                        "time": datetime.now().isoformat(timespec="seconds"),
+                        "host": host,
+                        "commit": commit,
+                        "shell": name,
+                        "version": version,
+                        "runs": args.runs,
+                        "config": config,
+                        "bare": baseline,
+                    },
+                )
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,45 +2,232 @@
 
 from __future__ import annotations
 
-import shutil
-from dataclasses import dataclass
+import json
+import os
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 
+from .fs import FileSystem, PosixFS
+from .locking import RollbacksLock
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .digests import DigestCache
+
+# アーカイブサイズのキャッシュ. rollbacks/ の隣に <rollbacks>.sizes.json として置く
+SIZE_INDEX_SUFFIX = ".sizes.json"
+
+
+def new_archive_id() -> str:
+    """時刻順に並び、プロセス間で衝突しないアーカイブ名を生成する."""
+
+    now = datetime.now()
+    return f"{now:%Y%m%d_%H%M%S}_{now:%f}_{os.getpid()}"
+
+
+def list_archives(rollbacks_root: Path) -> list[Path]:
+    """rollbacks/ 内のアーカイブを新しい順に返す.
+
+    ドットで始まるエントリ（GC 途中のゴミ箱など）は除外する。
+    """
+
+    if not rollbacks_root.is_dir():
+        return []
+    archives = [
+        Path(entry.path)
+        for entry in os.scandir(rollbacks_root)
+        if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False)
+    ]
+    return sorted(archives, key=lambda p: p.name, reverse=True)
+
+
+def measure_tree(root: Path, fs: FileSystem | None = None) -> int:
+    """ディレクトリ配下の合計バイト数を数える（symlink は辿らない）."""
+
+    fs = fs if fs is not None else PosixFS()
+    total = 0
+    stack = [root]
+    while stack:
+        for entry in fs.scandir(stack.pop()):
+            if entry.is_dir and not entry.is_symlink:
+                stack.append(entry.path)
+            else:
+                total += fs.size(entry.path)
+    return total
+
+
+@dataclass
+class ArchiveSizeIndex:
+    """アーカイブ名 → 合計バイト数 のキャッシュ.
+
+    毎回 du 相当の再帰走査をしないよう、BackupManager が書き込み時に
+    サイズを記録し、GC はこの値を参照する。
+    """
+
+    rollbacks_root: Path
+    sizes: dict[str, int] = field(default_factory=dict)
+    fs: FileSystem = field(default_factory=PosixFS)
+
+    @property
+    def path(self) -> Path:
+        return self.rollbacks_root.with_name(self.rollbacks_root.name + SIZE_INDEX_SUFFIX)
+
+    @classmethod
+    def load(cls, rollbacks_root: Path, fs: FileSystem | None = None) -> ArchiveSizeIndex:
+        index = cls(rollbacks_root=rollbacks_root, fs=fs if fs is not None else PosixFS())
+        try:
+            data = json.loads(index.fs.read_text(index.path))
+        except (OSError, ValueError):
+            return index
+        if isinstance(data, dict):
+            index.sizes = {str(k): int(v) for k, v in data.items()}
+        return index
+
+    def size_of(self, archive: Path) -> int:
+        """キャッシュ済みならその値を、未登録なら一度だけ計測して登録する."""
+
+        size = self.sizes.get(archive.name)
+        if size is None:
+            size = measure_tree(archive, self.fs)
+            self.sizes[archive.name] = size
+        return size
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        self.fs.write_text(tmp, json.dumps(self.sizes, sort_keys=True))
+        self.fs.replace(tmp, self.path)
+
 
 @dataclass
 class BackupManager:
-    """1回のインストール実行で生成するバックアップを管理."""
+    """1回のインストール実行で生成するバックアップを管理.
+
+    lock を渡すと、アーカイブの作成とサイズの記録をそのロックを取って行い、
+    他のインストールの GC と競合しないようにする（install.py は常に渡す）。
+    digests を渡すと、直前のアーカイブに同じ内容のバックアップがあるファイルはコピーせず
+    ハードリンクにする（毎回同じ ~/.xxx を上書きする場合にアーカイブが膨らまない）。
+    内容はダイジェストのキャッシュで比べるので、変わっていないファイルは読まずに済む。
+    """
 
     rollbacks_root: Path
 
     current_dir: Path | None = None
+    bytes_written: int = 0
+    # resume() で引き継いだ、中断前の実行が書き込んだバイト数（bytes_written に含む）
+    resumed_bytes: int = 0
+    fs: FileSystem = field(default_factory=PosixFS)
+    lock: RollbacksLock | None = None
+    digests: DigestCache | None = None
+    # 重複を探す直前のアーカイブ（digests があるときだけ使う）
+    _previous: Path | None = field(default=None, init=False, repr=False)
+
+    def locked(self) -> AbstractContextManager[object]:
+        """rollbacks/ のロックを取るコンテキスト（lock がなければ何もしない）."""
+
+        return self.lock if self.lock is not None else nullcontext()
 
     def start(self) -> Path:
-        """新しいバックアップディレクトリを作成してパスを返す."""
+        """新しいバックアップディレクトリを作成してパスを返す.
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archive = self.rollbacks_root / timestamp
-        archive.mkdir(parents=True, exist_ok=False)
+        アーカイブ名は <YYYYmmdd_HHMMSS>_<マイクロ秒>_<pid> 形式で、
+        同じ秒に複数プロセスが開始しても衝突しない。万一衝突した場合は連番を付けて再試行する。
+        """
+
+        self.fs.mkdir(self.rollbacks_root, parents=True, exist_ok=True)
+        base = new_archive_id()
+        archive = self.rollbacks_root / base
+        suffix = 0
+        with self.locked():
+            while True:
+                try:
+                    self.fs.mkdir(archive)
+                    break
+                except FileExistsError:
+                    suffix += 1
+                    archive = self.rollbacks_root / f"{base}.{suffix}"
+            self._previous = self._previous_archive(archive)
         self.current_dir = archive
+        self.bytes_written = 0
+        self.resumed_bytes = 0
         return archive
 
+    def resume(self, archive: Path) -> None:
+        """中断されたインストールのアーカイブに追記を再開する."""
+
+        with self.locked():
+            self.fs.mkdir(archive, parents=True, exist_ok=True)
+            index = ArchiveSizeIndex.load(self.rollbacks_root, self.fs)
+            self.bytes_written = self.resumed_bytes = index.size_of(archive)
+            self._previous = self._previous_archive(archive)
+        self.current_dir = archive
+
     def is_active(self) -> bool:
         return self.current_dir is not None
 
-    def backup(self, source: Path, relative_path: Path) -> None:
-        """対象ファイル/リンクをバックアップする."""
+    def backup(self, source: Path, relative_path: Path) -> int:
+        """対象ファイル/リンクをバックアップし、書き込んだバイト数を返す."""
 
         if self.current_dir is None:
             raise RuntimeError("BackupManager.start() が呼ばれていません")
 
+        fs = self.fs
         destination = self.current_dir / relative_path
-        destination.parent.mkdir(parents=True, exist_ok=True)
+        fs.mkdir(destination.parent, parents=True, exist_ok=True)
 
         # symlink の場合はリンク先情報を .link ファイルに保存
-        if source.is_symlink():
-            link_target = source.readlink()
+        if fs.is_symlink(source):
+            link_target = fs.readlink(source)
             info_path = destination.with_name(destination.name + ".link")
-            info_path.write_text(str(link_target))
+            fs.write_text(info_path, link_target)
+            written = len(os.fsencode(link_target))
+        elif self._link_duplicate(source, relative_path, destination):
+            written = 0
         else:
-            shutil.copy2(source, destination)
+            fs.copy_file(source, destination)
+            written = fs.size(destination)
+
+        self.bytes_written += written
+        return written
+
+    def _previous_archive(self, archive: Path) -> Path | None:
+        if self.digests is None:
+            return None
+        return next(
+            (other for other in list_archives(self.rollbacks_root) if other != archive), None
+        )
+
+    def _link_duplicate(self, source: Path, relative_path: Path, destination: Path) -> bool:
+        """直前のアーカイブの同じパスに同じ内容があれば、ハードリンクにして True を返す."""
+
+        if self.digests is None or self._previous is None:
+            return False
+        fs = self.fs
+        stored = self._previous / relative_path
+        try:
+            if fs.is_symlink(stored) or not fs.is_file(stored):
+                return False
+            if fs.size(stored) != fs.size(source):
+                return False
+        except OSError:
+            return False
+        digest = self.digests.digest(source)
+        if digest is None or digest != self.digests.digest(stored):
+            return False
+        try:
+            # GC で直前のアーカイブが消された・別のファイルシステムにあるなどの場合はコピーする
+            fs.hardlink(stored, destination)
+        except OSError:
+            return False
+        return True
+
+    def finish(self) -> None:
+        """今回のアーカイブのサイズをキャッシュに記録する."""
+
+        if self.current_dir is None:
+            return
+        with self.locked():
+            index = ArchiveSizeIndex.load(self.rollbacks_root, self.fs)
+            index.sizes[self.current_dir.name] = self.bytes_written
+            index.save()
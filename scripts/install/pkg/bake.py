@@ -0,0 +1,173 @@
+"""インストール結果を tar アーカイブとして書き出す（--bake）.
+
+空のホームディレクトリに対する Plan を、ディレクトリ・シンボリックリンク
+（コピーモードではファイルの中身）と権限・mtime・所有者のメタデータを持つ tar として
+出力先へ順に流す。実際のファイルシステムには何も作らないので、コンテナイメージや
+VM テンプレートのレイヤーとして使える::
+
+    python3 install.py --bake home.tar.gz
+    tar -C /home/me -xzf home.tar.gz
+
+tar はストリームモード ("w|") で書き、ファイルの中身はチャンク単位で読んで渡すため、
+使うメモリはファイルの大きさによらない（パイプや標準出力にもそのまま書ける）。
+ただし Plan とレイヤーの索引は先にすべて作ってから書き出すので、エントリ数に比例した
+メモリは使う（PlanBuilder が並べ替えた全エントリを返すため）。
+テンプレートとバンドルは生成物へのリンクではなく、展開した内容をファイルとして入れる。
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import sys
+import tarfile
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .bundle import ShellBundler
+from .plan.builder import LayerIndex
+from .plan.model import ActionType, PlanEntry
+from .templates import TEMPLATE_SUFFIX, TemplateRenderer
+
+# 圧縮付きで書き出す拡張子
+COMPRESSED_SUFFIXES = {".gz": "gz", ".tgz": "gz", ".bz2": "bz2", ".xz": "xz"}
+
+
+@dataclass
+class BakeReport:
+    """書き出した内容の簡易統計."""
+
+    directories: int = 0
+    links: int = 0
+    files: int = 0
+    bytes: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def open_bake_output(target: str) -> tarfile.TarFile:
+    """出力先の tar をストリームモードで開く（'-' は標準出力. 拡張子で圧縮を選ぶ）."""
+    if target == "-":
+        return tarfile.open(fileobj=sys.stdout.buffer, mode="w|", format=tarfile.PAX_FORMAT)
+    compression = COMPRESSED_SUFFIXES.get(Path(target).suffix, "")
+    return tarfile.open(target, mode=f"w|{compression}", format=tarfile.PAX_FORMAT)
+
+
+def _info_from_stat(name: str, stat: os.stat_result) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.mode = stat.st_mode & 0o7777
+    info.mtime = int(stat.st_mtime)
+    info.uid = stat.st_uid
+    info.gid = stat.st_gid
+    return info
+
+
+class Baker:
+    """Plan のエントリを tar のメンバーとして書き出す."""
+
+    def __init__(
+        self,
+        tar: tarfile.TarFile,
+        index: LayerIndex,
+        *,
+        renderer: TemplateRenderer | None = None,
+        bundler: ShellBundler | None = None,
+        copy_mode: bool = False,
+    ) -> None:
+        self.tar = tar
+        self.index = index
+        self.renderer = renderer
+        self.bundler = bundler
+        self.copy_mode = copy_mode
+        self.report = BakeReport()
+
+    def bake(self, entries: Iterable[PlanEntry]) -> BakeReport:
+        for entry in entries:
+            try:
+                self._add(entry)
+            except OSError as error:
+                self.report.errors.append(f"{entry.spec.relative_path}: {error}")
+        return self.report
+
+    def _add(self, entry: PlanEntry) -> None:
+        action = entry.action
+        if action is ActionType.ERROR:
+            self.report.errors.append(entry.describe())
+            return
+        if action is ActionType.RENDER:
+            # 展開はリンク（ファイル）のエントリを書き出すときにメモリ上で行う
+            return
+
+        name = entry.spec.relative_path.as_posix()
+        source = entry.spec.source
+        if action is ActionType.ENSURE_DIR:
+            info = _info_from_stat(name, source.stat())
+            info.type = tarfile.DIRTYPE
+            self.tar.addfile(info)
+            self.report.directories += 1
+            return
+
+        renderer = self.renderer
+        template = self._template_for(entry, renderer) if renderer is not None else None
+        if self.bundler is not None and self.bundler.owns(source):
+            self._add_bundled(name, entry.spec.relative_path, self.bundler)
+        elif renderer is not None and template is not None:
+            self._add_rendered(name, template, renderer)
+        elif self.copy_mode:
+            self._add_file(name, source)
+        else:
+            info = _info_from_stat(name, source.lstat())
+            info.type = tarfile.SYMTYPE
+            info.mode = 0o777
+            info.linkname = str(source.resolve())
+            self.tar.addfile(info)
+            self.report.links += 1
+
+    def _template_for(self, entry: PlanEntry, renderer: TemplateRenderer) -> Path | None:
+        """生成物を指すエントリなら、元のテンプレートのパスを返す."""
+        if not entry.spec.source.is_relative_to(renderer.generated_dir):
+            return None
+        relative = entry.spec.relative_path
+        item = self.index.entries.get(relative.with_name(relative.name + TEMPLATE_SUFFIX))
+        return item.source if item is not None else None
+
+    def _add_rendered(self, name: str, template: Path, renderer: TemplateRenderer) -> None:
+        try:
+            data = renderer.render_text(template).encode("utf-8")
+        except KeyError as error:
+            self.report.errors.append(f"{name}: 未定義の変数です: {error.args[0]}")
+            return
+        except ValueError as error:
+            self.report.errors.append(f"{name}: テンプレートの書式が不正です: {error}")
+            return
+        info = _info_from_stat(name, template.stat())
+        info.size = len(data)
+        self.tar.addfile(info, io.BytesIO(data))
+        self.report.files += 1
+        self.report.bytes += info.size
+
+    def _add_bundled(self, name: str, relative: Path, bundler: ShellBundler) -> None:
+        original = bundler.source_of(relative)
+        if original is None:
+            self.report.errors.append(f"{name}: バンドルの元の起動ファイルが見つかりません")
+            return
+        try:
+            data = bundler.bundle_text(relative, original).encode("utf-8")
+        except UnicodeDecodeError as error:
+            self.report.errors.append(f"{name}: バンドルを生成できません: {error}")
+            return
+        info = _info_from_stat(name, original.stat())
+        info.size = len(data)
+        self.tar.addfile(info, io.BytesIO(data))
+        self.report.files += 1
+        self.report.bytes += info.size
+
+    def _add_file(self, name: str, source: Path) -> None:
+        with source.open("rb") as stream:
+            stat = os.fstat(stream.fileno())
+            info = _info_from_stat(name, stat)
+            info.size = stat.st_size
+            # addfile は size バイトをチャンク単位でコピーする
+            self.tar.addfile(info, stream)
+        self.report.files += 1
+        self.report.bytes += info.size
@@ -0,0 +1,188 @@
+"""シェルの起動ファイルを1ファイルにまとめるバンドラー（--bundle）.
+
+.bashrc / .zshrc などが `source "$HOME/.aliases"` のように読み込むファイルのうち、
+同じく source/ で管理しているものをその場に展開した1ファイルを
+バンドルディレクトリ (state/<インストール先>/bundled/) に書き出し、インストール先には
+そのバンドルへのリンクを張る。起動時のファイルの読み込みが1回で済み、
+自分のパスに依存しないので zcompile もそのままかけられる。
+
+展開するのは次の条件をすべて満たす読み込みだけで、それ以外の行はそのまま残す:
+
+- 1行に `source` / `.` とパスだけが書かれている
+- パスが ~/ か $HOME/（${HOME}/）で始まる固定のパス
+- レイヤーを重ねた source/ に通常ファイルとしてある（*.tmpl から生成するものは除く）
+- 読み込まれる側が自分のパス（$0 / BASH_SOURCE / %x / %N）やトップレベルの return を使わない
+
+~/.zshrc_local のような管理外のファイルは毎回の起動時に読まれるので、内容が古くなることはない。
+バンドルは展開結果のハッシュをキーにキャッシュし、入力のどれかが変わったときだけ書き直す。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+from .templates import TEMPLATE_SUFFIX
+
+BUNDLE_DIR_NAME = "bundled"
+BUNDLE_CACHE_NAME = "bundle-cache.json"
+# バンドルする起動ファイル（インストール先での relative_path）
+DEFAULT_TARGETS = (".bashrc", ".bash_profile", ".zshenv", ".zprofile", ".zshrc")
+# 展開する入れ子の深さの上限
+MAX_DEPTH = 8
+
+_HOME = r"(?:\$HOME|\$\{HOME\})"
+SOURCE_LINE = re.compile(
+    r"^(?P<indent>\s*)(?:source|\.)\s+"
+    rf"(?:(?:~|{_HOME})/(?P<bare>[\w.\-/]+)|\"{_HOME}/(?P<quoted>[\w.\-/]+)\")"
+    r"\s*(?:#.*)?$"
+)
+# 展開すると意味が変わる書き方（自分のパスの参照と、読み込み元ごと抜けてしまう return）.
+# return は行頭のほか、&& / || / ; / パイプ・( { ・case の ) ・then / do / else の後のものを拾う。
+# 関数の本体で字下げした行の return は対象外（関数から抜けるだけなので展開してよい）
+SELF_REFERENCE = re.compile(
+    r"\$0\b|\$\{0\}|BASH_SOURCE|%x|%N"
+    r"|(?:^|[;&|({)]\s*|\b(?:then|do|else)\s+)return\b",
+    re.MULTILINE,
+)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ShellBundler:
+    """起動ファイルのバンドルの生成とキャッシュの管理.
+
+    キャッシュは relative_path ごとに展開結果のハッシュを保持する。
+    バンドルが存在しハッシュが一致すれば書き直さない。
+    """
+
+    def __init__(
+        self,
+        layers: Sequence[Path],
+        generated_dir: Path,
+        cache_path: Path,
+        targets: Iterable[str] = DEFAULT_TARGETS,
+    ) -> None:
+        self.layers = list(layers)
+        self.generated_dir = generated_dir
+        self.cache_path = cache_path
+        self.targets = frozenset(Path(target) for target in targets)
+        try:
+            self._cache: dict[str, str] = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._cache = {}
+        # is_fresh で展開した内容（生成時に展開し直さない）
+        self._texts: dict[str, str] = {}
+
+    def handles(self, relative: Path) -> bool:
+        return relative in self.targets
+
+    def owns(self, path: Path) -> bool:
+        """path がバンドルの出力か."""
+        return path.is_relative_to(self.generated_dir)
+
+    def output_path(self, relative: Path) -> Path:
+        return self.generated_dir / relative
+
+    def source_of(self, relative: Path) -> Path | None:
+        """レイヤーを重ねたビューで relative にある通常ファイル（なければ None）."""
+        for layer in reversed(self.layers):
+            candidate = layer / relative
+            if candidate.is_symlink() or candidate.is_dir():
+                return None
+            if candidate.is_file():
+                return candidate
+            if candidate.with_name(candidate.name + TEMPLATE_SUFFIX).exists():
+                return None
+        return None
+
+    def is_fresh(self, relative: Path, source: Path) -> bool:
+        """前回の生成から、起動ファイルも展開するファイルも変わっていないか."""
+        key = str(relative)
+        try:
+            text = self.bundle_text(relative, source)
+        except (OSError, UnicodeDecodeError):
+            # 生成時にエラーとして報告する
+            return False
+        self._texts[key] = text
+        return self._cache.get(key) == _digest(text) and os.path.exists(self.output_path(relative))
+
+    def bundle_text(self, relative: Path, source: Path) -> str:
+        """source に管理下の読み込み先を展開した内容を返す（ファイルには書かない）."""
+        header = f"# dotfiles のインストーラーが {relative} から生成したバンドルです. 直接編集しないでください\n"
+        return header + self._expand(source.read_text(encoding="utf-8"), [relative])
+
+    def _expand(self, text: str, stack: list[Path]) -> str:
+        lines = []
+        for line in text.splitlines(keepends=True):
+            match = SOURCE_LINE.match(line.rstrip("\n"))
+            included = self._includable(match, stack) if match else None
+            if match is None or included is None:
+                lines.append(line)
+                continue
+            relative, path, content = included
+            indent = match["indent"]
+            body = self._expand(content, [*stack, relative])
+            if body and not body.endswith("\n"):
+                body += "\n"
+            lines.append(f"{indent}# >>> ~/{relative} (バンドル)\n")
+            lines.append(body)
+            lines.append(f"{indent}# <<< ~/{relative}\n")
+        return "".join(lines)
+
+    def _includable(self, match: re.Match[str], stack: list[Path]) -> tuple[Path, Path, str] | None:
+        relative = Path(os.path.normpath(match["bare"] or match["quoted"]))
+        if not relative.parts or relative.parts[0] == ".." or relative in stack:
+            return None
+        if len(stack) > MAX_DEPTH:
+            return None
+        path = self.source_of(relative)
+        if path is None:
+            return None
+        try:
+            content = path.read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            return None
+        if SELF_REFERENCE.search(content):
+            return None
+        return relative, path, content
+
+    def bundle_batch(self, items: Iterable[tuple[Path, Path]]) -> dict[Path, str | None]:
+        """(relative_path, 起動ファイル) をまとめて生成し、キャッシュを1回だけ保存する.
+
+        relative_path ごとにエラーメッセージ（成功時は None）を返す。
+        """
+        results: dict[Path, str | None] = {}
+        for relative, source in items:
+            key = str(relative)
+            try:
+                text = self._texts.pop(key, None)
+                if text is None:
+                    text = self.bundle_text(relative, source)
+                output = self.output_path(relative)
+                output.parent.mkdir(parents=True, exist_ok=True)
+                temp = output.with_name(f".{output.name}.tmp")
+                temp.write_text(text, encoding="utf-8")
+                os.chmod(temp, source.stat().st_mode & 0o777)
+                os.replace(temp, output)
+            except (OSError, UnicodeDecodeError) as error:
+                results[relative] = f"バンドルを生成できません: {error}"
+                continue
+            self._cache[key] = _digest(text)
+            results[relative] = None
+
+        if results:
+            self.save()
+        return results
+
+    def save(self) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.cache_path.with_name(f".{self.cache_path.name}.tmp")
+        temp.write_text(json.dumps(self._cache, sort_keys=True), encoding="utf-8")
+        os.replace(temp, self.cache_path)
@@ -0,0 +1,147 @@
+"""ファイル内容の比較とコピー.
+
+コピーは可能ならデータを移さずに済む方法から順に試す:
+
+1. FICLONE (reflink. Btrfs / XFS などでブロックを共有するだけ)
+2. os.copy_file_range (カーネル内でのコピー)
+3. 通常の読み書き
+
+いずれも同じディレクトリの一時ファイルに書いてから rename するので、
+読み手が書きかけのファイルを見ることはない。
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import shutil
+import time
+from pathlib import Path
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .digests import DigestCache
+
+# linux/fs.h の FICLONE (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def same_content(a: Path, b: Path, *, digests: DigestCache | None = None) -> bool:
+    """2つのファイルの内容が同じか. サイズを比べてから、チャンク単位で先頭から比べる.
+
+    違いが見つかった時点で読むのをやめるので、異なるファイルはほとんど読まずに済む。
+    digests を渡すと、両方のダイジェストが記録済みならそれを比べる（どちらも読まない）。
+    記録がなければ先頭から比べ、最後まで同じだったときは読みながら計算したダイジェストを
+    両方に記録する。
+    """
+    try:
+        if a.stat().st_size != b.stat().st_size:
+            return False
+        if digests is not None:
+            left, right = digests.cached(a), digests.cached(b)
+            if left is not None and right is not None:
+                return left == right
+        return _compare(a, b, digests)
+    except OSError:
+        return False
+
+
+def _compare(a: Path, b: Path, digests: DigestCache | None) -> bool:
+    hasher = digests.new_hash() if digests is not None else None
+    started = time.time_ns()
+    with a.open("rb") as left, b.open("rb") as right:
+        stats = (os.fstat(left.fileno()), os.fstat(right.fileno()))
+        while True:
+            chunk = left.read(CHUNK_SIZE)
+            if chunk != right.read(CHUNK_SIZE):
+                return False
+            if not chunk:
+                break
+            if hasher is not None:
+                hasher.update(chunk)
+    if digests is not None and hasher is not None:
+        digest = hasher.digest()
+        for path, stat in zip((a, b), stats):
+            digests.remember(path, stat, digest, started)
+    return True
+
+
+def is_copy_current(source: Path, dest: Path, *, digests: DigestCache | None = None) -> bool:
+    """dest が source のコピーとして最新か（サイズ → mtime → ダイジェストの順に判定）.
+
+    コピー時に mtime もそろえるため、通常はサイズと mtime の比較だけで済む。
+    """
+    try:
+        dest_stat = dest.lstat()
+        source_stat = source.stat()
+    except OSError:
+        return False
+    if not os.path.isfile(dest) or dest.is_symlink():
+        return False
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    if dest_stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return True
+    return same_content(source, dest, digests=digests)
+
+
+def _clone(src_fd: int, dst_fd: int) -> bool:
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    """copy_file_range で size バイトコピーする. 使えなければ False（通常の読み書きに戻る）.
+
+    procfs のような特殊なファイルシステムや一部の FUSE / overlay では、先頭から 0 を返す
+    ことがある。1バイトもコピーできなければ False、途中で止まった場合は OSError にする
+    （切り詰めたファイルで置き換えない）。
+    """
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = copy_file_range(src_fd, dst_fd, size - copied)
+            if n == 0:
+                break
+            copied += n
+    except OSError:
+        if copied:
+            raise
+        return False
+    if copied == 0 and size > 0:
+        return False
+    if copied < size:
+        raise OSError(f"copy_file_range が途中で止まりました（{copied}/{size} バイト）")
+    return True
+
+
+def copy_file_atomic(source: Path, dest: Path, temp: Path) -> int:
+    """source を dest へアトミックにコピーし、コピーしたバイト数を返す.
+
+    temp（dest と同じディレクトリの一時パス）に書き込み、権限と mtime を
+    source にそろえてから dest へ rename する。
+    """
+    source_stat = source.stat()
+    temp.unlink(missing_ok=True)
+    try:
+        with source.open("rb") as src, temp.open("xb") as dst:
+            src_fd, dst_fd = src.fileno(), dst.fileno()
+            if not _clone(src_fd, dst_fd) and not _copy_range(src_fd, dst_fd, source_stat.st_size):
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            dst.flush()
+            os.fsync(dst_fd)
+        os.chmod(temp, source_stat.st_mode & 0o7777)
+        os.utime(temp, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        os.replace(temp, dest)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return source_stat.st_size
@@ -0,0 +1,278 @@
+"""Plan を常駐プロセスに保持し、Unix ドメインソケットで問い合わせに答えるデーモン.
+
+エディタ連携やプロンプト表示から「このファイルは管理対象か」「差分はあるか」を
+高頻度に問い合わせても source/ を毎回走査しないよう、Plan とインストール先の索引を
+メモリ上に持ち、変更を検知したときだけ作り直す。
+
+プロトコルは 1行1 JSON のリクエスト/レスポンス::
+
+    → {"op": "managed", "path": "/home/me/.zshrc"}
+    ← {"ok": true, "managed": true, "path": ".zshrc", "action": "SKIP", "message": "..."}
+
+    → {"op": "drift"}
+    ← {"ok": true, "count": 1, "drifted": [{"path": ".vimrc", "action": "UPDATE", ...}]}
+
+    → {"op": "status"}
+    ← {"ok": true, "entries": 42, "counts": {"SKIP": 41, "UPDATE": 1}, "generation": 3, ...}
+
+変更の検知は標準ライブラリだけで動くよう、ファイルシステム通知ではなく
+mtime を poll_interval 秒ごとに stat して行う。エントリの追加・削除・リンクの付け替えは
+いずれも親ディレクトリの mtime を更新するので、ディレクトリを見れば分かる。
+ファイルをその場で書き換えた場合（ふつうの編集）はディレクトリの mtime が変わらないため、
+レイヤーの下のファイル（テンプレートを含む）と管理対象のファイルも stat する。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .bundle import ShellBundler
+from .gitindex import GitIndexEnumerator
+from .plan.builder import PlanBuilder
+from .plan.model import ActionType, Plan, PlanEntry
+from .templates import TemplateRenderer
+from .toolbin import ToolLinker
+
+DAEMON_SOCKET_NAME = "daemon.sock"
+
+
+class DaemonAlreadyRunningError(RuntimeError):
+    """同じソケットで別のデーモンが応答している."""
+
+
+def _entry_fields(entry: PlanEntry) -> dict[str, Any]:
+    return {
+        "path": str(entry.spec.relative_path),
+        "action": entry.action.name,
+        "message": entry.message,
+    }
+
+
+class PlanIndex:
+    """ある時点の Plan と、パスからエントリを引くための索引（作成後は変更しない）."""
+
+    def __init__(self, plan: Plan, generation: int = 0) -> None:
+        self.plan = plan
+        self.generation = generation
+        self.built_at = time.time()
+        self.summary = plan.summary()
+        self.drifted = [entry for entry in plan.entries if entry.action is not ActionType.SKIP]
+
+        # インストール先のパスと、エディタが開くことの多い source/ 側のパスの両方で引けるようにする
+        self.by_path: dict[str, PlanEntry] = {}
+        for entry in plan.entries:
+            if entry.action is ActionType.ERROR:
+                continue
+            self.by_path[os.path.abspath(entry.spec.dest)] = entry
+            self.by_path.setdefault(os.path.abspath(entry.spec.source), entry)
+
+    def lookup(self, path: str) -> PlanEntry | None:
+        return self.by_path.get(os.path.abspath(os.path.expanduser(path)))
+
+    def answer(self, request: dict[str, Any]) -> dict[str, Any]:
+        """1件のリクエストに答える."""
+        op = request.get("op")
+        if op == "managed":
+            entry = self.lookup(str(request.get("path", "")))
+            if entry is None:
+                return {"ok": True, "managed": False}
+            return {"ok": True, "managed": True, **_entry_fields(entry)}
+        if op == "drift":
+            return {
+                "ok": True,
+                "count": len(self.drifted),
+                "drifted": [_entry_fields(entry) for entry in self.drifted],
+            }
+        if op == "status":
+            return {
+                "ok": True,
+                "entries": len(self.plan.entries),
+                "counts": {action.name: n for action, n in self.summary.counts.items()},
+                "generation": self.generation,
+                "built_at": round(self.built_at, 6),
+            }
+        if op == "ping":
+            return {"ok": True}
+        return {"ok": False, "error": f"未対応の op です: {op}"}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """接続ごとに、1行ずつリクエストを読んでレスポンスを返す."""
+
+    server: _PlanServer
+
+    def handle(self) -> None:
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("リクエストは JSON オブジェクトで送ってください")
+            except ValueError as error:
+                response = {"ok": False, "error": str(error)}
+            else:
+                # 索引は差し替えるだけなので、読み出しにロックはいらない
+                response = self.server.plan_daemon.index.answer(request)
+            self.wfile.write(encode(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _PlanServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: PlanDaemon) -> None:
+        self.plan_daemon = daemon
+        super().__init__(socket_path, _RequestHandler)
+
+
+class PlanDaemon:
+    """Plan を保持し、変更を検知して作り直しながらソケットで問い合わせに答える."""
+
+    def __init__(
+        self,
+        source_dir: Path,
+        dest_dir: Path,
+        socket_path: Path,
+        *,
+        overlays: list[Path] | None = None,
+        renderer: TemplateRenderer | None = None,
+        bundler: ShellBundler | None = None,
+        tool_linker: ToolLinker | None = None,
+        git_index: GitIndexEnumerator | None = None,
+        copy_mode: bool = False,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self.builder = PlanBuilder(
+            source_dir=source_dir,
+            dest_dir=dest_dir,
+            overlays=list(overlays or []),
+            renderer=renderer,
+            bundler=bundler,
+            tool_linker=tool_linker,
+            git_index=git_index,
+            copy_mode=copy_mode,
+        )
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.index = PlanIndex(Plan())
+        self._watched: list[str] = []
+        self._signature: list[int | None] = []
+        self._stop = threading.Event()
+        self._server: _PlanServer | None = None
+
+    def refresh(self) -> PlanIndex:
+        """Plan を作り直して索引を差し替える."""
+        # 先に監視対象の mtime を取っておき、作り直しの最中の変更を取りこぼさない
+        watched = self._watch_list(self.index)
+        signature = self._stat_all(watched)
+        index = PlanIndex(self.builder.build(), generation=self.index.generation + 1)
+        rebuilt_watched = self._watch_list(index)
+        if rebuilt_watched != watched:
+            # 監視対象のディレクトリが増減した場合は作り直し後の状態を基準にする
+            watched, signature = rebuilt_watched, self._stat_all(rebuilt_watched)
+        self.index, self._watched, self._signature = index, watched, signature
+        return index
+
+    def has_changed(self) -> bool:
+        """前回の refresh から監視対象のディレクトリ・ファイルが変わったか."""
+        return self._stat_all(self._watched) != self._signature
+
+    def poll(self) -> bool:
+        """変更があれば作り直す. 作り直したら True."""
+        if not self.has_changed():
+            return False
+        self.refresh()
+        return True
+
+    def serve_forever(self) -> None:
+        """ソケットを開き、停止されるまで問い合わせに答える."""
+        self.refresh()
+        self._server = self._bind()
+        watcher = threading.Thread(target=self._watch, name="plan-watcher", daemon=True)
+        watcher.start()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except OSError:  # pragma: no cover - 次の周期で再試行
+                continue
+
+    def _bind(self) -> _PlanServer:
+        path = str(self.socket_path)
+        if self.socket_path.is_socket():
+            # 応答があれば別のデーモンが動いている. なければ前回の残骸なので消す
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(path)
+            except OSError:
+                self.socket_path.unlink()
+            else:
+                raise DaemonAlreadyRunningError(f"デーモンは既に起動しています: {path}")
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        return _PlanServer(path, self)
+
+    def _watch_list(self, index: PlanIndex) -> list[str]:
+        """mtime を見るパス.
+
+        各レイヤーの配下のディレクトリとファイルすべて、管理対象の置き場所のディレクトリと
+        管理対象のファイル（source 側とインストール先）、~/tools のディレクトリ。
+        """
+        watched = []
+        for layer in self.builder.layers:
+            watched.append(str(layer))
+            for root, dirs, files in os.walk(layer):
+                watched.extend(os.path.join(root, name) for name in dirs)
+                watched.extend(os.path.join(root, name) for name in files)
+        watched.append(str(self.builder.dest_dir))
+        watched.extend(sorted({os.path.dirname(path) for path in index.by_path}))
+        # その場での編集は ADOPT / UPDATE の判定を変える（リンクは辿ってリンク先の mtime を見る）
+        watched.extend(sorted(index.by_path))
+        if self.builder.tool_linker is not None:
+            watched.extend(str(path) for path in self.builder.tool_linker.search_dirs())
+        if self.builder.git_index is not None:
+            # git add / git rm はディレクトリではなくインデックスのファイルを書き換える
+            watched.extend(str(path) for path in sorted(self.builder.git_index.index_paths))
+        return watched
+
+    @staticmethod
+    def _stat_all(paths: Iterable[str]) -> list[int | None]:
+        signature: list[int | None] = []
+        for path in paths:
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return signature
+
+
+def query(socket_path: Path, request: dict[str, Any], *, timeout: float = 2.0) -> dict[str, Any]:
+    """デーモンに1件問い合わせる（接続できなければ OSError）."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise ConnectionError("デーモンから応答がありません")
+    return json.loads(line)
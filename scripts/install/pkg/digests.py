@@ -0,0 +1,177 @@
+"""ファイル内容のダイジェストの永続キャッシュ.
+
+(デバイス, inode, サイズ, mtime_ns) をキーに blake2b のダイジェストを記録しておき、
+変わっていないファイルは読まずに stat 1回で済ませる。キャッシュは rollbacks/ の隣に
+<rollbacks>.digests として、固定長レコードを並べたバイナリで置く::
+
+    cache = DigestCache.load(digest_cache_path(rollbacks_root))
+    cache.digest(Path.home() / ".bashrc")  # 初回は読んでハッシュし、次回からは stat のみ
+    cache.save()
+
+キャッシュは複数のインストール先で共有する。保存時にはファイルを読み直して、
+読み込んだ後に他のプロセスが記録したものと合わせてから置き換える
+（保存は呼び出し側が rollbacks/ のロックを取って行う）。
+
+mtime の粒度の中で書き換えられると、サイズが同じなら内容が変わってもキーが変わらない。
+そのため mtime が新しすぎるファイルは記録しない（git の racily clean と同じ考え方）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .content import CHUNK_SIZE
+
+DIGEST_CACHE_SUFFIX = ".digests"
+# ファイル先頭の識別子（最後の1バイトはフォーマットの版）
+MAGIC = b"DIGESTS\x01"
+DIGEST_SIZE = 16
+# dev, ino, size, mtime_ns, digest（1件 48 バイト）
+RECORD = struct.Struct(f"<QQQq{DIGEST_SIZE}s")
+# 保存する最大件数（今回使ったものを優先して残す）
+MAX_ENTRIES = 100_000
+# ハッシュした時刻からこれより新しい mtime のファイルは記録しない
+RACY_WINDOW_NS = 2_000_000_000
+
+Key = tuple[int, int, int, int]
+
+
+def digest_cache_path(rollbacks_root: Path) -> Path:
+    return rollbacks_root.with_name(rollbacks_root.name + DIGEST_CACHE_SUFFIX)
+
+
+def file_key(stat: os.stat_result) -> Key:
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def hash_file(path: Path) -> bytes:
+    """path の内容をチャンク単位で読んでハッシュする（大きなチャンクの update は GIL を手放す）."""
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+@dataclass
+class DigestCache:
+    """(dev, ino, size, mtime_ns) → ダイジェスト のキャッシュ."""
+
+    path: Path
+    entries: dict[Key, bytes] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+    # 今回参照・登録したキー
+    _used: set[Key] = field(default_factory=set, init=False, repr=False)
+    _dirty: bool = field(default=False, init=False, repr=False)
+    _loaded: bool = field(default=True, init=False, repr=False)
+
+    @classmethod
+    def load(cls, path: Path) -> DigestCache:
+        """キャッシュを読み込む（存在しない・壊れている場合は空）."""
+        return cls(path=path, entries=_read_entries(path))
+
+    @classmethod
+    def open(cls, path: Path) -> DigestCache:
+        """最初に参照するまで読み込まないキャッシュ（使わない処理ではファイルに触れない）."""
+        cache = cls(path=path)
+        cache._loaded = False
+        return cache
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._loaded = True
+            self.entries = {**_read_entries(self.path), **self.entries}
+
+    @staticmethod
+    def new_hash() -> hashlib.blake2b:
+        """digest と同じ形式のダイジェストを計算するハッシュオブジェクト."""
+        return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+    def cached(self, path: Path) -> bytes | None:
+        """記録済みの path（リンクは辿る）のダイジェスト. ファイルは読まず、記録がなければ None."""
+        try:
+            key = file_key(path.stat())
+        except OSError:
+            return None
+        self._ensure_loaded()
+        digest = self.entries.get(key)
+        if digest is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.add(key)
+        return digest
+
+    def digest(self, path: Path) -> bytes | None:
+        """path（リンクは辿る）の内容のダイジェスト. 読めなければ None."""
+        cached = self.cached(path)
+        if cached is not None:
+            return cached
+        try:
+            stat = path.stat()
+            started = time.time_ns()
+            digest = hash_file(path)
+        except OSError:
+            return None
+        self.remember(path, stat, digest, started)
+        return digest
+
+    def remember(self, path: Path, stat: os.stat_result, digest: bytes, started: int) -> None:
+        """started（ナノ秒）に読み始めた時点の stat とダイジェストを記録する.
+
+        読んでいる間に書き換えられたファイルと、mtime が新しすぎるファイルは記録しない。
+        """
+        try:
+            unchanged = file_key(path.stat()) == file_key(stat)
+        except OSError:
+            return
+        if unchanged and stat.st_mtime_ns < started - RACY_WINDOW_NS:
+            self._store(file_key(stat), digest)
+
+    def _store(self, key: Key, digest: bytes) -> None:
+        self.entries[key] = digest
+        self._used.add(key)
+        self._dirty = True
+
+    def save(self) -> None:
+        """登録があったときだけ、一時ファイルに書いてから rename で置き換える.
+
+        読み込んだ後に他のプロセスが保存した記録も残す（同じキーは今回の記録を優先）。
+        キャッシュなので、書き込めない場合は何もしない。
+        """
+        if not self._dirty:
+            return
+        self.entries = {**_read_entries(self.path), **self.entries}
+        keys = [*self._used, *(key for key in self.entries if key not in self._used)]
+        data = bytearray(MAGIC)
+        for key in keys[:MAX_ENTRIES]:
+            data += RECORD.pack(*key, self.entries[key])
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        self._dirty = False
+
+
+def _read_entries(path: Path) -> dict[Key, bytes]:
+    """キャッシュファイルの記録（存在しない・壊れている場合は空）."""
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return {}
+    body = memoryview(data)[len(MAGIC) :]
+    if not data.startswith(MAGIC) or len(body) % RECORD.size:
+        return {}
+    return {
+        (dev, ino, size, mtime_ns): digest
+        for dev, ino, size, mtime_ns, digest in RECORD.iter_unpack(body)
+    }
@@ -0,0 +1,93 @@
+"""機械処理向けの JSON Lines イベント出力.
+
+1行1イベントの JSON を書き出す。すべてのイベントは次のキーを持つ:
+
+- event: イベント種別 (phase_start / phase_end / plan_entry / result など)
+- ts: UNIX 時刻（秒）
+
+行はメモリ上でまとめてから一度に書き込むため、10万件規模でもほぼコストにならない。
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any
+
+from .plan.model import PlanEntry
+
+
+class EventWriter:
+    """JSON Lines 形式のイベントをバッファして書き出す."""
+
+    def __init__(self, stream: IO[bytes], *, batch_size: int = 512, owns_stream: bool = True):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.owns_stream = owns_stream
+        self._lines: list[str] = []
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    @classmethod
+    def open(cls, target: str) -> EventWriter:
+        """'-' なら標準出力、それ以外はファイルに書き出す."""
+        if target == "-":
+            return cls(sys.stdout.buffer, owns_stream=False)
+        return cls(Path(target).open("wb"))
+
+    def emit(self, event: str, **fields: Any) -> None:
+        record = {"event": event, "ts": round(time.time(), 6), **fields}
+        self._lines.append(self._encode(record))
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def plan_entry(self, entry: PlanEntry) -> None:
+        spec = entry.spec
+        self.emit(
+            "plan_entry",
+            action=entry.action.name,
+            path=str(spec.relative_path),
+            source=str(spec.source),
+            dest=str(spec.dest),
+            message=entry.message,
+            needs_confirmation=entry.needs_confirmation,
+            needs_backup=entry.needs_backup,
+        )
+
+    @contextmanager
+    def phase(self, name: str, **fields: Any) -> Iterator[dict[str, Any]]:
+        """フェーズの開始・終了イベントを出す. yield した dict は終了イベントに追加される."""
+        self.emit("phase_start", phase=name, **fields)
+        extra: dict[str, Any] = {}
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield extra
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.emit(
+                "phase_end",
+                phase=name,
+                status=status,
+                duration=round(time.perf_counter() - start, 6),
+                **extra,
+            )
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        self._lines.append("")
+        self.stream.write("\n".join(self._lines).encode("utf-8"))
+        self._lines = []
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
@@ -0,0 +1,450 @@
+"""ファイルシステム操作の差し替え口.
+
+PlanBuilder / PlanExecutor / BackupManager / RollbackManager はファイルシステムを
+直接触らず、FileSystem を通して操作する。通常は実際のファイルシステムを使う PosixFS、
+テストや大規模なシミュレーションではメモリ上で完結する MemoryFS を使う::
+
+    fs = MemoryFS(latency=0.002)  # 1操作ごとに 2ms 待つ（NFS などの遅いファイルシステムを模擬）
+    fs.add_file(Path("/src/.bashrc"), "# bashrc\\n")
+    plan = PlanBuilder(source_dir=Path("/src"), dest_dir=Path("/home/me"), fs=fs).build()
+
+パスはどちらも Path で表し、エラーは os と同じ例外（FileNotFoundError など）で報告する。
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple, Protocol
+
+from .content import copy_file_atomic, is_copy_current, same_content
+from .digests import DigestCache
+
+# シンボリックリンクを辿る回数の上限（Linux の MAXSYMLINKS と同じ）
+MAX_SYMLINK_HOPS = 40
+
+
+class DirEntry(NamedTuple):
+    """scandir の1エントリ."""
+
+    name: str
+    path: Path
+    # リンク先を辿った結果がディレクトリか
+    is_dir: bool
+    is_symlink: bool
+
+
+class FileSystem(Protocol):
+    """各コンポーネントが使うファイルシステム操作."""
+
+    def exists(self, path: Path) -> bool: ...
+
+    def is_dir(self, path: Path) -> bool: ...
+
+    def is_file(self, path: Path) -> bool: ...
+
+    def is_symlink(self, path: Path) -> bool: ...
+
+    def readlink(self, path: Path) -> str: ...
+
+    def resolve(self, path: Path) -> Path: ...
+
+    def scandir(self, path: Path) -> Iterator[DirEntry]: ...
+
+    def size(self, path: Path) -> int: ...
+
+    def mkdir(self, path: Path, *, parents: bool = False, exist_ok: bool = False) -> None: ...
+
+    def unlink(self, path: Path, *, missing_ok: bool = False) -> None: ...
+
+    def symlink(self, target: str, path: Path) -> None: ...
+
+    def replace(self, source: Path, dest: Path) -> None: ...
+
+    def read_text(self, path: Path) -> str: ...
+
+    def write_text(self, path: Path, text: str) -> None: ...
+
+    def copy_file(self, source: Path, dest: Path) -> None: ...
+
+    def hardlink(self, source: Path, dest: Path) -> None: ...
+
+    def copy_file_atomic(self, source: Path, dest: Path, temp: Path) -> int: ...
+
+    def same_content(self, a: Path, b: Path) -> bool: ...
+
+    def is_copy_current(self, source: Path, dest: Path) -> bool: ...
+
+
+class PosixFS:
+    """実際のファイルシステム.
+
+    digests を渡すと、内容の比較にダイジェストのキャッシュを使う。
+    """
+
+    def __init__(self, digests: DigestCache | None = None) -> None:
+        self.digests = digests
+
+    def exists(self, path: Path) -> bool:
+        return path.exists()
+
+    def is_dir(self, path: Path) -> bool:
+        return path.is_dir()
+
+    def is_file(self, path: Path) -> bool:
+        return path.is_file()
+
+    def is_symlink(self, path: Path) -> bool:
+        return path.is_symlink()
+
+    def readlink(self, path: Path) -> str:
+        return os.readlink(path)
+
+    def resolve(self, path: Path) -> Path:
+        return path.resolve()
+
+    def scandir(self, path: Path) -> Iterator[DirEntry]:
+        with os.scandir(path) as it:
+            for item in it:
+                yield DirEntry(item.name, Path(item.path), item.is_dir(), item.is_symlink())
+
+    def size(self, path: Path) -> int:
+        """lstat の st_size（リンクは辿らない）."""
+        return path.lstat().st_size
+
+    def mkdir(self, path: Path, *, parents: bool = False, exist_ok: bool = False) -> None:
+        path.mkdir(parents=parents, exist_ok=exist_ok)
+
+    def unlink(self, path: Path, *, missing_ok: bool = False) -> None:
+        path.unlink(missing_ok=missing_ok)
+
+    def symlink(self, target: str, path: Path) -> None:
+        os.symlink(target, path)
+
+    def replace(self, source: Path, dest: Path) -> None:
+        os.replace(source, dest)
+
+    def read_text(self, path: Path) -> str:
+        return path.read_text()
+
+    def write_text(self, path: Path, text: str) -> None:
+        path.write_text(text)
+
+    def copy_file(self, source: Path, dest: Path) -> None:
+        shutil.copy2(source, dest)
+
+    def hardlink(self, source: Path, dest: Path) -> None:
+        os.link(source, dest, follow_symlinks=False)
+
+    def copy_file_atomic(self, source: Path, dest: Path, temp: Path) -> int:
+        return copy_file_atomic(source, dest, temp)
+
+    def same_content(self, a: Path, b: Path) -> bool:
+        return same_content(a, b, digests=self.digests)
+
+    def is_copy_current(self, source: Path, dest: Path) -> bool:
+        return is_copy_current(source, dest, digests=self.digests)
+
+
+@dataclass
+class _File:
+    data: bytes
+    mode: int = 0o644
+    mtime_ns: int = field(default_factory=time.time_ns)
+
+
+@dataclass
+class _Link:
+    target: str
+
+
+@dataclass
+class _Dir:
+    children: dict[str, _File | _Link | _Dir] = field(default_factory=dict)
+
+
+_Node = _File | _Link | _Dir
+
+
+def _split(path: Path | str) -> list[str]:
+    return [part for part in os.path.abspath(path).split("/") if part]
+
+
+class MemoryFS:
+    """メモリ上のファイルシステム.
+
+    latency を指定すると、1回の操作ごとにその秒数だけ待つ（ネットワーク越しの
+    ファイルシステムの往復遅延を模擬する）。add_file などの準備用のメソッドは待たない。
+    スレッドセーフではない。
+    """
+
+    def __init__(self, *, latency: float = 0.0) -> None:
+        self.root = _Dir()
+        self.latency = latency
+
+    # --- 準備用 -------------------------------------------------------------
+
+    def add_file(self, path: Path, content: str | bytes = b"", *, mode: int = 0o644) -> None:
+        """親ディレクトリを作りながらファイルを置く."""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        parent = self._make_dirs(_split(path)[:-1])
+        parent.children[Path(path).name] = _File(data, mode)
+
+    def add_symlink(self, path: Path, target: str | Path) -> None:
+        """親ディレクトリを作りながらシンボリックリンクを置く."""
+        parent = self._make_dirs(_split(path)[:-1])
+        parent.children[Path(path).name] = _Link(str(target))
+
+    def read_bytes(self, path: Path) -> bytes:
+        node = self._lookup(path)
+        if not isinstance(node, _File):
+            raise FileNotFoundError(errno.ENOENT, "ファイルがありません", str(path))
+        return node.data
+
+    # --- FileSystem --------------------------------------------------------
+
+    def exists(self, path: Path) -> bool:
+        self._wait()
+        return self._lookup_quiet(path) is not None
+
+    def is_dir(self, path: Path) -> bool:
+        self._wait()
+        return isinstance(self._lookup_quiet(path), _Dir)
+
+    def is_file(self, path: Path) -> bool:
+        self._wait()
+        return isinstance(self._lookup_quiet(path), _File)
+
+    def is_symlink(self, path: Path) -> bool:
+        self._wait()
+        return isinstance(self._lookup_quiet(path, follow=False), _Link)
+
+    def readlink(self, path: Path) -> str:
+        self._wait()
+        node = self._lookup(path, follow=False)
+        if not isinstance(node, _Link):
+            raise OSError(errno.EINVAL, "シンボリックリンクではありません", str(path))
+        return node.target
+
+    def resolve(self, path: Path) -> Path:
+        self._wait()
+        parts, _ = self._walk(path, follow=True)
+        return Path("/" + "/".join(parts))
+
+    def scandir(self, path: Path) -> Iterator[DirEntry]:
+        self._wait()
+        directory = self._lookup(path)
+        if not isinstance(directory, _Dir):
+            raise NotADirectoryError(errno.ENOTDIR, "ディレクトリではありません", str(path))
+        base = Path(os.path.abspath(path))
+        for name, node in list(directory.children.items()):
+            child = base / name
+            if isinstance(node, _Link):
+                yield DirEntry(name, child, isinstance(self._lookup_quiet(child), _Dir), True)
+            else:
+                yield DirEntry(name, child, isinstance(node, _Dir), False)
+
+    def size(self, path: Path) -> int:
+        self._wait()
+        node = self._lookup(path, follow=False)
+        if isinstance(node, _File):
+            return len(node.data)
+        if isinstance(node, _Link):
+            return len(os.fsencode(node.target))
+        return 0
+
+    def mkdir(self, path: Path, *, parents: bool = False, exist_ok: bool = False) -> None:
+        self._wait()
+        existing = self._lookup_quiet(path)
+        if existing is not None:
+            if exist_ok and isinstance(existing, _Dir):
+                return
+            raise FileExistsError(errno.EEXIST, "既に存在します", str(path))
+        if parents:
+            self._make_dirs(self._walk(path, follow=True)[0])
+            return
+        parent, name = self._parent(path)
+        if name in parent.children:
+            raise FileExistsError(errno.EEXIST, "既に存在します", str(path))
+        parent.children[name] = _Dir()
+
+    def unlink(self, path: Path, *, missing_ok: bool = False) -> None:
+        self._wait()
+        try:
+            parent, name = self._parent(path)
+        except FileNotFoundError:
+            if missing_ok:
+                return
+            raise
+        node = parent.children.get(name)
+        if node is None:
+            if missing_ok:
+                return
+            raise FileNotFoundError(errno.ENOENT, "存在しません", str(path))
+        if isinstance(node, _Dir):
+            raise IsADirectoryError(errno.EISDIR, "ディレクトリです", str(path))
+        del parent.children[name]
+
+    def symlink(self, target: str, path: Path) -> None:
+        self._wait()
+        parent, name = self._parent(path)
+        if name in parent.children:
+            raise FileExistsError(errno.EEXIST, "既に存在します", str(path))
+        parent.children[name] = _Link(str(target))
+
+    def replace(self, source: Path, dest: Path) -> None:
+        self._wait()
+        source_parent, source_name = self._parent(source)
+        node = source_parent.children.get(source_name)
+        if node is None:
+            raise FileNotFoundError(errno.ENOENT, "存在しません", str(source))
+        dest_parent, dest_name = self._parent(dest)
+        current = dest_parent.children.get(dest_name)
+        if isinstance(current, _Dir):
+            if not isinstance(node, _Dir):
+                raise IsADirectoryError(errno.EISDIR, "ディレクトリです", str(dest))
+            if current.children:
+                raise OSError(errno.ENOTEMPTY, "ディレクトリが空ではありません", str(dest))
+        elif current is not None and isinstance(node, _Dir):
+            raise NotADirectoryError(errno.ENOTDIR, "ディレクトリではありません", str(dest))
+        del source_parent.children[source_name]
+        dest_parent.children[dest_name] = node
+
+    def read_text(self, path: Path) -> str:
+        self._wait()
+        return self.read_bytes(path).decode("utf-8")
+
+    def write_text(self, path: Path, text: str) -> None:
+        self._wait()
+        self._write(path, _File(text.encode("utf-8")))
+
+    def copy_file(self, source: Path, dest: Path) -> None:
+        """shutil.copy2 相当（内容・権限・mtime を写す）."""
+        self._wait()
+        node = self._lookup(source)
+        if not isinstance(node, _File):
+            raise IsADirectoryError(errno.EISDIR, "ファイルではありません", str(source))
+        self._write(dest, _File(node.data, node.mode, node.mtime_ns))
+
+    def hardlink(self, source: Path, dest: Path) -> None:
+        """os.link 相当（同じノードを共有する）."""
+        self._wait()
+        node = self._lookup(source, follow=False)
+        if not isinstance(node, _File):
+            raise IsADirectoryError(errno.EISDIR, "ファイルではありません", str(source))
+        parent, name = self._parent(dest)
+        if name in parent.children:
+            raise FileExistsError(errno.EEXIST, "既に存在します", str(dest))
+        parent.children[name] = node
+
+    def copy_file_atomic(self, source: Path, dest: Path, temp: Path) -> int:
+        self.copy_file(source, temp)
+        self.replace(temp, dest)
+        return self.size(dest)
+
+    def same_content(self, a: Path, b: Path) -> bool:
+        self._wait()
+        left, right = self._lookup_quiet(a), self._lookup_quiet(b)
+        return isinstance(left, _File) and isinstance(right, _File) and left.data == right.data
+
+    def is_copy_current(self, source: Path, dest: Path) -> bool:
+        self._wait()
+        original = self._lookup_quiet(source)
+        copy = self._lookup_quiet(dest, follow=False)
+        if not isinstance(original, _File) or not isinstance(copy, _File):
+            return False
+        return copy.mtime_ns == original.mtime_ns or copy.data == original.data
+
+    # --- 内部 --------------------------------------------------------------
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _walk(self, path: Path | str, *, follow: bool) -> tuple[list[str], _Node | None]:
+        """path の各要素のリンクを辿り、(実際のパスの要素, ノード) を返す.
+
+        途中で見つからなくなった場合は残りの要素をそのまま付けて、ノードは None を返す。
+        """
+        pending = list(reversed(_split(path)))
+        resolved: list[str] = []
+        node: _Node | None = self.root
+        hops = 0
+        while pending:
+            name = pending.pop()
+            if name == ".":
+                continue
+            if name == "..":
+                if resolved:
+                    resolved.pop()
+                node = self._node_at(resolved)
+                continue
+            if not isinstance(node, _Dir):
+                return resolved + [name] + list(reversed(pending)), None
+            child = node.children.get(name)
+            if isinstance(child, _Link) and (pending or follow):
+                hops += 1
+                if hops > MAX_SYMLINK_HOPS:
+                    raise OSError(errno.ELOOP, "シンボリックリンクの階層が深すぎます", str(path))
+                if child.target.startswith("/"):
+                    resolved, node = [], self.root
+                pending.extend(reversed([p for p in child.target.split("/") if p]))
+                continue
+            resolved.append(name)
+            if child is None:
+                return resolved + list(reversed(pending)), None
+            node = child
+        return resolved, node
+
+    def _node_at(self, parts: list[str]) -> _Node | None:
+        node: _Node | None = self.root
+        for name in parts:
+            if not isinstance(node, _Dir):
+                return None
+            node = node.children.get(name)
+        return node
+
+    def _lookup_quiet(self, path: Path | str, *, follow: bool = True) -> _Node | None:
+        try:
+            return self._walk(path, follow=follow)[1]
+        except OSError:
+            return None
+
+    def _lookup(self, path: Path | str, *, follow: bool = True) -> _Node:
+        node = self._walk(path, follow=follow)[1]
+        if node is None:
+            raise FileNotFoundError(errno.ENOENT, "存在しません", str(path))
+        return node
+
+    def _parent(self, path: Path | str) -> tuple[_Dir, str]:
+        parts = _split(path)
+        if not parts:
+            raise PermissionError(errno.EPERM, "ルートは操作できません", str(path))
+        parent = self._lookup(Path("/" + "/".join(parts[:-1])))
+        if not isinstance(parent, _Dir):
+            raise NotADirectoryError(errno.ENOTDIR, "ディレクトリではありません", str(path))
+        return parent, parts[-1]
+
+    def _make_dirs(self, parts: list[str]) -> _Dir:
+        directory = self.root
+        for name in parts:
+            child = directory.children.get(name)
+            if child is None:
+                child = directory.children[name] = _Dir()
+            elif not isinstance(child, _Dir):
+                raise NotADirectoryError(errno.ENOTDIR, "ディレクトリではありません", name)
+            directory = child
+        return directory
+
+    def _write(self, path: Path, node: _File) -> None:
+        """path（リンクなら辿った先）にファイルを書く."""
+        parts, current = self._walk(path, follow=True)
+        if isinstance(current, _Dir):
+            raise IsADirectoryError(errno.EISDIR, "ディレクトリです", str(path))
+        parent, name = self._parent(Path("/" + "/".join(parts)))
+        parent.children[name] = node
@@ -0,0 +1,104 @@
+"""世代 (generation) 単位でのアトミックな切り替え.
+
+世代ごとに完全なリンクファーム (generations/<番号>/<relative_path> → source) を作り、
+generations/current をその世代へのシンボリックリンクにする。
+インストール先の各パスは generations/current/<relative_path> を指す固定のリンクになるので、
+世代の切り替えもロールバックも current の rename 1回で済む（管理するファイル数によらない）::
+
+    ~/.bashrc → state/<インストール先>/generations/current/.bashrc
+    state/<インストール先>/generations/current → 3
+    state/<インストール先>/generations/3/.bashrc → /path/to/source/.bashrc
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+GENERATIONS_DIR_NAME = "generations"
+CURRENT_NAME = "current"
+# 作成途中の世代ディレクトリの接尾辞（完成後に rename で外す）
+BUILDING_SUFFIX = ".building"
+# インストール成功後に残す世代数
+DEFAULT_KEEP = 10
+
+
+@dataclass
+class GenerationStore:
+    """世代ディレクトリの作成・切り替え・削除."""
+
+    root: Path
+
+    @property
+    def current_path(self) -> Path:
+        """インストール先のリンクが指す固定のパス."""
+        return self.root / CURRENT_NAME
+
+    def link_path(self, relative: Path) -> Path:
+        return self.current_path / relative
+
+    def list(self) -> list[int]:
+        """完成している世代の番号（昇順）."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def current(self) -> int | None:
+        try:
+            return int(os.readlink(self.current_path))
+        except (OSError, ValueError):
+            return None
+
+    def create(self, links: Iterable[tuple[Path, Path, bool]]) -> int:
+        """(relative_path, 参照先, コピーするか) から新しい世代を作り、番号を返す.
+
+        コピーは生成物のように後から書き換わるファイルを世代に固定するために使う。
+        """
+        number = max(self.list(), default=0) + 1
+        building = self.root / f"{number}{BUILDING_SUFFIX}"
+        if building.exists():
+            shutil.rmtree(building)
+        building.mkdir(parents=True)
+
+        created_dirs = {building}
+        for relative, target, copy in links:
+            path = building / relative
+            if path.parent not in created_dirs:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(path.parent)
+            if copy:
+                shutil.copy2(target, path)
+            else:
+                path.symlink_to(target)
+
+        os.replace(building, self.root / str(number))
+        return number
+
+    def activate(self, number: int) -> None:
+        """current を number の世代へアトミックに切り替える."""
+        if not (self.root / str(number)).is_dir():
+            raise ValueError(f"世代 {number} は存在しません")
+        temp = self.root / f".{CURRENT_NAME}.tmp"
+        temp.unlink(missing_ok=True)
+        temp.symlink_to(str(number))
+        os.replace(temp, self.current_path)
+
+    def previous(self) -> int | None:
+        """現在の世代の1つ前の世代."""
+        current = self.current()
+        older = [n for n in self.list() if current is None or n < current]
+        return older[-1] if older else None
+
+    def prune(self, keep: int) -> list[int]:
+        """現在の世代と、新しい方から keep 世代を残して削除する."""
+        current = self.current()
+        numbers = self.list()
+        removed = [n for n in numbers[:-keep] if n != current] if keep > 0 else []
+        for number in removed:
+            shutil.rmtree(self.root / str(number))
+        return removed
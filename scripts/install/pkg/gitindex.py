@@ -0,0 +1,246 @@
+"""git のインデックス (.git/index) から source/ の管理ファイルを列挙する（--git-index）.
+
+source/ が git の作業ツリーにある場合、ディレクトリを走査する代わりにインデックスを
+1回読むだけで追跡中のファイルの一覧が得られる。エディタのスワップファイルや
+ビルドの生成物のような追跡していないファイルは、インストール対象にならない。
+
+インデックスは git を起動せずに直接読む（バージョン 2〜4, SHA-1 / SHA-256）。
+次の場合はそのレイヤーを列挙できないとして None を返し、呼び出し側は通常の走査に戻る:
+
+- レイヤーが git の作業ツリーにない、またはレイヤーの下に追跡中のファイルが1つもない
+- split index・sparse index など、ここで扱わない形式
+- レイヤーの下にサブモジュールがある（中身はインデックスにないので走査する）
+
+各エントリはインデックスに記録された stat（mtime とサイズ）と作業ツリーの lstat を比べる。
+作業ツリーで消しただけで git rm していないファイルは列挙しない（リンク切れを作らない）。
+stat が変わったものは種別（ファイル / リンク）を作業ツリーから取り直し、
+それ以外の種別に変わっていればレイヤーごと走査に戻る。
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+INDEX_SIGNATURE = b"DIRC"
+SUPPORTED_VERSIONS = (2, 3, 4)
+# エントリ先頭の ctime から size までの10個の 32bit 値
+STAT_FIELDS = struct.Struct(">10I")
+MODE_REGULAR = 0o100644
+# ファイル種別 (mode の上位ビット)
+MODE_TYPE_MASK = 0o170000
+MODE_SYMLINK = 0o120000
+MODE_GITLINK = 0o160000
+MODE_DIRECTORY = 0o040000
+# flags のビット
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+FLAG_NAME_MASK = 0x0FFF
+EXTENDED_SKIP_WORKTREE = 0x4000
+# split index の拡張（エントリの一部が別ファイルにある）
+EXTENSION_LINK = b"link"
+
+
+class GitIndexError(ValueError):
+    """インデックスを読めない・扱わない形式."""
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """インデックスの1エントリ（作業ツリーのルートからのパス）."""
+
+    path: str
+    mode: int
+    # インデックスに記録された作業ツリーの stat（mtime はナノ秒, サイズは下位 32bit）
+    mtime_ns: int = 0
+    size: int = 0
+
+    @property
+    def is_symlink(self) -> bool:
+        return self.mode & MODE_TYPE_MASK == MODE_SYMLINK
+
+    @property
+    def is_gitlink(self) -> bool:
+        return self.mode & MODE_TYPE_MASK == MODE_GITLINK
+
+
+def find_git_dir(path: Path) -> tuple[Path, Path] | None:
+    """path を含む作業ツリーのルートと git ディレクトリ. 見つからなければ None.
+
+    .git がファイル（git worktree / サブモジュール）の場合は gitdir: の行を辿る。
+    """
+    for root in (path, *path.parents):
+        dot_git = root / ".git"
+        if dot_git.is_dir():
+            return root, dot_git
+        if dot_git.is_file():
+            try:
+                line = dot_git.read_text(encoding="utf-8").strip()
+            except (OSError, UnicodeDecodeError):
+                return None
+            if not line.startswith("gitdir:"):
+                return None
+            return root, (root / line.removeprefix("gitdir:").strip()).resolve()
+    return None
+
+
+def _oid_size(git_dir: Path) -> int:
+    """オブジェクト ID のバイト数（extensions.objectformat = sha256 なら 32）."""
+    try:
+        config = (git_dir / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return 20
+    for line in config.splitlines():
+        key, _, value = line.partition("=")
+        if key.strip().lower() == "objectformat" and value.strip().lower() == "sha256":
+            return 32
+    return 20
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """インデックス v4 の可変長整数（git の decode_varint と同じ）."""
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def parse_index(data: bytes, *, oid_size: int = 20) -> list[IndexEntry]:
+    """インデックスのバイト列からステージ 0 のエントリを読む（skip-worktree のものは除く）.
+
+    サブモジュール (gitlink) もエントリとして返す。どのレイヤーの下にあるかは呼び出し側で見る。
+    """
+    if len(data) < 12 or data[:4] != INDEX_SIGNATURE:
+        raise GitIndexError("インデックスの形式ではありません")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in SUPPORTED_VERSIONS:
+        raise GitIndexError(f"未対応のインデックスのバージョンです: {version}")
+
+    entries = []
+    offset = 12
+    previous = b""
+    try:
+        for _ in range(count):
+            start = offset
+            fields = STAT_FIELDS.unpack_from(data, offset)
+            mode = fields[6]
+            offset += STAT_FIELDS.size + oid_size
+            (flags,) = struct.unpack_from(">H", data, offset)
+            offset += 2
+            extended = 0
+            if flags & FLAG_EXTENDED:
+                (extended,) = struct.unpack_from(">H", data, offset)
+                offset += 2
+
+            if version == 4:
+                strip, offset = _read_varint(data, offset)
+                end = data.index(b"\0", offset)
+                name = previous[: len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                length = flags & FLAG_NAME_MASK
+                end = offset + length if length < FLAG_NAME_MASK else data.index(b"\0", offset)
+                name = data[offset:end]
+                # エントリ全体を 8 バイト境界まで NUL で埋める（最低1バイト）
+                offset = start + ((end - start + 8) & ~7)
+            previous = name
+
+            if mode & MODE_TYPE_MASK == MODE_DIRECTORY:
+                raise GitIndexError("sparse index は未対応です")
+            if flags & FLAG_STAGE_MASK or extended & EXTENDED_SKIP_WORKTREE:
+                continue
+            mtime_ns = fields[2] * 1_000_000_000 + fields[3]
+            entries.append(IndexEntry(os.fsdecode(name), mode, mtime_ns, fields[9]))
+
+        # 拡張（署名 4 バイト + 長さ 4 バイト）. 末尾のチェックサムの手前まで
+        while offset + 8 <= len(data) - oid_size:
+            signature = data[offset : offset + 4]
+            (size,) = struct.unpack_from(">I", data, offset + 4)
+            if signature == EXTENSION_LINK:
+                raise GitIndexError("split index は未対応です")
+            offset += 8 + size
+    except GitIndexError:
+        raise
+    except (struct.error, IndexError, ValueError) as error:
+        raise GitIndexError(f"インデックスが壊れています: {error}") from error
+    return entries
+
+
+class GitIndexEnumerator:
+    """レイヤーの下で追跡中のファイルを、インデックスから列挙する.
+
+    インデックスは (パス, サイズ, mtime) をキーに覚えておき、変わっていなければ読み直さない。
+    """
+
+    def __init__(self) -> None:
+        self._cache: dict[Path, tuple[tuple[int, int], list[IndexEntry]]] = {}
+        # 最後に読んだインデックスファイル（デーモンの変更検知用）
+        self.index_paths: set[Path] = set()
+
+    def list_layer(self, layer: Path) -> list[IndexEntry] | None:
+        """layer の下で追跡中のエントリ（パスは layer からの相対）. 列挙できなければ None."""
+        layer = layer.resolve()
+        found = find_git_dir(layer)
+        if found is None:
+            return None
+        worktree, git_dir = found
+        try:
+            entries = self._read(git_dir)
+        except (OSError, GitIndexError):
+            return None
+
+        prefix = layer.relative_to(worktree).as_posix()
+        prefix = "" if prefix == "." else prefix + "/"
+        tracked = []
+        for entry in entries:
+            if not entry.path.startswith(prefix):
+                continue
+            # サブモジュールの中身はこのインデックスにないので、レイヤーごと走査に戻す
+            if entry.is_gitlink:
+                return None
+            relative = entry.path[len(prefix) :]
+            try:
+                current = os.lstat(layer / relative)
+            except (FileNotFoundError, NotADirectoryError):
+                # 作業ツリーで消されたファイル
+                continue
+            except OSError:
+                return None
+            mode = _current_mode(entry, current)
+            if mode is None:
+                return None
+            tracked.append(IndexEntry(relative, mode, entry.mtime_ns, entry.size))
+        return tracked or None
+
+    def _read(self, git_dir: Path) -> list[IndexEntry]:
+        path = git_dir / "index"
+        stat = path.stat()
+        key = (stat.st_size, stat.st_mtime_ns)
+        self.index_paths.add(path)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        entries = parse_index(path.read_bytes(), oid_size=_oid_size(git_dir))
+        self._cache[path] = (key, entries)
+        return entries
+
+
+def _current_mode(entry: IndexEntry, current: os.stat_result) -> int | None:
+    """作業ツリーのファイルの種別（インデックスの mode 形式）. ファイルでもリンクでもなければ None.
+
+    インデックスに記録された stat と一致すれば、記録どおりの種別のまま使う。
+    """
+    if current.st_mtime_ns == entry.mtime_ns and current.st_size & 0xFFFFFFFF == entry.size:
+        return entry.mode
+    if stat.S_ISLNK(current.st_mode):
+        return MODE_SYMLINK
+    if stat.S_ISREG(current.st_mode):
+        return entry.mode if not entry.is_symlink else MODE_REGULAR
+    return None
@@ -0,0 +1,113 @@
+"""インストール先ディレクトリ単位と rollbacks/ の排他ロック."""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+
+class LockTimeoutError(RuntimeError):
+    """待機時間内にロックを取得できなかった."""
+
+
+@dataclass
+class DestinationLock:
+    """インストール先ディレクトリそのものに対する advisory ロック (flock).
+
+    ロックファイルを作らず、インストール先ディレクトリを開いた fd に flock をかける。
+    同じ $HOME へのインストールは直列化され、異なる $HOME へのインストールは並列に動ける。
+    プロセスが落ちた場合はカーネルが自動的にロックを解放する。
+    """
+
+    dest_root: Path
+    timeout: float = 30.0
+    poll_interval: float = 0.1
+    on_wait: Callable[[], None] | None = None
+
+    _fd: int | None = None
+
+    def acquire(self) -> None:
+        if self._fd is not None:
+            return
+
+        self.dest_root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.dest_root, os.O_RDONLY)
+        deadline = time.monotonic() + self.timeout
+        waiting = False
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise LockTimeoutError(
+                            f"{self.dest_root} は他のインストール処理が使用中です"
+                            f"（{self.timeout:g}秒待機してもロックを取得できませんでした）"
+                        ) from None
+                    if not waiting and self.on_wait is not None:
+                        self.on_wait()
+                    waiting = True
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> DestinationLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+@dataclass
+class RollbacksLock:
+    """rollbacks/ ディレクトリに対する advisory ロック (flock).
+
+    rollbacks/ はインストール先によらず共有なので、アーカイブの作成とサイズの記録
+    （BackupManager）と GC（RollbackGarbageCollector）をこのロックで直列化する。
+    同じオブジェクトは入れ子で取得でき、最も外側の release で解放する。
+    """
+
+    rollbacks_root: Path
+    timeout: float = 30.0
+
+    _lock: DestinationLock | None = None
+    _depth: int = 0
+
+    def acquire(self) -> None:
+        if self._depth == 0:
+            lock = DestinationLock(dest_root=self.rollbacks_root, timeout=self.timeout)
+            lock.acquire()
+            self._lock = lock
+        self._depth += 1
+
+    def release(self) -> None:
+        if self._depth == 0:
+            return
+        self._depth -= 1
+        if self._depth == 0 and self._lock is not None:
+            self._lock.release()
+            self._lock = None
+
+    def __enter__(self) -> RollbacksLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
@@ -7,9 +7,16 @@
 from __future__ import annotations
 
 import logging
+import queue
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+# 成功メッセージ専用のログレベル（INFO と WARNING の間）
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
 
 class ColorCode:
     """ANSI カラーコード定数"""
@@ -32,16 +39,25 @@ class ColorCode:
 
 
 class ColoredFormatter(logging.Formatter):
-    """カラー対応フォーマッター"""
+    """カラー対応フォーマッター
+
+    タイムスタンプはファイル用の行を作るときだけ計算し、同じ秒の間は使い回す。
+    attach_file_message=False の場合、カラー出力時にファイル用メッセージを作らない
+    （ファイルハンドラーが自前のフォーマッターを持つ ColoredLogger 用）。
+    """
 
-    def __init__(self, use_color: bool = True):
+    def __init__(self, use_color: bool = True, attach_file_message: bool = True):
         super().__init__()
         self.use_color = use_color and sys.stdout.isatty()
+        self.attach_file_message = attach_file_message
+        self._cached_second: int | None = None
+        self._cached_timestamp = ""
 
         # ログレベル別の色設定
         self.colors = {
             logging.DEBUG: ColorCode.CYAN,
             logging.INFO: ColorCode.BLUE,
+            SUCCESS: ColorCode.GREEN,
             logging.WARNING: ColorCode.YELLOW,
             logging.ERROR: ColorCode.RED,
             logging.CRITICAL: ColorCode.MAGENTA,
@@ -51,31 +67,37 @@ class ColoredFormatter(logging.Formatter):
         self.icons = {
             logging.DEBUG: ColorCode.DEBUG,
             logging.INFO: ColorCode.INFO,
+            SUCCESS: ColorCode.SUCCESS,
             logging.WARNING: ColorCode.WARNING,
             logging.ERROR: ColorCode.ERROR,
             logging.CRITICAL: ColorCode.ERROR,
         }
 
+    def _timestamp(self, record: logging.LogRecord) -> str:
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_timestamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S")
+        return self._cached_timestamp
+
+    def _plain(self, record: logging.LogRecord, message: str) -> str:
+        return f"[{self._timestamp(record)}] [{record.levelname}] {message}"
+
     def format(self, record: logging.LogRecord) -> str:
-        # タイムスタンプ付きフォーマット
-        timestamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S")
+        message = record.getMessage()
 
         if self.use_color:
             color = self.colors.get(record.levelno, ColorCode.WHITE)
             icon = self.icons.get(record.levelno, "")
 
-            # コンソール用（カラー + アイコン）
-            console_msg = f"{color}{icon}{ColorCode.RESET} {record.getMessage()}"
-
-            # ファイル用（プレーンテキスト）
-            file_msg = f"[{timestamp}] [{record.levelname}] {record.getMessage()}"
-
-            # recordにファイル用メッセージを保存
-            record.file_message = file_msg
+            # ファイル用（プレーンテキスト）をrecordに保存
+            if self.attach_file_message:
+                record.file_message = self._plain(record, message)
 
-            return console_msg
+            # コンソール用（カラー + アイコン）
+            return f"{color}{icon}{ColorCode.RESET} {message}"
         else:
-            return f"[{timestamp}] [{record.levelname}] {record.getMessage()}"
+            return self._plain(record, message)
 
 
 class FileHandler(logging.FileHandler):
@@ -84,8 +106,15 @@ class FileHandler(logging.FileHandler):
     ColoredFormatterが生成した file_message をそのままファイルに出力する。
     file_message は既に完全なフォーマット済み文字列なので、
     標準のフォーマッターを使わずに直接書き込む。
+
+    flush_every 件ごとに flush する（0 以下なら明示的な flush()/close() まで溜める）。
     """
 
+    def __init__(self, *args, flush_every: int = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flush_every = flush_every
+        self._pending = 0
+
     def emit(self, record: logging.LogRecord):
         try:
             # file_message があればそれを使用（既に完全フォーマット済み）
@@ -98,33 +127,130 @@ class FileHandler(logging.FileHandler):
             # ファイルに書き込み
             stream = self.stream
             stream.write(msg + self.terminator)
-            self.flush()
+            self._pending += 1
+            if 0 < self.flush_every <= self._pending:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self._pending = 0
+
+
+class BatchingQueueHandler(QueueHandler):
+    """レコードを呼び出し側でまとめてからキューに渡すハンドラー
+
+    1件ごとにキューへ渡すとリスナースレッドとの切り替えが毎回発生するため、
+    batch_size 件ごと（WARNING 以上は即座に）リストにしてまとめて渡す。
+    """
+
+    def __init__(self, log_queue, batch_size: int = 256):
+        super().__init__(log_queue)
+        self.batch_size = batch_size
+        self._buffer: list[logging.LogRecord] = []
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # メッセージだけ確定させる（フォーマットはリスナー側で行う）
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._buffer.append(self.prepare(record))
+            if len(self._buffer) >= self.batch_size or record.levelno >= logging.WARNING:
+                self.flush()
         except Exception:
             self.handleError(record)
 
+    def flush(self):
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self.enqueue(batch)
+
+
+class BatchingQueueListener(QueueListener):
+    """BatchingQueueHandler から受け取ったバッチを処理し、まとめて flush するリスナー
+
+    threading.Event を受け取った場合は、それまでの分を書き出した合図としてセットする。
+    """
+
+    def handle(self, batch):
+        if isinstance(batch, threading.Event):
+            for handler in self.handlers:
+                handler.flush()
+            batch.set()
+            return
+        for record in batch:
+            super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
 
 class ColoredLogger:
-    """カラー対応ロガークラス"""
+    """カラー対応ロガークラス
+
+    use_queue=True の場合、ファイル出力はバッチ単位で QueueHandler 経由で別スレッドの
+    リスナーに渡され、キューが空になるまでまとめて書き込まれる。
+    書き出しを保証したいときは flush() / close() を呼ぶ。
+    コンソール出力は print() や入力プロンプトとの順序を保つため常に同期的に行う。
+    """
 
-    def __init__(self, name: str, log_file: Path | None = None):
+    def __init__(self, name: str, log_file: Path | None = None, use_queue: bool = False):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
+        self._listener: QueueListener | None = None
+        self._queue: queue.SimpleQueue | None = None
 
         # 既存のハンドラーをクリア（ファイルを適切に閉じる）
         for handler in self.logger.handlers[:]:
             handler.close()
             self.logger.removeHandler(handler)
 
-        # コンソールハンドラー
+        # コンソールハンドラー（ファイル用メッセージはファイル側で作るので付与しない）
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(ColoredFormatter(use_color=True))
+        console_handler.setFormatter(ColoredFormatter(use_color=True, attach_file_message=False))
         self.logger.addHandler(console_handler)
 
         # ファイルハンドラー（指定された場合のみ）
         if log_file:
-            file_handler = FileHandler(log_file, mode="w", encoding="utf-8")
+            file_handler = FileHandler(
+                log_file, mode="w", encoding="utf-8", flush_every=0 if use_queue else 1
+            )
             file_handler.setFormatter(ColoredFormatter(use_color=False))
-            self.logger.addHandler(file_handler)
+            if use_queue:
+                self._queue = queue.SimpleQueue()
+                self._listener = BatchingQueueListener(self._queue, file_handler)
+                self._listener.start()
+                self.logger.addHandler(BatchingQueueHandler(self._queue))
+            else:
+                self.logger.addHandler(file_handler)
+
+    def flush(self):
+        """溜まっているログを書き出し終えるまで待つ"""
+        for handler in self.logger.handlers:
+            handler.flush()
+        if self._queue is not None:
+            drained = threading.Event()
+            self._queue.put_nowait(drained)
+            drained.wait()
+
+    def close(self):
+        """リスナーを停止し、全ハンドラーを閉じる"""
+        for handler in self.logger.handlers:
+            handler.flush()
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._queue = None
+        for handler in self.logger.handlers[:]:
+            handler.close()
+            self.logger.removeHandler(handler)
 
     def debug(self, message: str):
         """デバッグメッセージ"""
@@ -135,23 +261,8 @@ class ColoredLogger:
         self.logger.info(message)
 
     def success(self, message: str):
-        """成功メッセージ（INFOレベルだが緑色で表示）"""
-        # 成功メッセージ用に一時的にフォーマッターを変更
-        for handler in self.logger.handlers:
-            if isinstance(handler.formatter, ColoredFormatter):
-                original_colors = handler.formatter.colors.copy()
-                original_icons = handler.formatter.icons.copy()
-                handler.formatter.colors[logging.INFO] = ColorCode.GREEN
-                handler.formatter.icons[logging.INFO] = ColorCode.SUCCESS
-
-                self.logger.info(message)
-
-                # 元に戻す
-                handler.formatter.colors = original_colors
-                handler.formatter.icons = original_icons
-                break
-        else:
-            self.logger.info(message)
+        """成功メッセージ（SUCCESS レベル、緑色で表示）"""
+        self.logger.log(SUCCESS, message)
 
     def warning(self, message: str):
         """警告メッセージ"""
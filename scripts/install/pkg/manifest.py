@@ -0,0 +1,94 @@
+"""前回のインストールで張ったリンクの記録（--check 用）.
+
+シェルのログイン時にも実行できるよう、このモジュールは os だけに依存する。
+記録は NUL 区切りのバイト列で、先頭のヘッダーのあとに (リンクの絶対パス, リンク先) が並ぶ::
+
+    dotfiles-links 1 \\0 <dest> \\0 <target> \\0 <dest> \\0 <target> ...
+
+--check は記録されたリンクを readlink して比較するだけなので、
+source/ の大きさに関係なく、管理しているリンクの数に比例した時間で終わる。
+"""
+
+from __future__ import annotations
+
+import os
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .plan.model import PlanEntry
+
+MANIFEST_NAME = "links.manifest"
+MANIFEST_HEADER = b"dotfiles-links 1"
+
+# --check の終了コード
+CHECK_CONVERGED = 0
+CHECK_DRIFTED = 1
+CHECK_UNKNOWN = 3
+
+
+def links_from_entries(entries: Iterable[PlanEntry]) -> dict[bytes, bytes]:
+    """適用後のエントリのうち、source を正しく指しているリンクを集める."""
+
+    links: dict[bytes, bytes] = {}
+    for entry in entries:
+        dest = entry.spec.dest
+        try:
+            target = os.readlink(dest)
+        except OSError:
+            # ディレクトリ・スキップされた既存ファイルなど、リンクでないものは記録しない
+            continue
+        if os.path.realpath(dest) == os.path.realpath(entry.spec.source):
+            links[os.fsencode(os.path.abspath(dest))] = os.fsencode(target)
+    return links
+
+
+def load_manifest(path: str | os.PathLike[str]) -> dict[bytes, bytes] | None:
+    """記録を読み込む. 記録がない・壊れている場合は None."""
+
+    try:
+        with open(path, "rb") as stream:
+            fields = stream.read().split(b"\0")
+    except OSError:
+        return None
+    if fields[0] != MANIFEST_HEADER or len(fields) % 2 != 1:
+        return None
+    return dict(zip(fields[1::2], fields[2::2]))
+
+
+def write_manifest(path: str | os.PathLike[str], links: dict[bytes, bytes]) -> None:
+    """記録を一時ファイル経由でアトミックに書き込む."""
+
+    fields = [MANIFEST_HEADER]
+    for dest, target in sorted(links.items()):
+        fields += (dest, target)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{os.fspath(path)}.tmp"
+    with open(temp, "wb") as stream:
+        stream.write(b"\0".join(fields))
+    os.replace(temp, path)
+
+
+def remove_manifest(path: str | os.PathLike[str]) -> None:
+    """記録を削除する（以後の --check は「不明」になる）."""
+
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def find_drift(links: dict[bytes, bytes]) -> list[str]:
+    """記録と異なる（消えた・別の場所を指す・リンクでなくなった）パスを返す."""
+
+    readlink = os.readlink
+    drifted = []
+    for dest, target in links.items():
+        try:
+            if readlink(dest) == target:
+                continue
+        except OSError:
+            pass
+        drifted.append(os.fsdecode(dest))
+    return drifted
@@ -2,23 +2,177 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import socket
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from enum import Enum
 from pathlib import Path
 
+from ..bundle import ShellBundler
+from ..fs import FileSystem, PosixFS
+from ..gitindex import GitIndexEnumerator, IndexEntry
+from ..templates import TEMPLATE_SUFFIX, TemplateRenderer
+from ..toolbin import BIN_DIR_NAME, TOOL_MANIFEST_NAME, TOOLS_DIR_NAME, ToolLinker
 from .model import ActionType, InstallSpec, Plan, PlanEntry
 
 
+class SourceKind(Enum):
+    """レイヤー内のパスの種類."""
+
+    DIRECTORY = "ディレクトリ"
+    FILE = "ファイル"
+    SYMLINK = "シンボリックリンク"
+
+
+@dataclass(frozen=True)
+class LayerEntry:
+    """マージ後のビューで、あるパスを提供するレイヤー."""
+
+    layer: int
+    source: Path
+    kind: SourceKind
+
+
+@dataclass
+class LayerIndex:
+    """全レイヤーを1回ずつ走査して作る relative_path → レイヤーの索引.
+
+    後のレイヤーが前のレイヤーの同じパスを上書きする。ディレクトリ同士は
+    マージされ、ファイル同士は後のレイヤーが勝つ (shadowed に記録)。
+    ディレクトリとファイルのように種類が違う場合は conflicts に記録する。
+    """
+
+    layers: list[Path]
+    entries: dict[Path, LayerEntry] = field(default_factory=dict)
+    shadowed: dict[Path, list[int]] = field(default_factory=dict)
+    conflicts: dict[Path, list[LayerEntry]] = field(default_factory=dict)
+
+    def add(self, relative: Path, entry: LayerEntry) -> None:
+        current = self.entries.get(relative)
+        if current is None:
+            self.entries[relative] = entry
+            return
+        is_dir = entry.kind is SourceKind.DIRECTORY
+        if is_dir and current.kind is SourceKind.DIRECTORY:
+            return
+        if is_dir or current.kind is SourceKind.DIRECTORY:
+            self.conflicts.setdefault(relative, [current]).append(entry)
+            # ディレクトリを優先して残し、配下のファイルを計画できるようにする
+            if is_dir:
+                self.entries[relative] = entry
+            return
+        self.shadowed.setdefault(relative, [current.layer]).append(entry.layer)
+        self.entries[relative] = entry
+
+    def layer_name(self, layer: int) -> str:
+        return self.layers[layer].name
+
+
+def overlay_dirs(
+    source_dir: Path, names: Sequence[str], *, hostname: str | None = None
+) -> list[Path]:
+    """source_dir に重ねるレイヤー (source.<name>/ と source.<ホスト名>/) を順に返す.
+
+    names のレイヤーは指定順に重ね、最後にホスト名のレイヤーがあれば重ねる。
+    """
+    layers = [source_dir.with_name(f"{source_dir.name}.{name}") for name in names]
+    host = (hostname if hostname is not None else socket.gethostname()).split(".")[0]
+    host_layer = source_dir.with_name(f"{source_dir.name}.{host}")
+    if host and host_layer.is_dir() and host_layer not in layers:
+        layers.append(host_layer)
+    return layers
+
+
 @dataclass
 class PlanBuilder:
-    """source directory の内容から Plan を生成するユーティリティ."""
+    """source directory の内容から Plan を生成するユーティリティ.
+
+    overlays を指定すると source_dir の上にレイヤーとして重ね、
+    後のレイヤーが前のレイヤーの同じパスを上書きしたビューから計画する。
+    renderer を指定すると *.tmpl をテンプレートとして扱い、生成物へのリンクを計画する。
+    bundler を指定すると、シェルの起動ファイルは読み込み先を展開したバンドルへのリンクを計画する。
+    tool_linker を指定すると、~/tools のプログラムへのリンクを ~/bin に計画し、
+    ~/bin に残ったリンク先のないリンクの削除を計画する（コピーモード・assume_empty では計画しない）。
+    copy_mode ではリンクの代わりにファイルのコピーを計画する。
+    link_root を指定すると（世代モード）、インストール先には source ではなく
+    link_root/<relative_path> を指すリンクを計画する。
+    assume_empty ではインストール先を空とみなし（stat しない）、すべてを新規作成として計画する。
+    git_index を指定すると、git の作業ツリーにあるレイヤーは走査せずにインデックスから
+    追跡中のファイルだけを列挙する（列挙できないレイヤーは従来どおり走査する）。
+    source・インストール先の参照はすべて fs を通して行う。
+    """
 
     source_dir: Path
     dest_dir: Path
+    overlays: list[Path] = field(default_factory=list)
+    renderer: TemplateRenderer | None = None
+    bundler: ShellBundler | None = None
+    tool_linker: ToolLinker | None = None
+    copy_mode: bool = False
+    link_root: Path | None = None
+    assume_empty: bool = False
+    git_index: GitIndexEnumerator | None = None
+    fs: FileSystem = field(default_factory=PosixFS)
+
+    @property
+    def layers(self) -> list[Path]:
+        return [self.source_dir, *self.overlays]
+
+    def build_index(self) -> LayerIndex:
+        """各レイヤーを1回ずつ走査して、マージ後のビューの索引を作る."""
+        index = LayerIndex(layers=self.layers)
+        for number, layer in enumerate(index.layers):
+            if not self.fs.is_dir(layer):
+                continue
+            tracked = self.git_index.list_layer(layer) if self.git_index is not None else None
+            if tracked is None:
+                self._scan_layer(index, number, layer)
+            else:
+                self._add_tracked(index, number, layer, tracked)
+        return index
 
-    def build(self) -> Plan:
+    def _add_tracked(
+        self, index: LayerIndex, number: int, layer: Path, tracked: list[IndexEntry]
+    ) -> None:
+        """インデックスのエントリを索引に加える（ディレクトリはファイルのパスから作る）."""
+        directories: set[Path] = set()
+        for entry in tracked:
+            relative = Path(entry.path)
+            for parent in reversed(relative.parents[:-1]):
+                if parent not in directories:
+                    directories.add(parent)
+                    index.add(parent, LayerEntry(number, layer / parent, SourceKind.DIRECTORY))
+            source = layer / relative
+            if not entry.is_symlink:
+                kind = SourceKind.FILE
+            elif self.fs.is_dir(source):
+                # 走査するときと同じく、ディレクトリを指すリンクはディレクトリとして扱う
+                kind = SourceKind.DIRECTORY
+            else:
+                kind = SourceKind.SYMLINK
+            index.add(relative, LayerEntry(number, source, kind))
+
+    def _scan_layer(self, index: LayerIndex, number: int, layer: Path) -> None:
+        pending = [(layer, Path())]
+        while pending:
+            directory, relative_dir = pending.pop()
+            for item in self.fs.scandir(directory):
+                relative = relative_dir / item.name
+                source = item.path
+                # リンク先がディレクトリなら従来どおりディレクトリとして扱い、中には降りない
+                if item.is_dir:
+                    index.add(relative, LayerEntry(number, source, SourceKind.DIRECTORY))
+                    if not item.is_symlink:
+                        pending.append((source, relative))
+                elif item.is_symlink:
+                    index.add(relative, LayerEntry(number, source, SourceKind.SYMLINK))
+                else:
+                    index.add(relative, LayerEntry(number, source, SourceKind.FILE))
+
+    def build(self, index: LayerIndex | None = None) -> Plan:
         source_dir = self.source_dir
         # source directory がないときはどうしようもない
-        if not source_dir.exists():
+        if not self.fs.exists(source_dir):
             return Plan(
                 entries=[
                     PlanEntry(
@@ -30,41 +184,261 @@ class PlanBuilder:
                 ]
             )
 
+        if index is None:
+            index = self.build_index()
+        ordered = sorted(index.entries.items())
         entries: list[PlanEntry] = []
 
         # 先にディレクトリを処理しておく（mkdir -p 相当）
-        for directory in sorted(p for p in source_dir.rglob("*") if p.is_dir()):
-            relative = directory.relative_to(source_dir)
+        for relative, item in ordered:
+            if item.kind is not SourceKind.DIRECTORY:
+                continue
             dest_dir = self.dest_dir / relative
             # 既にディレクトリが存在する場合はスキップ
-            if dest_dir.exists() and dest_dir.is_dir():
+            if not self.assume_empty and self.fs.is_dir(dest_dir):
                 continue
             entries.append(
                 self._plan_ensure_directory(
                     InstallSpec(
-                        source=directory,
+                        source=item.source,
                         relative_path=relative,
                         dest=dest_dir,
                     )
                 )
             )
 
-        for source in sorted(source_dir.rglob("*")):
-            if source.is_dir():
+        # テンプレートの生成は実行時にまとめて行うため、リンクより前に並べる
+        renders: list[PlanEntry] = []
+        files: list[PlanEntry] = []
+        renderer = self.renderer
+        bundler = self.bundler
+        if self.assume_empty:
+            decide = self._plan_copy_create if self.copy_mode else self._plan_link_create
+        elif self.copy_mode:
+            decide = self._decide_copy_action
+        elif self.link_root is not None:
+            link_root = self.link_root
+            decide = lambda spec: self._decide_generation_action(spec, link_root)  # noqa: E731
+        else:
+            decide = self._decide_action
+        for relative, item in ordered:
+            if relative in index.conflicts:
+                files.append(self._plan_layer_conflict(index, relative))
+            if item.kind is SourceKind.DIRECTORY:
                 continue
 
             # symlink は対応しない
-            if source.is_symlink():
-                entries.append(self._plan_unsupported_link(source_dir, source))
+            if item.kind is SourceKind.SYMLINK:
+                files.append(self._plan_unsupported_link(index.layers[item.layer], item.source))
                 continue
 
-            relative = source.relative_to(source_dir)
+            if renderer is not None and relative.name.endswith(TEMPLATE_SUFFIX):
+                target = renderer.target_of(relative)
+                if target in index.entries:
+                    files.append(self._plan_template_conflict(item.source, relative))
+                    continue
+                if not renderer.is_fresh(target, item.source):
+                    renders.append(self._plan_render(item.source, relative, renderer))
+                relative = target
+                source = renderer.output_path(target)
+            elif renderer is not None and self._has_template(index, relative):
+                # 同名のテンプレートがある通常ファイルはテンプレート側でエラーにする
+                continue
+            elif bundler is not None and bundler.handles(relative):
+                if not bundler.is_fresh(relative, item.source):
+                    renders.append(self._plan_bundle(item.source, relative, bundler))
+                spec = InstallSpec(
+                    source=bundler.output_path(relative),
+                    relative_path=relative,
+                    dest=self.dest_dir / relative,
+                )
+                files.append(self._replace_unbundled(decide(spec), item.source))
+                continue
+            else:
+                source = item.source
+
             dest = self.dest_dir / relative
             spec = InstallSpec(source=source, relative_path=relative, dest=dest)
-            entries.append(self._decide_action(spec))
+            files.append(decide(spec))
+
+        tool_linker = self.tool_linker
+        if tool_linker is not None and not (self.copy_mode or self.assume_empty):
+            files.extend(self._plan_tool_links(tool_linker, index, decide))
 
+        entries.extend(renders)
+        entries.extend(files)
         return Plan(entries=entries)
 
+    def _plan_tool_links(
+        self,
+        linker: ToolLinker,
+        index: LayerIndex,
+        decide: Callable[[InstallSpec], PlanEntry],
+    ) -> list[PlanEntry]:
+        """~/tools のプログラムへの ~/bin のリンクと、死んだリンクの削除を計画する."""
+
+        scan = linker.scan()
+        entries = [
+            PlanEntry(
+                spec=InstallSpec(
+                    source=linker.manifest_path,
+                    relative_path=Path(TOOLS_DIR_NAME) / TOOL_MANIFEST_NAME,
+                    dest=Path("-"),
+                ),
+                action=ActionType.ERROR,
+                message=problem,
+                blocked_reason="マニフェストを見直してください",
+            )
+            for problem in scan.problems
+        ]
+        for name, programs in sorted(scan.conflicts.items()):
+            entries.append(
+                PlanEntry(
+                    spec=InstallSpec(
+                        source=programs[0], relative_path=Path(BIN_DIR_NAME) / name, dest=Path("-")
+                    ),
+                    action=ActionType.ERROR,
+                    message=f"同じ名前のツールが複数あります ({', '.join(map(str, programs))})",
+                    blocked_reason=f"{TOOL_MANIFEST_NAME} でどれをリンクするか指定してください",
+                )
+            )
+
+        for name, program in sorted(scan.links.items()):
+            relative = Path(BIN_DIR_NAME) / name
+            spec = InstallSpec(
+                source=program, relative_path=relative, dest=self.dest_dir / relative
+            )
+            if relative in index.entries:
+                entries.append(
+                    PlanEntry(
+                        spec=InstallSpec(source=program, relative_path=relative, dest=Path("-")),
+                        action=ActionType.ERROR,
+                        message="source/ で管理しているファイルと同じ名前のツールです",
+                        blocked_reason="ツールの名前を変えてください",
+                    )
+                )
+                continue
+            entries.append(self._replace_tool_link(decide(spec), linker))
+
+        for link in linker.dead_links():
+            relative = Path(BIN_DIR_NAME) / link.name
+            if link.name in scan.links or relative in index.entries:
+                continue
+            entries.append(
+                PlanEntry(
+                    spec=InstallSpec(source=link, relative_path=relative, dest=link),
+                    action=ActionType.PRUNE,
+                    message="リンク先のツールがなくなったリンクを削除予定",
+                )
+            )
+        return entries
+
+    def _replace_tool_link(self, entry: PlanEntry, linker: ToolLinker) -> PlanEntry:
+        """~/tools を指す以前のリンクは確認なしで張り替え、それ以外の既存ファイルは衝突とする."""
+
+        if entry.action is not ActionType.UPDATE or not entry.needs_confirmation:
+            return entry
+        fs = self.fs
+        dest = entry.spec.dest
+        try:
+            ours = fs.is_symlink(dest) and fs.resolve(dest).is_relative_to(
+                fs.resolve(linker.tools_dir)
+            )
+        except OSError:
+            ours = False
+        if ours:
+            return PlanEntry(
+                spec=entry.spec,
+                action=ActionType.UPDATE,
+                message="ツールへのリンクを張り替え",
+            )
+        return PlanEntry(
+            spec=entry.spec,
+            action=ActionType.ERROR,
+            message="~/bin に同じ名前の既存ファイルがあります",
+            blocked_reason="既存ファイルを移動するか、マニフェストで別の名前を付けてください",
+        )
+
+    @staticmethod
+    def _has_template(index: LayerIndex, relative: Path) -> bool:
+        return relative.with_name(relative.name + TEMPLATE_SUFFIX) in index.entries
+
+    @staticmethod
+    def _plan_render(template: Path, relative: Path, renderer: TemplateRenderer) -> PlanEntry:
+        """テンプレートの（再）生成を計画する."""
+
+        return PlanEntry(
+            spec=InstallSpec(
+                source=template,
+                relative_path=relative,
+                dest=renderer.output_path(renderer.target_of(relative)),
+            ),
+            action=ActionType.RENDER,
+            message="テンプレートから生成予定",
+        )
+
+    @staticmethod
+    def _plan_bundle(source: Path, relative: Path, bundler: ShellBundler) -> PlanEntry:
+        """起動ファイルのバンドルの（再）生成を計画する."""
+
+        return PlanEntry(
+            spec=InstallSpec(
+                source=source, relative_path=relative, dest=bundler.output_path(relative)
+            ),
+            action=ActionType.RENDER,
+            message="読み込み先を展開したバンドルを生成予定",
+        )
+
+    def _replace_unbundled(self, entry: PlanEntry, original: Path) -> PlanEntry:
+        """展開前の source を指すリンク（そのコピー）は、確認なしでバンドルに置き換える."""
+
+        if entry.action is not ActionType.UPDATE or not entry.needs_confirmation:
+            return entry
+        fs = self.fs
+        dest = entry.spec.dest
+        try:
+            if fs.is_symlink(dest):
+                unbundled = fs.resolve(dest) == fs.resolve(original)
+            else:
+                unbundled = self.copy_mode and fs.same_content(original, dest)
+        except OSError:
+            unbundled = False
+        if not unbundled:
+            return entry
+        return PlanEntry(
+            spec=entry.spec,
+            action=ActionType.UPDATE,
+            message="展開前の起動ファイルをバンドルに置き換え",
+        )
+
+    @staticmethod
+    def _plan_template_conflict(template: Path, relative: Path) -> PlanEntry:
+        """同じパスに通常ファイルとテンプレートがある場合のエラーを生成."""
+
+        return PlanEntry(
+            spec=InstallSpec(source=template, relative_path=relative, dest=Path("-")),
+            action=ActionType.ERROR,
+            message="同じパスに通常ファイルとテンプレートがあります",
+            blocked_reason="どちらか一方を削除してください",
+        )
+
+    @staticmethod
+    def _plan_layer_conflict(index: LayerIndex, relative: Path) -> PlanEntry:
+        """レイヤー間で種類が異なるパスのエラーを生成."""
+
+        kinds = ", ".join(
+            f"{index.layer_name(item.layer)}: {item.kind.value}"
+            for item in index.conflicts[relative]
+        )
+        return PlanEntry(
+            spec=InstallSpec(
+                source=index.entries[relative].source, relative_path=relative, dest=Path("-")
+            ),
+            action=ActionType.ERROR,
+            message=f"レイヤー間で種類が異なります ({kinds})",
+            blocked_reason="どちらかのレイヤーの構成を見直してください",
+        )
+
     @staticmethod
     def _plan_ensure_directory(spec: InstallSpec) -> PlanEntry:
         """ホーム側ディレクトリの作成を計画する."""
@@ -92,22 +466,89 @@ class PlanBuilder:
         )
 
     @staticmethod
-    def _decide_action(spec: InstallSpec) -> PlanEntry:
+    def _plan_link_create(spec: InstallSpec) -> PlanEntry:
+        return PlanEntry(spec=spec, action=ActionType.CREATE, message="新規リンクを作成予定")
+
+    @staticmethod
+    def _plan_copy_create(spec: InstallSpec) -> PlanEntry:
+        return PlanEntry(spec=spec, action=ActionType.CREATE, message="新規コピー予定")
+
+    def _decide_copy_action(self, spec: InstallSpec) -> PlanEntry:
+        """コピーモードでのアクションを決定する（内容が同じなら書き換えない）."""
+        fs = self.fs
+        dest = spec.dest
+
+        if not (fs.exists(dest) or fs.is_symlink(dest)):
+            return PlanEntry(spec=spec, action=ActionType.CREATE, message="新規コピー予定")
+
+        if fs.is_symlink(dest):
+            # 以前のリンクモードで張ったリンクは確認なしでコピーに置き換える
+            try:
+                ours = fs.resolve(dest) == fs.resolve(spec.source)
+            except OSError:
+                ours = False
+            return PlanEntry(
+                spec=spec,
+                action=ActionType.UPDATE,
+                message="リンクをコピーに置き換え",
+                needs_confirmation=not ours,
+                needs_backup=True,
+            )
+
+        if fs.is_file(dest):
+            if fs.is_copy_current(spec.source, dest):
+                return PlanEntry(spec=spec, action=ActionType.SKIP, message="既に同じ内容です")
+            return PlanEntry(
+                spec=spec,
+                action=ActionType.UPDATE,
+                message="既存ファイルをバックアップして上書き",
+                needs_confirmation=True,
+                needs_backup=True,
+            )
+
+        return PlanEntry(
+            spec=spec,
+            action=ActionType.ERROR,
+            message="同名のディレクトリが存在するためコピー不可"
+            if fs.is_dir(dest)
+            else "想定外のファイル種別です",
+        )
+
+    def _decide_generation_action(self, spec: InstallSpec, link_root: Path) -> PlanEntry:
+        """世代モードでのアクションを決定する（リンク先は link_root 経由の固定パス）."""
+        dest = spec.dest
+        if self.fs.is_symlink(dest) and self.fs.readlink(dest) == str(
+            link_root / spec.relative_path
+        ):
+            return PlanEntry(spec=spec, action=ActionType.SKIP, message="既に世代のリンクです")
+
+        entry = self._decide_action(spec)
+        if entry.action is ActionType.SKIP:
+            # source を直接指す以前のリンクは、確認なしで世代経由のリンクに張り替える
+            return PlanEntry(
+                spec=spec,
+                action=ActionType.UPDATE,
+                message="リンクを世代経由に張り替え",
+            )
+        return entry
+
+    def _decide_action(self, spec: InstallSpec) -> PlanEntry:
         """InstallSpec のファイル種別を見て適切なアクションを決定する."""
+        fs = self.fs
         dest = spec.dest
 
         # ファイルもシンボリックリンクも存在しない場合は新規作成
         # exists() はリンク先の存在を見るため、壊れたリンクは exists()=False, is_symlink()=True となる
-        if not (dest.exists() or dest.is_symlink()):
+        if not (fs.exists(dest) or fs.is_symlink(dest)):
             return PlanEntry(
                 spec=spec,
                 action=ActionType.CREATE,
                 message="新規リンクを作成予定",
             )
 
-        if dest.is_symlink():
+        if fs.is_symlink(dest):
             try:
-                current = dest.resolve()
+                current = fs.resolve(dest)
             except OSError:
                 return PlanEntry(
                     spec=spec,
@@ -116,7 +557,7 @@ class PlanBuilder:
                     needs_confirmation=True,
                     needs_backup=True,
                 )
-            if current == spec.source.resolve():
+            if current == fs.resolve(spec.source):
                 return PlanEntry(
                     spec=spec,
                     action=ActionType.SKIP,
@@ -130,7 +571,14 @@ class PlanBuilder:
                 needs_backup=True,
             )
 
-        if dest.is_file():
+        if fs.is_file(dest):
+            # 中身が同じならバックアップも確認もせずにリンクへ置き換える
+            if fs.same_content(spec.source, dest):
+                return PlanEntry(
+                    spec=spec,
+                    action=ActionType.ADOPT,
+                    message="同じ内容のファイルをリンクに置き換え",
+                )
             return PlanEntry(
                 spec=spec,
                 action=ActionType.UPDATE,
@@ -139,7 +587,7 @@ class PlanBuilder:
                 needs_backup=True,
             )
 
-        if dest.is_dir():
+        if fs.is_dir(dest):
             return PlanEntry(
                 spec=spec,
                 action=ActionType.ERROR,
@@ -0,0 +1,84 @@
+"""2つの Plan の差分（relative_path ごとの追加・削除・変更）.
+
+両方のエントリを relative_path の昇順に並べてから先頭同士を比べていく
+ソート済みマージで求める。各エントリを1回ずつ見るだけなので計算量は線形で、
+入力がスナップショットのようなストリームならメモリも一定で済む。
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from enum import Enum
+
+from .model import PlanEntry
+
+
+class ChangeKind(Enum):
+    """差分の種類."""
+
+    ADDED = "+"
+    REMOVED = "-"
+    CHANGED = "~"
+
+
+@dataclass(frozen=True)
+class PlanChange:
+    """1パス分の差分. before / after は該当する側がなければ None."""
+
+    kind: ChangeKind
+    path: str
+    before: PlanEntry | None = None
+    after: PlanEntry | None = None
+
+    def describe(self) -> str:
+        if self.kind is ChangeKind.ADDED:
+            return f"{self.kind.value} [{self.after.action.name}] {self.path}"
+        if self.kind is ChangeKind.REMOVED:
+            return f"{self.kind.value} [{self.before.action.name}] {self.path}"
+        return (
+            f"{self.kind.value} {self.path}: {self.before.action.name} → {self.after.action.name}"
+        )
+
+
+def entry_key(entry: PlanEntry) -> str:
+    return str(entry.spec.relative_path)
+
+
+def sorted_entries(entries: Iterable[PlanEntry]) -> list[PlanEntry]:
+    """差分を取れるよう relative_path の昇順に並べる."""
+    return sorted(entries, key=entry_key)
+
+
+def _keyed(entries: Iterable[PlanEntry], side: str) -> Iterator[tuple[str, PlanEntry]]:
+    """(key, entry) を返しながら、昇順に並んでいることを確かめる."""
+    previous = None
+    for entry in entries:
+        key = entry_key(entry)
+        if previous is not None and key < previous:
+            raise ValueError(f"{side} のエントリが relative_path の昇順に並んでいません: {key}")
+        previous = key
+        yield key, entry
+
+
+def diff_plans(before: Iterable[PlanEntry], after: Iterable[PlanEntry]) -> Iterator[PlanChange]:
+    """昇順に並んだ2つのエントリ列の差分を順に返す.
+
+    アクション種別が変わったパスを CHANGED とする。
+    """
+    olds = _keyed(before, "変更前")
+    news = _keyed(after, "変更後")
+    old = next(olds, None)
+    new = next(news, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield PlanChange(ChangeKind.REMOVED, old[0], before=old[1])
+            old = next(olds, None)
+        elif old is None or new[0] < old[0]:
+            yield PlanChange(ChangeKind.ADDED, new[0], after=new[1])
+            new = next(news, None)
+        else:
+            if old[1].action is not new[1].action:
+                yield PlanChange(ChangeKind.CHANGED, new[0], before=old[1], after=new[1])
+            old = next(olds, None)
+            new = next(news, None)
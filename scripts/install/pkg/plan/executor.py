@@ -2,14 +2,45 @@
 
 from __future__ import annotations
 
-import os
+import time
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
+from pathlib import Path
 
 from ..backup_store import BackupManager
+from ..bundle import ShellBundler
+from ..events import EventWriter
+from ..fs import FileSystem, PosixFS
+from ..generations import GenerationStore
 from ..logger import ColoredLogger
+from ..policy import Answer, AnswerPolicy
+from ..preview import DiffPreviewer
+from ..progress import ProgressRenderer
+from ..templates import TemplateRenderer
 from ..ui import UserInterface
+from .journal import InstallJournal, JournalState
 from .model import ActionType, Plan, PlanEntry
 
+# symlink（コピーモードではファイル）をアトミックに置き換えるための一時ファイル名の接尾辞
+TEMP_LINK_SUFFIX = ".dotfiles-tmp"
+
+
+# 世代のリンクファームに含めるアクション（インストール先にリンクが張られるもの）
+FARM_ACTIONS = frozenset(
+    {
+        ActionType.SKIP,
+        ActionType.CREATE,
+        ActionType.ADOPT,
+        ActionType.UPDATE,
+        ActionType.BACKUP_ONLY,
+    }
+)
+
+
+def temp_link_path(dest: Path) -> Path:
+    """dest と同じディレクトリに置く一時リンク（一時ファイル）のパス."""
+    return dest.with_name(f".{dest.name}{TEMP_LINK_SUFFIX}")
+
 
 @dataclass
 class ExecutionReport:
@@ -21,67 +52,336 @@ class ExecutionReport:
 
 
 class PlanExecutor:
-    """Plan をもとにファイル操作を行う."""
+    """Plan をもとにファイル操作を行う.
+
+    progress を渡すとサマリーのみのモードになり、エントリごとの行は DEBUG に落として
+    警告・エラーだけを表示する（代わりに進捗をライブ表示する）。
+    generations を渡すと（世代モード）、実行前に Plan 全体のリンクファームを新しい世代として
+    作って有効化し、インストール先には世代の固定パスを指すリンクを張る。
+    インストール先の操作はすべて fs を通して行う。
+    previewer を渡すと、確認を求める前に既存ファイルと source の差分を表示する。
+    """
 
     def __init__(
-        self, ui: UserInterface, logger: ColoredLogger, backup_manager: BackupManager
+        self,
+        ui: UserInterface,
+        logger: ColoredLogger,
+        backup_manager: BackupManager,
+        journal: InstallJournal | None = None,
+        events: EventWriter | None = None,
+        progress: ProgressRenderer | None = None,
+        policy: AnswerPolicy | None = None,
+        renderer: TemplateRenderer | None = None,
+        bundler: ShellBundler | None = None,
+        copy_mode: bool = False,
+        generations: GenerationStore | None = None,
+        fs: FileSystem | None = None,
+        previewer: DiffPreviewer | None = None,
     ) -> None:
         self.ui = ui
         self.logger = logger
         self.backup_manager = backup_manager
+        self.journal = journal
+        self.events = events
+        self.progress = progress
+        self.policy = policy
+        self.renderer = renderer
+        self.bundler = bundler
+        self.copy_mode = copy_mode
+        self.generations = generations
+        self.fs = fs if fs is not None else PosixFS()
+        self.previewer = previewer
+        # テンプレートごとの生成結果（失敗時はエラーメッセージ）と、生成に失敗した出力先
+        self._render_results: dict[Path, str | None] = {}
+        self._failed_outputs: set[Path] = set()
+        # 直近のエントリでバックアップに書き込んだバイト数（イベント出力用）
+        self._backup_bytes = 0
 
     def execute(self, plan: Plan, *, dry_run: bool = False) -> ExecutionReport:
-        report = ExecutionReport()
+        numbered = list(enumerate(plan.entries))
+        if self.generations is not None and not dry_run:
+            self._activate_generation(self.generations, plan.entries)
+        if self.journal is not None and not dry_run:
+            self.journal.record_intents(
+                (seq, entry) for seq, entry in numbered if self._is_journaled(entry)
+            )
+        return self._execute_entries(numbered, dry_run=dry_run)
 
-        if not dry_run and any(entry.needs_backup for entry in plan.entries):
-            self.backup_manager.start()
+    def resume(self, state: JournalState) -> ExecutionReport:
+        """ジャーナルに残った未完了エントリだけを実行する（source/ の再走査はしない）."""
 
-        for entry in plan.entries:
-            try:
-                handled = self._handle_entry(entry, dry_run=dry_run)
-            except Exception as error:  # pragma: no cover - ログを出して続行
-                self.logger.error(f"処理中にエラー: {entry.spec.relative_path} - {error}")
-                report.errors += 1
+        pending = state.pending()
+        if state.archive is not None:
+            self.backup_manager.resume(state.archive)
+
+        remaining = []
+        for seq, entry in pending:
+            # rename 直前で中断された一時リンクを片付ける
+            self.fs.unlink(temp_link_path(entry.spec.dest), missing_ok=True)
+            if self._already_applied(entry):
+                self._log_entry("info", f"適用済み: {entry.spec.relative_path}")
+                if self.journal is not None:
+                    self.journal.record_done(seq, "applied")
                 continue
+            remaining.append((seq, entry))
+
+        return self._execute_entries(remaining, dry_run=False)
+
+    def _execute_entries(
+        self, numbered: Sequence[tuple[int, PlanEntry]], *, dry_run: bool
+    ) -> ExecutionReport:
+        report = ExecutionReport()
 
-            if handled:
-                report.applied += 1
-            else:
-                report.skipped += 1
+        if (
+            not dry_run
+            and not self.backup_manager.is_active()
+            and any(entry.needs_backup for _, entry in numbered)
+        ):
+            # GC が未完了のジャーナルから参照を見つけられるよう、記録までロックを保持する
+            with self.backup_manager.locked():
+                archive = self.backup_manager.start()
+                if self.journal is not None:
+                    self.journal.record_archive(archive)
+
+        if not dry_run:
+            self._render_batch(entry for _, entry in numbered)
+
+        journal = self.journal if not dry_run else None
+        events = self.events
+        progress = self.progress
+        if progress is not None:
+            progress.start("DRY-RUN" if dry_run else "実行中", len(numbered))
+        try:
+            for seq, entry in numbered:
+                if events is not None:
+                    self._backup_bytes = 0
+                    started = time.perf_counter()
+                failure = None
+                try:
+                    handled = self._handle_entry(entry, dry_run=dry_run)
+                except Exception as error:  # pragma: no cover - ログを出して続行
+                    self._log("error", f"処理中にエラー: {entry.spec.relative_path} - {error}")
+                    report.errors += 1
+                    status = "error"
+                    failure = str(error)
+                else:
+                    if handled:
+                        report.applied += 1
+                        status = "applied"
+                    else:
+                        report.skipped += 1
+                        status = "skipped"
+
+                if journal is not None and self._is_journaled(entry):
+                    journal.record_done(seq, status)
+                if events is not None:
+                    events.emit(
+                        "result",
+                        action=entry.action.name,
+                        path=str(entry.spec.relative_path),
+                        status=status,
+                        duration=round(time.perf_counter() - started, 6),
+                        backup_bytes=self._backup_bytes,
+                        error=failure,
+                        dry_run=dry_run,
+                    )
+                if progress is not None:
+                    progress.advance(entry.action)
+        except BaseException:
+            if progress is not None:
+                progress.clear()
+            # 中断時も書き込み済みのレコードは確実にディスクへ残す
+            if journal is not None:
+                journal.close()
+            raise
+
+        if progress is not None:
+            progress.finish()
+
+        if self.backup_manager.is_active():
+            self.backup_manager.finish()
+
+        if journal is not None:
+            journal.complete()
 
         return report
 
+    def _activate_generation(
+        self, generations: GenerationStore, entries: Sequence[PlanEntry]
+    ) -> None:
+        """Plan 全体から新しい世代のリンクファームを作り、current を切り替える.
+
+        生成物は後のインストールで書き換わるため、世代にコピーして固定する。
+        """
+        self._render_batch(entries)
+        generated_dirs = [
+            generator.generated_dir
+            for generator in (self.renderer, self.bundler)
+            if generator is not None
+        ]
+        links = []
+        for entry in entries:
+            if entry.action not in FARM_ACTIONS or entry.spec.source in self._failed_outputs:
+                continue
+            source = entry.spec.source
+            generated = any(source.is_relative_to(d) for d in generated_dirs)
+            links.append((entry.spec.relative_path, self.fs.resolve(source), generated))
+        number = generations.create(links)
+        generations.activate(number)
+        self._log_entry("success", f"世代 {number} を有効化（{len(links)}件）")
+
+    def _render_batch(self, entries: Iterable[PlanEntry]) -> None:
+        """RENDER エントリのテンプレートとバンドルをまとめて生成しておく（結果はエントリごとに報告）."""
+        # 世代モードで生成済みのものは作り直さない
+        renders = [
+            entry
+            for entry in entries
+            if entry.action is ActionType.RENDER
+            and entry.spec.relative_path not in self._render_results
+        ]
+        if not renders:
+            return
+        bundler = self.bundler
+        bundles = [e for e in renders if bundler is not None and bundler.owns(e.spec.dest)]
+        templates = [e for e in renders if bundler is None or not bundler.owns(e.spec.dest)]
+        results: dict[Path, str | None] = {}
+        if bundler is not None and bundles:
+            results.update(
+                bundler.bundle_batch((e.spec.relative_path, e.spec.source) for e in bundles)
+            )
+        if templates and self.renderer is None:
+            results.update(
+                dict.fromkeys(
+                    (entry.spec.relative_path for entry in templates),
+                    "レンダラーが設定されていません",
+                )
+            )
+        elif templates:
+            target_of = self.renderer.target_of
+            rendered = self.renderer.render_batch(
+                (target_of(entry.spec.relative_path), entry.spec.source) for entry in templates
+            )
+            results.update(
+                (entry.spec.relative_path, rendered[target_of(entry.spec.relative_path)])
+                for entry in templates
+            )
+        self._render_results.update(results)
+        self._failed_outputs.update(
+            entry.spec.dest for entry in renders if results[entry.spec.relative_path] is not None
+        )
+
+    def _log(self, level: str, message: str) -> None:
+        """進捗表示の行を消してからログを出す."""
+        if self.progress is not None:
+            self.progress.clear()
+        getattr(self.logger, level)(message)
+
+    def _log_entry(self, level: str, message: str) -> None:
+        """エントリごとの通常の行. サマリーのみのモードでは DEBUG に落とす."""
+        if self.progress is not None:
+            level = "debug"
+        self._log(level, message)
+
+    def _answer_for(self, entry: PlanEntry) -> Answer:
+        """ポリシーがあれば確認への回答を決める（なければ対話で確認する）."""
+        if self.policy is None:
+            return Answer.ASK
+        return self.policy.decide(entry.spec.relative_path, entry.action.name)
+
+    @staticmethod
+    def _is_journaled(entry: PlanEntry) -> bool:
+        """ファイルシステムを変更し得るエントリだけをジャーナルに記録する."""
+        return entry.action not in {ActionType.SKIP, ActionType.ERROR}
+
+    def _already_applied(self, entry: PlanEntry) -> bool:
+        fs = self.fs
+        dest = entry.spec.dest
+        if entry.action is ActionType.ENSURE_DIR:
+            return fs.is_dir(dest)
+        if entry.action is ActionType.RENDER:
+            return False
+        if entry.action is ActionType.PRUNE:
+            return not fs.is_symlink(dest)
+        if self.copy_mode:
+            return fs.is_copy_current(entry.spec.source, dest)
+        if not fs.is_symlink(dest):
+            return False
+        if self.generations is not None:
+            return fs.readlink(dest) == str(self.generations.link_path(entry.spec.relative_path))
+        return fs.readlink(dest) == str(fs.resolve(entry.spec.source))
+
     def _handle_entry(self, entry: PlanEntry, *, dry_run: bool) -> bool:
         action = entry.action
 
         if action is ActionType.ERROR:
-            self.logger.warning(entry.describe())
+            self._log("warning", entry.describe())
             return False
 
         if action is ActionType.ENSURE_DIR:
             return self._ensure_directory(entry, dry_run=dry_run)
 
+        if action is ActionType.RENDER:
+            return self._render_template(entry, dry_run=dry_run)
+
         if action is ActionType.SKIP:
-            self.logger.info(entry.describe())
+            self._log_entry("info", entry.describe())
             return False
 
-        if action in {ActionType.CREATE, ActionType.UPDATE, ActionType.BACKUP_ONLY}:
+        if action is ActionType.PRUNE:
+            return self._prune_link(entry, dry_run=dry_run)
+
+        if action in {
+            ActionType.CREATE,
+            ActionType.ADOPT,
+            ActionType.UPDATE,
+            ActionType.BACKUP_ONLY,
+        }:
             return self._process_file(entry, dry_run=dry_run)
 
-        self.logger.warning(f"未対応のアクション種別: {action}")
+        self._log("warning", f"未対応のアクション種別: {action}")
         return False
 
     def _ensure_directory(self, entry: PlanEntry, *, dry_run: bool) -> bool:
         dest_dir = entry.spec.dest
         if dry_run:
-            self.logger.info(f"[DRY-RUN] mkdir -p {entry.spec.relative_path}")
+            self._log_entry("info", f"[DRY-RUN] mkdir -p {entry.spec.relative_path}")
+            return False
+
+        if self.fs.exists(dest_dir):
+            return False
+
+        self.fs.mkdir(dest_dir, parents=True, exist_ok=True)
+        self._log_entry("success", f"ディレクトリ作成: {entry.spec.relative_path}")
+        return True
+
+    def _prune_link(self, entry: PlanEntry, *, dry_run: bool) -> bool:
+        dest = entry.spec.dest
+        if dry_run:
+            self._log_entry("info", f"[DRY-RUN] {entry.describe()}")
+            return False
+
+        fs = self.fs
+        # 計画の後でリンク先が戻っていれば残す
+        if not fs.is_symlink(dest) or fs.exists(dest):
             return False
+        fs.unlink(dest)
+        self._log_entry("success", f"削除: {entry.spec.relative_path}")
+        return True
 
-        if dest_dir.exists():
+    def _render_template(self, entry: PlanEntry, *, dry_run: bool) -> bool:
+        if dry_run:
+            self._log_entry("info", f"[DRY-RUN] {entry.describe()}")
             return False
 
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        self.logger.success(f"ディレクトリ作成: {entry.spec.relative_path}")
+        kind = (
+            "バンドル"
+            if self.bundler is not None and self.bundler.owns(entry.spec.dest)
+            else "テンプレート"
+        )
+        failure = self._render_results.get(entry.spec.relative_path, "生成されていません")
+        if failure is not None:
+            raise RuntimeError(f"{kind}の生成に失敗: {failure}")
+        self._log_entry("success", f"{kind}生成: {entry.spec.relative_path}")
         return True
 
     def _process_file(self, entry: PlanEntry, *, dry_run: bool) -> bool:
@@ -89,34 +389,65 @@ class PlanExecutor:
         source_path = entry.spec.source
 
         if dry_run:
-            self.logger.info(f"[DRY-RUN] {entry.describe()}")
+            self._log_entry("info", f"[DRY-RUN] {entry.describe()}")
             return False
 
-        if entry.needs_confirmation and not self.ui.confirm(
-            f"{entry.spec.relative_path} を処理しますか?", default_yes=True
-        ):
-            self.logger.info(f"スキップ: {entry.spec.relative_path}")
-            return False
+        if source_path in self._failed_outputs:
+            raise RuntimeError("テンプレートの生成に失敗したためリンクしません")
+
+        needs_backup = entry.needs_backup
+        if entry.needs_confirmation:
+            answer = self._answer_for(entry)
+            if answer is Answer.ASK:
+                if self.progress is not None:
+                    self.progress.clear()
+                if self.previewer is not None:
+                    self.ui.show_preview(self.previewer.preview(entry))
+                answer = (
+                    Answer.BACKUP_AND_OVERWRITE
+                    if self.ui.confirm(
+                        f"{entry.spec.relative_path} を処理しますか?", default_yes=True
+                    )
+                    else Answer.SKIP
+                )
+            if answer is Answer.SKIP:
+                self._log_entry("info", f"スキップ: {entry.spec.relative_path}")
+                return False
+            if answer is Answer.OVERWRITE:
+                needs_backup = False
 
-        if entry.needs_backup and dest_path.exists() or dest_path.is_symlink():
+        fs = self.fs
+        if needs_backup and (fs.exists(dest_path) or fs.is_symlink(dest_path)):
             relative = entry.spec.relative_path
             try:
-                self.backup_manager.backup(dest_path, relative)
-                self.logger.info(f"バックアップ: {relative}")
+                self._backup_bytes += self.backup_manager.backup(dest_path, relative)
+                self._log_entry("info", f"バックアップ: {relative}")
             except Exception as error:
-                self.logger.warning(f"バックアップ失敗: {relative} - {error}")
+                self._log("warning", f"バックアップ失敗: {relative} - {error}")
 
-        if dest_path.exists() or dest_path.is_symlink():
-            dest_path.unlink()
+        fs.mkdir(dest_path.parent, parents=True, exist_ok=True)
 
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.copy_mode:
+            # 一時ファイルに書いてから rename で置き換える（書きかけのファイルは見えない）
+            fs.copy_file_atomic(source_path, dest_path, temp_link_path(dest_path))
+            self._log_entry("success", f"コピー: {entry.spec.relative_path}")
+            return True
 
-        if source_path.is_symlink():
-            link_target = os.readlink(source_path)
-            dest_path.symlink_to(link_target)
+        if self.generations is not None:
+            # 世代の固定パスを指す（世代の切り替えでリンクを張り直す必要がない）
+            link_target = str(self.generations.link_path(entry.spec.relative_path))
+        elif fs.is_symlink(source_path):
+            link_target = fs.readlink(source_path)
         else:
             # 絶対パスでシンボリックリンクを作成
-            dest_path.symlink_to(source_path.resolve())
+            link_target = str(fs.resolve(source_path))
+
+        # 一時リンクを作ってから rename で置き換える.
+        # 既存ファイルを消してからリンクを作るまでの間に中断されても dest が消えたままにならない
+        temp_link = temp_link_path(dest_path)
+        fs.unlink(temp_link, missing_ok=True)
+        fs.symlink(link_target, temp_link)
+        fs.replace(temp_link, dest_path)
 
-        self.logger.success(f"適用: {entry.spec.relative_path}")
+        self._log_entry("success", f"適用: {entry.spec.relative_path}")
         return True
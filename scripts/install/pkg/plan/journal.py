@@ -0,0 +1,168 @@
+"""中断からの再開のための先行書き込みジャーナル (write-ahead journal).
+
+1行1レコードの JSON を追記していく。レコード種別:
+
+- begin: ジャーナルの開始（source/dest などのメタ情報）
+- intent: これから処理するエントリ（seq 付き）. 実行開始前にまとめて書き込み fsync する
+- archive: 今回のバックアップ先アーカイブ
+- done: seq のエントリの処理が終わった（status: applied/skipped/error）
+- end: 全エントリの処理が終わった（この後ジャーナルは削除される）
+
+done は一定件数ごとにまとめて fsync する。クラッシュで done が失われても、
+再開時には冪等な処理で「既に適用済み」と判定されるため問題にならない。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .model import ActionType, InstallSpec, PlanEntry
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+def entry_to_record(seq: int, entry: PlanEntry) -> dict[str, Any]:
+    spec = entry.spec
+    return {
+        "type": "intent",
+        "seq": seq,
+        "action": entry.action.name,
+        "rel": str(spec.relative_path),
+        "src": str(spec.source),
+        "dest": str(spec.dest),
+        "message": entry.message,
+        "confirm": entry.needs_confirmation,
+        "backup": entry.needs_backup,
+    }
+
+
+def entry_from_record(record: dict[str, Any]) -> PlanEntry:
+    return PlanEntry(
+        spec=InstallSpec(
+            source=Path(record["src"]),
+            relative_path=Path(record["rel"]),
+            dest=Path(record["dest"]),
+        ),
+        action=ActionType[record["action"]],
+        message=record.get("message", ""),
+        needs_confirmation=record.get("confirm", False),
+        needs_backup=record.get("backup", False),
+    )
+
+
+@dataclass
+class JournalState:
+    """ジャーナルを読み込んだ結果."""
+
+    header: dict[str, Any] = field(default_factory=dict)
+    archive: Path | None = None
+    intents: dict[int, PlanEntry] = field(default_factory=dict)
+    done: set[int] = field(default_factory=set)
+    finished: bool = False
+
+    def pending(self) -> list[tuple[int, PlanEntry]]:
+        """まだ完了していないエントリを seq 順に返す."""
+        return [(seq, self.intents[seq]) for seq in sorted(self.intents) if seq not in self.done]
+
+
+class InstallJournal:
+    """追記専用のジャーナルファイル."""
+
+    def __init__(self, path: Path, *, sync_every: int = 64) -> None:
+        self.path = path
+        self.sync_every = sync_every
+        self._stream = None
+        self._unsynced = 0
+
+    @classmethod
+    def create(cls, path: Path, header: dict[str, Any], **kwargs: Any) -> InstallJournal:
+        """既存のジャーナルを破棄して新しく書き始める."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        journal = cls(path, **kwargs)
+        journal._stream = path.open("w", encoding="utf-8", buffering=1 << 16)
+        journal._write({"type": "begin", **header})
+        journal.sync()
+        return journal
+
+    @classmethod
+    def reopen(cls, path: Path, **kwargs: Any) -> InstallJournal:
+        """既存のジャーナルに追記する（--resume 用）."""
+        journal = cls(path, **kwargs)
+        journal._stream = path.open("a", encoding="utf-8", buffering=1 << 16)
+        return journal
+
+    @staticmethod
+    def load(path: Path) -> JournalState | None:
+        """ジャーナルを読み込む. 存在しなければ None.
+
+        クラッシュで途中まで書かれた最終行などの壊れた行は無視する。
+        """
+        try:
+            stream = path.open(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+        state = JournalState()
+        with stream:
+            for line in stream:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                kind = record.get("type")
+                if kind == "begin":
+                    state.header = record
+                elif kind == "intent":
+                    state.intents[record["seq"]] = entry_from_record(record)
+                elif kind == "archive":
+                    state.archive = Path(record["path"])
+                elif kind == "done":
+                    state.done.add(record["seq"])
+                elif kind == "end":
+                    state.finished = True
+        return state
+
+    def record_intents(self, numbered_entries: Iterable[tuple[int, PlanEntry]]) -> None:
+        """処理予定のエントリをまとめて書き込み、実行開始前に fsync する."""
+        for seq, entry in numbered_entries:
+            self._write(entry_to_record(seq, entry))
+        self.sync()
+
+    def record_archive(self, archive: Path) -> None:
+        """バックアップ先は再開時に必須なので即座に fsync する."""
+        self._write({"type": "archive", "path": str(archive)})
+        self.sync()
+
+    def record_done(self, seq: int, status: str) -> None:
+        self._write({"type": "done", "seq": seq, "status": status})
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def complete(self) -> None:
+        """全件処理済み. 終了レコードを書いてからジャーナルを削除する."""
+        self._write({"type": "end"})
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def sync(self) -> None:
+        if self._stream is None:
+            return
+        self._stream.flush()
+        os.fsync(self._stream.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._stream is None:
+            return
+        self.sync()
+        self._stream.close()
+        self._stream = None
+
+    def _write(self, record: dict[str, Any]) -> None:
+        self._stream.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
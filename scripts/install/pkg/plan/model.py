@@ -12,10 +12,13 @@ class ActionType(Enum):
     """インストール時に取り得る処理種別."""
 
     ENSURE_DIR = auto()
+    RENDER = auto()
     SKIP = auto()
     CREATE = auto()
+    ADOPT = auto()
     UPDATE = auto()
     BACKUP_ONLY = auto()
+    PRUNE = auto()
     ERROR = auto()
 
 
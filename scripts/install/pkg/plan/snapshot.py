@@ -0,0 +1,59 @@
+"""Plan のスナップショット（後から差分を取るために保存した計画）.
+
+1行1 JSON で、先頭行がヘッダー、以降がエントリ（relative_path の昇順）::
+
+    {"type": "plan", "version": 1, "source": "...", "dest": "...", "created_at": ...}
+    {"type": "entry", "seq": 0, "action": "SKIP", "rel": ".bashrc", ...}
+
+エントリはジャーナルと同じ形式で、昇順に並べて保存するので
+読み込み側は全体をメモリに載せずに先頭から順に差分を取れる。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from .diff import sorted_entries
+from .journal import entry_from_record, entry_to_record
+from .model import PlanEntry
+
+SNAPSHOT_VERSION = 1
+
+
+def write_snapshot(path: Path, entries: Iterable[PlanEntry], **header: Any) -> None:
+    """エントリを昇順に並べてスナップショットを書き込む."""
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    temp = path.with_name(f".{path.name}.tmp")
+    with temp.open("w", encoding="utf-8") as stream:
+        meta = {"type": "plan", "version": SNAPSHOT_VERSION, "created_at": time.time(), **header}
+        stream.write(encode(meta) + "\n")
+        for seq, entry in enumerate(sorted_entries(entries)):
+            record = entry_to_record(seq, entry)
+            record["type"] = "entry"
+            stream.write(encode(record) + "\n")
+    os.replace(temp, path)
+
+
+def is_snapshot(path: Path) -> bool:
+    """path がスナップショットのファイルか（ディレクトリなら False）."""
+    if not path.is_file():
+        return False
+    with path.open("rb") as stream:
+        return stream.read(16).startswith(b'{"type":"plan"')
+
+
+def iter_snapshot(path: Path) -> Iterator[PlanEntry]:
+    """スナップショットのエントリを先頭から1件ずつ読み出す."""
+    with path.open(encoding="utf-8") as stream:
+        header = json.loads(stream.readline() or "null")
+        if not isinstance(header, dict) or header.get("type") != "plan":
+            raise ValueError(f"プランのスナップショットではありません: {path}")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"未対応のスナップショットのバージョンです: {path}")
+        for line in stream:
+            yield entry_from_record(json.loads(line))
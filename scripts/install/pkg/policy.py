@@ -0,0 +1,120 @@
+"""無人実行のための宣言的な回答ポリシー.
+
+ポリシーファイル (JSON) の例::
+
+    {
+      "default": "ask",
+      "rules": [
+        {"path": ".bashrc", "answer": "skip"},
+        {"path": ".config/*", "action": ["UPDATE"], "answer": "backup-and-overwrite"},
+        {"path": "*", "action": "RESTORE", "answer": "overwrite"}
+      ]
+    }
+
+- path: relative_path に対する fnmatch 形式のパターン（* は / も含めて一致）
+- action: 対象とするアクション種別（ActionType 名、ロールバック時は RESTORE）. 省略時はすべて
+- answer: ask / overwrite / skip / backup-and-overwrite
+
+ルールは上から順に評価され、最初に一致したものが採用される。
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import re
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+# ロールバック時の確認に使うアクション名
+RESTORE_ACTION = "RESTORE"
+
+
+class Answer(Enum):
+    """確認に対する回答."""
+
+    ASK = "ask"
+    OVERWRITE = "overwrite"
+    SKIP = "skip"
+    BACKUP_AND_OVERWRITE = "backup-and-overwrite"
+
+
+@dataclass(frozen=True)
+class PolicyRule:
+    """ポリシーの1ルール."""
+
+    pattern: str
+    answer: Answer
+    actions: frozenset[str] | None = None
+
+    def applies_to(self, action: str) -> bool:
+        return self.actions is None or action in self.actions
+
+
+class AnswerPolicy:
+    """ルールをアクション種別ごとに1つの正規表現へまとめて保持するマッチャー.
+
+    完全一致のパターンは辞書で引き、glob パターンは名前付きグループの
+    選択 (a|b|c) にまとめるので、1パスあたりの判定は辞書引き1回と正規表現1回で済む。
+    """
+
+    def __init__(self, rules: list[PolicyRule], default: Answer = Answer.ASK) -> None:
+        self.rules = rules
+        self.default = default
+        self._compiled: dict[str, tuple[dict[str, int], re.Pattern[str] | None]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> AnswerPolicy:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        try:
+            default = Answer(data.get("default", Answer.ASK.value))
+            rules = []
+            for raw in data.get("rules", []):
+                actions = raw.get("action")
+                if isinstance(actions, str):
+                    actions = [actions]
+                rules.append(
+                    PolicyRule(
+                        pattern=raw["path"],
+                        answer=Answer(raw["answer"]),
+                        actions=frozenset(a.upper() for a in actions) if actions else None,
+                    )
+                )
+        except (KeyError, ValueError) as error:
+            raise ValueError(f"ポリシーファイルの形式が不正です: {path}: {error}") from error
+        return cls(rules, default=default)
+
+    def decide(self, relative_path: Path | str, action: str) -> Answer:
+        literals, pattern = self._matcher_for(action)
+        path = str(relative_path)
+
+        # 完全一致と glob のうち、先に書かれたルールを優先する
+        literal_index = literals.get(path)
+        glob_index = None
+        if pattern is not None:
+            match = pattern.match(path)
+            if match is not None:
+                glob_index = int(match.lastgroup[1:])
+
+        candidates = [i for i in (literal_index, glob_index) if i is not None]
+        if not candidates:
+            return self.default
+        return self.rules[min(candidates)].answer
+
+    def _matcher_for(self, action: str) -> tuple[dict[str, int], re.Pattern[str] | None]:
+        compiled = self._compiled.get(action)
+        if compiled is None:
+            literals: dict[str, int] = {}
+            alternatives = []
+            for index, rule in enumerate(self.rules):
+                if not rule.applies_to(action):
+                    continue
+                if any(ch in rule.pattern for ch in "*?["):
+                    alternatives.append(f"(?P<r{index}>{fnmatch.translate(rule.pattern)})")
+                else:
+                    literals.setdefault(rule.pattern, index)
+            pattern = re.compile("|".join(alternatives)) if alternatives else None
+            compiled = (literals, pattern)
+            self._compiled[action] = compiled
+        return compiled
@@ -0,0 +1,186 @@
+"""確認が必要なエントリの差分プレビュー（--show-diff）.
+
+既存のインストール先と source の unified diff を、表示するときに初めて計算する。
+あるエントリを表示するときに、続く数件をバックグラウンドのスレッドで先に計算しておくので、
+確認を続けて行う間に待たされない::
+
+    with DiffPreviewer(confirmations) as previewer:
+        for entry in confirmations:
+            print(previewer.preview(entry))
+
+大きなファイルとバイナリファイルは差分を取らず、サイズとダイジェストだけを表示する。
+テンプレートとバンドルの生成物はまだ書かれていない（--dry-run）ことがあるので、
+計画の RENDER エントリ（renders）にある生成物はファイルを読まずにメモリ上で展開して比較する。
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .bundle import ShellBundler
+from .content import CHUNK_SIZE
+from .plan.model import ActionType, PlanEntry
+from .templates import TemplateRenderer
+
+# 先に計算しておくエントリ数
+DEFAULT_PREFETCH = 3
+# これより大きいファイルは差分を取らない
+DEFAULT_MAX_BYTES = 256 * 1024
+# 表示する差分の最大行数
+DEFAULT_MAX_LINES = 40
+# バイナリ判定に使う先頭のバイト数
+BINARY_SNIFF_BYTES = 8192
+# 差分の各行の字下げ
+INDENT = "    "
+
+
+class DiffPreviewer:
+    """entries の順に差分を計算し、結果を一度だけ返す.
+
+    preview() は表示するエントリの結果を待ち、その後ろ prefetch 件の計算を予約する。
+    表示済みの結果は保持しない（大量の確認でもメモリが増え続けない）。
+    """
+
+    def __init__(
+        self,
+        entries: Sequence[PlanEntry],
+        *,
+        prefetch: int = DEFAULT_PREFETCH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_lines: int = DEFAULT_MAX_LINES,
+        renders: Sequence[PlanEntry] = (),
+        renderer: TemplateRenderer | None = None,
+        bundler: ShellBundler | None = None,
+    ) -> None:
+        self.entries = list(entries)
+        self.prefetch = prefetch
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.renderer = renderer
+        self.bundler = bundler
+        # 生成物のパス → それを生成する RENDER エントリ
+        self._renders = {
+            entry.spec.dest: entry for entry in renders if entry.action is ActionType.RENDER
+        }
+        self._positions = {entry.spec.relative_path: i for i, entry in enumerate(self.entries)}
+        self._futures: dict[int, Future[str]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diff-preview")
+
+    def __enter__(self) -> DiffPreviewer:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """まだ始まっていない先読みを取り消して、スレッドを終了する."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._futures.clear()
+
+    def preview(self, entry: PlanEntry) -> str:
+        """entry の差分（表示用に字下げした複数行）."""
+        position = self._positions.get(entry.spec.relative_path)
+        if position is None:
+            return self.render(entry)
+        for i in range(position, min(position + self.prefetch + 1, len(self.entries))):
+            if i not in self._futures:
+                self._futures[i] = self._pool.submit(self.render, self.entries[i])
+        # 先読みを追い越した（飛ばした）エントリの結果は不要
+        for i in [i for i in self._futures if i < position]:
+            self._futures.pop(i).cancel()
+        return self._futures.pop(position).result()
+
+    def render(self, entry: PlanEntry) -> str:
+        """entry の差分をその場で計算する."""
+        dest, source = entry.spec.dest, entry.spec.source
+        lines: list[str] = []
+        try:
+            if dest.is_symlink():
+                lines.append(f"現在のリンク先: {dest.readlink()}")
+            if not dest.is_file():
+                lines.append("比較できるファイルがありません")
+                return _indent(lines)
+            generated = self._generate(source)
+            lines.extend(self._compare(dest, source, generated))
+        except KeyError as error:
+            lines.append(f"生成物を展開できません: 未定義の変数です: {error.args[0]}")
+        except ValueError as error:
+            lines.append(f"生成物を展開できません: {error}")
+        except OSError as error:
+            lines.append(f"差分を取得できません: {error}")
+        return _indent(lines)
+
+    def _generate(self, source: Path) -> bytes | None:
+        """source が生成予定の生成物なら、その内容をメモリ上で展開する（そうでなければ None）."""
+        render = self._renders.get(source)
+        if render is None:
+            return None
+        spec = render.spec
+        if self.bundler is not None and self.bundler.owns(spec.dest):
+            return self.bundler.bundle_text(spec.relative_path, spec.source).encode("utf-8")
+        if self.renderer is not None:
+            return self.renderer.render_text(spec.source).encode("utf-8")
+        return None
+
+    def _compare(self, dest: Path, source: Path, generated: bytes | None) -> list[str]:
+        old_size = dest.stat().st_size
+        new_size = source.stat().st_size if generated is None else len(generated)
+        if old_size > self.max_bytes or new_size > self.max_bytes:
+            return [
+                f"大きなファイルのため差分を省略（上限 {self.max_bytes} バイト）",
+                *_summaries(dest, source, old_size, new_size, generated),
+            ]
+        old = dest.read_bytes()
+        new = source.read_bytes() if generated is None else generated
+        if _is_binary(old) or _is_binary(new):
+            return ["バイナリファイル", *_summaries(dest, source, old_size, new_size, generated)]
+
+        diff = [
+            line.rstrip("\n")
+            for line in difflib.unified_diff(
+                old.decode("utf-8", errors="replace").splitlines(keepends=True),
+                new.decode("utf-8", errors="replace").splitlines(keepends=True),
+                fromfile=str(dest),
+                tofile=str(source),
+            )
+        ]
+        if not diff:
+            return ["内容は同じです"]
+        if len(diff) > self.max_lines:
+            rest = len(diff) - self.max_lines
+            diff = [*diff[: self.max_lines], f"...（残り {rest} 行）"]
+        return diff
+
+
+def _is_binary(data: bytes) -> bool:
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+def _summaries(
+    dest: Path, source: Path, old_size: int, new_size: int, generated: bytes | None
+) -> list[str]:
+    if generated is None:
+        new_digest = file_digest(source)
+    else:
+        new_digest = hashlib.blake2b(generated, digest_size=8).hexdigest()
+    return [
+        f"現在: {old_size} バイト blake2b:{file_digest(dest)}",
+        f"新規: {new_size} バイト blake2b:{new_digest}",
+    ]
+
+
+def file_digest(path: Path) -> str:
+    """path の内容の短いダイジェスト（チャンク単位で読む）."""
+    digest = hashlib.blake2b(digest_size=8)
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _indent(lines: list[str]) -> str:
+    return "\n".join(f"{INDENT}{line}" for line in lines)
@@ -0,0 +1,90 @@
+"""実行中の進捗表示（1行のライブ表示 / 非 TTY では定期的なプレーン行）."""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Callable
+from typing import TextIO
+
+from .plan.model import ActionType
+
+
+class ProgressRenderer:
+    """フェーズ名・処理速度・残り時間・アクション種別ごとの件数を表示する.
+
+    TTY の場合は同じ行を min_interval 秒に1回まで書き換える。
+    TTY でない場合（パイプやログファイル）は plain_interval 秒ごとに1行出力する。
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        *,
+        min_interval: float = 0.25,
+        plain_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stream = stream if stream is not None else sys.stdout
+        self.is_tty = self.stream.isatty()
+        self.interval = min_interval if self.is_tty else plain_interval
+        self.clock = clock
+
+        self.phase = ""
+        self.total = 0
+        self.done = 0
+        self.counts: dict[ActionType, int] = {}
+        self._started = 0.0
+        self._last_render = 0.0
+        self._line_visible = False
+
+    def start(self, phase: str, total: int) -> None:
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.counts = {}
+        self._started = self._last_render = self.clock()
+        self._render()
+
+    def advance(self, action: ActionType) -> None:
+        self.done += 1
+        self.counts[action] = self.counts.get(action, 0) + 1
+        now = self.clock()
+        if now - self._last_render >= self.interval:
+            self._last_render = now
+            self._render()
+
+    def clear(self) -> None:
+        """ライブ表示の行を消す（警告やプロンプトを出す前に呼ぶ）."""
+        if self._line_visible:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+            self._line_visible = False
+
+    def finish(self) -> None:
+        self._render()
+        if self._line_visible:
+            self.stream.write("\n")
+            self.stream.flush()
+            self._line_visible = False
+
+    def format_line(self) -> str:
+        elapsed = self.clock() - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        eta = f"{remaining / rate:.0f}秒" if rate > 0 else "--"
+        counts = " ".join(
+            f"{action.name}:{self.counts[action]}" for action in ActionType if action in self.counts
+        )
+        return (
+            f"[{self.phase}] {self.done}/{self.total} {rate:.0f}件/秒 残り{eta} {counts}".rstrip()
+        )
+
+    def _render(self) -> None:
+        line = self.format_line()
+        if self.is_tty:
+            self.stream.write(f"\r\033[K{line}")
+            self._line_visible = True
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
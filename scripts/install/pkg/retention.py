@@ -0,0 +1,229 @@
+"""rollbacks/ アーカイブの保持ポリシーとガベージコレクション."""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from .backup_store import ArchiveSizeIndex, list_archives
+from .locking import RollbacksLock
+from .plan.journal import JOURNAL_NAME, InstallJournal
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+# GC 途中で中断された場合に残るゴミ箱ディレクトリの接頭辞
+TRASH_PREFIX = ".trash-"
+
+
+def parse_size(text: str) -> int:
+    """'500M' や '2G' のようなサイズ指定をバイト数に変換する."""
+
+    match = _SIZE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"サイズの形式が不正です: {text}")
+    number, unit = match.groups()
+    size = int(float(number) * _SIZE_UNITS[unit.upper()])
+    if size < 1:
+        # 0 だと今回のインストールが書いたアーカイブまで削除してしまう
+        raise ValueError(f"サイズは 1 バイト以上を指定してください: {text}")
+    return size
+
+
+def parse_count(text: str) -> int:
+    """--keep-last などの件数指定を 1 以上の整数に変換する.
+
+    0 以下を許すと、今回のインストールが書いたアーカイブまで削除してしまう。
+    """
+
+    count = int(text)
+    if count < 1:
+        raise ValueError(f"1 以上を指定してください: {text}")
+    return count
+
+
+def archive_created_at(archive: Path) -> datetime:
+    """アーカイブ名の先頭のタイムスタンプから作成日時を得る（失敗時は mtime）."""
+
+    try:
+        return datetime.strptime(archive.name[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.fromtimestamp(archive.stat().st_mtime)
+
+
+@dataclass(frozen=True)
+class ArchiveInfo:
+    """GC 判定に使うアーカイブ1件分の情報."""
+
+    path: Path
+    created_at: datetime
+    size: int
+
+
+@dataclass
+class RetentionPolicy:
+    """アーカイブの保持ルール.
+
+    keep_last / keep_daily / keep_weekly のいずれかで残すと判定されたものは保持し、
+    その上で max_total_bytes を超える分は古いものから削除する。
+    最新のアーカイブは常に保持する。
+    """
+
+    keep_last: int | None = None
+    keep_daily: int | None = None
+    keep_weekly: int | None = None
+    max_total_bytes: int | None = None
+
+    def is_empty(self) -> bool:
+        return (
+            self.keep_last is None
+            and self.keep_daily is None
+            and self.keep_weekly is None
+            and self.max_total_bytes is None
+        )
+
+    def select_kept(self, archives: list[ArchiveInfo]) -> list[ArchiveInfo]:
+        """新しい順に並んだ archives のうち保持するものを新しい順で返す."""
+
+        if not archives:
+            return []
+
+        count_rules = (self.keep_last, self.keep_daily, self.keep_weekly)
+        if all(rule is None for rule in count_rules):
+            kept_names = {info.path.name for info in archives}
+        else:
+            kept_names = {archives[0].path.name}
+            if self.keep_last:
+                kept_names.update(info.path.name for info in archives[: self.keep_last])
+            if self.keep_daily:
+                kept_names.update(self._newest_per_bucket(archives, "%Y-%m-%d", self.keep_daily))
+            if self.keep_weekly:
+                kept_names.update(self._newest_per_bucket(archives, "%G-W%V", self.keep_weekly))
+
+        kept = [info for info in archives if info.path.name in kept_names]
+
+        if self.max_total_bytes is not None:
+            total = 0
+            limited = []
+            for index, info in enumerate(kept):
+                if index > 0 and total + info.size > self.max_total_bytes:
+                    break
+                total += info.size
+                limited.append(info)
+            kept = limited
+
+        return kept
+
+    @staticmethod
+    def _newest_per_bucket(archives: list[ArchiveInfo], bucket_format: str, limit: int):
+        """日/週ごとの最新アーカイブを、新しいバケットから limit 個分返す."""
+
+        seen: set[str] = set()
+        for info in archives:
+            bucket = info.created_at.strftime(bucket_format)
+            if bucket in seen:
+                continue
+            seen.add(bucket)
+            yield info.path.name
+            if len(seen) >= limit:
+                return
+
+
+@dataclass
+class GcReport:
+    """GC の結果."""
+
+    kept: list[ArchiveInfo] = field(default_factory=list)
+    removed: list[ArchiveInfo] = field(default_factory=list)
+
+    @property
+    def freed_bytes(self) -> int:
+        return sum(info.size for info in self.removed)
+
+
+def archives_in_use(state_root: Path) -> set[Path]:
+    """中断されたインストールのジャーナルが参照しているアーカイブ（--resume で使う）."""
+
+    in_use: set[Path] = set()
+    try:
+        state_dirs = [Path(entry.path) for entry in os.scandir(state_root) if entry.is_dir()]
+    except OSError:
+        return in_use
+    for state_dir in state_dirs:
+        state = InstallJournal.load(state_dir / JOURNAL_NAME)
+        if state is not None and not state.finished and state.archive is not None:
+            in_use.add(Path(os.path.abspath(state.archive)))
+    return in_use
+
+
+@dataclass
+class RollbackGarbageCollector:
+    """保持ポリシーに従って古いアーカイブをまとめて削除する.
+
+    削除は rollbacks/ のロックを取って行い、他のインストールのアーカイブ作成と競合しない。
+    state_root を渡すと、その下の未完了のジャーナルが参照するアーカイブはポリシーによらず残す。
+    """
+
+    rollbacks_root: Path
+    state_root: Path | None = None
+    lock_timeout: float = 30.0
+
+    def collect(self, policy: RetentionPolicy, *, dry_run: bool = False) -> GcReport:
+        if dry_run or not self.rollbacks_root.is_dir():
+            report, _ = self._select(policy)
+            return report
+
+        with RollbacksLock(self.rollbacks_root, timeout=self.lock_timeout):
+            report, index = self._select(policy)
+            self._remove_in_bulk(report.removed)
+            # 削除済み・既に存在しないアーカイブのキャッシュはまとめて捨てる
+            kept_names = {info.path.name for info in report.kept}
+            index.sizes = {name: size for name, size in index.sizes.items() if name in kept_names}
+            index.save()
+        return report
+
+    def _select(self, policy: RetentionPolicy) -> tuple[GcReport, ArchiveSizeIndex]:
+        index = ArchiveSizeIndex.load(self.rollbacks_root)
+        archives = [
+            ArchiveInfo(path=path, created_at=archive_created_at(path), size=index.size_of(path))
+            for path in list_archives(self.rollbacks_root)
+        ]
+        archives.sort(key=lambda info: (info.created_at, info.path.name), reverse=True)
+
+        kept_names = {info.path.name for info in policy.select_kept(archives)}
+        if self.state_root is not None:
+            in_use = archives_in_use(self.state_root)
+            kept_names.update(
+                info.path.name for info in archives if Path(os.path.abspath(info.path)) in in_use
+            )
+        report = GcReport(
+            kept=[info for info in archives if info.path.name in kept_names],
+            removed=[info for info in archives if info.path.name not in kept_names],
+        )
+        return report, index
+
+    def _remove_in_bulk(self, archives: list[ArchiveInfo]) -> None:
+        """削除対象を1つのゴミ箱ディレクトリへ rename してから一括で削除する.
+
+        rename は同一ファイルシステム内で O(1) のため、途中で中断されても
+        アーカイブ一覧から見えるのは「残す」ものだけになる。
+        """
+
+        leftovers = [
+            Path(entry.path)
+            for entry in os.scandir(self.rollbacks_root)
+            if entry.name.startswith(TRASH_PREFIX)
+        ]
+        if archives:
+            trash = self.rollbacks_root / f"{TRASH_PREFIX}{os.getpid()}"
+            trash.mkdir(exist_ok=True)
+            for info in archives:
+                os.rename(info.path, trash / info.path.name)
+            leftovers.append(trash)
+
+        for path in leftovers:
+            shutil.rmtree(path, ignore_errors=True)
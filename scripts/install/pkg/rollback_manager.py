@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
-import shutil
-from collections.abc import Iterable
-from dataclasses import dataclass
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+from .fs import FileSystem, PosixFS
+from .policy import RESTORE_ACTION, Answer, AnswerPolicy
+
 
 @dataclass
 class RollbackManager:
@@ -15,6 +17,8 @@ class RollbackManager:
 
     target_root: Path
     ui: Any
+    policy: AnswerPolicy | None = None
+    fs: FileSystem = field(default_factory=PosixFS)
 
     def restore_archive(
         self,
@@ -23,7 +27,8 @@ class RollbackManager:
         restore_all: bool = False,
         selected: Iterable[Path] | None = None,
     ) -> None:
-        if not archive.exists():
+        fs = self.fs
+        if not fs.exists(archive):
             raise FileNotFoundError(f"バックアップが見つかりません: {archive}")
 
         selected_set = {p for p in selected} if selected else None
@@ -36,26 +41,43 @@ class RollbackManager:
             target = self.target_root / relative_path
 
             if not restore_all:
-                if not self.ui.confirm(f"{relative_path} を復元しますか?", default_yes=False):
+                answer = (
+                    self.policy.decide(relative_path, RESTORE_ACTION)
+                    if self.policy is not None
+                    else Answer.ASK
+                )
+                if answer is Answer.SKIP:
+                    continue
+                if answer is Answer.ASK and not self.ui.confirm(
+                    f"{relative_path} を復元しますか?", default_yes=False
+                ):
                     continue
 
-            target.parent.mkdir(parents=True, exist_ok=True)
+            fs.mkdir(target.parent, parents=True, exist_ok=True)
 
             if info == "symlink":
                 link_file = archive / f"{relative_path}.link"
-                link_target = Path(link_file.read_text().strip())
-                target.unlink(missing_ok=True)
-                target.symlink_to(link_target)
+                link_target = Path(fs.read_text(link_file).strip())
+                fs.unlink(target, missing_ok=True)
+                fs.symlink(str(link_target), target)
             else:
                 source = archive / relative_path
-                if target.exists() or target.is_symlink():
-                    target.unlink()
-                shutil.copy2(source, target)
+                if fs.exists(target) or fs.is_symlink(target):
+                    fs.unlink(target)
+                fs.copy_file(source, target)
+
+    def _iter_files(self, root: Path) -> Iterator[Path]:
+        """root 配下のディレクトリ以外のパス（ディレクトリへのリンクは辿らない）."""
+        stack = [root]
+        while stack:
+            for entry in self.fs.scandir(stack.pop()):
+                if entry.is_dir and not entry.is_symlink:
+                    stack.append(entry.path)
+                else:
+                    yield entry.path
 
     def _iter_backup_entries(self, archive: Path):
-        for path in sorted(archive.rglob("*")):
-            if path.is_dir():
-                continue
+        for path in sorted(self._iter_files(archive)):
             if path.name.endswith(".link"):
                 relative = path.relative_to(archive)
                 original = relative.with_suffix("")
@@ -63,6 +85,6 @@ class RollbackManager:
             else:
                 relative = path.relative_to(archive)
                 # `.link` とは別に同名ファイルが存在する可能性があるため
-                if (archive / f"{relative}.link").exists():
+                if self.fs.exists(archive / f"{relative}.link"):
                     continue
                 yield relative, "file"
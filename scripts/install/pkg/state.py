@@ -0,0 +1,42 @@
+"""インストール先ごとの状態ファイル（ジャーナルなど）の置き場所."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+
+# --check の経路でも読み込むため、pathlib には依存しない
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from pathlib import Path
+
+STATE_DIR_NAME = "state"
+# 状態ディレクトリのルートを repo_root/state 以外にする環境変数（テストなど）
+STATE_ROOT_ENV = "DOTFILES_STATE_DIR"
+
+
+def state_root(repo_root: str | os.PathLike[str]) -> str:
+    """状態ディレクトリのルート（絶対パス）. 環境変数 DOTFILES_STATE_DIR があればそれを使う."""
+
+    return os.path.abspath(
+        os.environ.get(STATE_ROOT_ENV) or os.path.join(repo_root, STATE_DIR_NAME)
+    )
+
+
+def state_dir_name(dest_dir: str | os.PathLike[str]) -> str:
+    """インストール先の絶対パスから一意な状態ディレクトリ名 (<名前>-<ハッシュ>) を作る."""
+
+    resolved = os.path.realpath(os.path.expanduser(dest_dir))
+    digest = hashlib.sha1(resolved.encode("utf-8")).hexdigest()[:12]
+    return f"{os.path.basename(resolved) or 'root'}-{digest}"
+
+
+def state_dir_for(repo_root: Path, dest_dir: Path) -> Path:
+    """インストール先ごとの状態ディレクトリ (repo_root/state/<名前>-<ハッシュ>) を返す.
+
+    同じリポジトリから複数の $HOME にインストールしても状態が混ざらないよう、
+    インストール先の絶対パスから一意な名前を作る。ルートは state_root で決まる。
+    """
+
+    # state_root は絶対パスなので、結果は repo_root によらず state_root の下になる
+    return repo_root / state_root(repo_root) / state_dir_name(dest_dir)
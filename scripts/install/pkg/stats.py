@@ -0,0 +1,188 @@
+"""フェーズごとのファイルシステム操作の回数とバイト数（--stats）.
+
+CountingFS は FileSystem を包み、呼ばれた操作を対応するシステムコール名で数える。
+--stats を指定したときだけ包むので、指定しなければ数えるコストはかからない::
+
+    stats = IOStats()
+    fs = CountingFS(PosixFS(), stats)
+    with stats.phase("plan"):
+        PlanBuilder(source_dir=..., dest_dir=..., fs=fs).build()
+    stats.counts["plan"]  # Counter({'lstat': 120, 'stat': 80, ...})
+
+resolve や scandir のように実際には複数のシステムコールになる操作は、操作名のまま1回と数える。
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .fs import DirEntry, FileSystem
+
+# どのフェーズにも属さない操作
+NO_PHASE = "-"
+
+# 表示する順序（それ以外は後ろに名前順で並べる）
+COUNTER_ORDER = (
+    "stat",
+    "lstat",
+    "readlink",
+    "resolve",
+    "scandir",
+    "mkdir",
+    "unlink",
+    "symlink",
+    "rename",
+    "read",
+    "write",
+    "copy",
+    "compare",
+    "copy_bytes",
+    "write_bytes",
+    "backup_bytes",
+)
+
+
+@dataclass
+class IOStats:
+    """フェーズ名 → 操作名 → 回数（バイト数）のレジストリ."""
+
+    counts: dict[str, Counter[str]] = field(default_factory=dict)
+    current: str = NO_PHASE
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Counter[str]]:
+        """この中で行われた操作を name のフェーズとして数える（入れ子は内側が優先）."""
+        previous, self.current = self.current, name
+        try:
+            yield self.counts.setdefault(name, Counter())
+        finally:
+            self.current = previous
+
+    def add(self, op: str, n: int = 1) -> None:
+        counter = self.counts.get(self.current)
+        if counter is None:
+            counter = self.counts[self.current] = Counter()
+        counter[op] += n
+
+    def total(self) -> Counter[str]:
+        total: Counter[str] = Counter()
+        for counter in self.counts.values():
+            total.update(counter)
+        return total
+
+    def format_lines(self) -> list[str]:
+        """フェーズごとと合計の行."""
+        rows = [(name, counter) for name, counter in self.counts.items() if counter]
+        if not rows:
+            return ["  ファイルシステムの操作はありません"]
+        rows.append(("合計", self.total()))
+        width = max(_display_width(name) for name, _ in rows)
+        return [
+            f"  {name}{' ' * (width - _display_width(name))}  {format_counter(counter)}"
+            for name, counter in rows
+        ]
+
+
+def _display_width(text: str) -> int:
+    """端末での表示幅（全角文字を2桁として数える）."""
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def format_counter(counter: Counter[str]) -> str:
+    order = {op: i for i, op in enumerate(COUNTER_ORDER)}
+    ops = sorted(counter, key=lambda op: (order.get(op, len(order)), op))
+    return " ".join(f"{op}={counter[op]}" for op in ops if counter[op])
+
+
+class CountingFS:
+    """操作を数えてから内側の FileSystem に委ねる."""
+
+    def __init__(self, inner: FileSystem, stats: IOStats) -> None:
+        self.inner = inner
+        self.stats = stats
+
+    def exists(self, path: Path) -> bool:
+        self.stats.add("stat")
+        return self.inner.exists(path)
+
+    def is_dir(self, path: Path) -> bool:
+        self.stats.add("stat")
+        return self.inner.is_dir(path)
+
+    def is_file(self, path: Path) -> bool:
+        self.stats.add("stat")
+        return self.inner.is_file(path)
+
+    def is_symlink(self, path: Path) -> bool:
+        self.stats.add("lstat")
+        return self.inner.is_symlink(path)
+
+    def readlink(self, path: Path) -> str:
+        self.stats.add("readlink")
+        return self.inner.readlink(path)
+
+    def resolve(self, path: Path) -> Path:
+        self.stats.add("resolve")
+        return self.inner.resolve(path)
+
+    def scandir(self, path: Path) -> Iterator[DirEntry]:
+        self.stats.add("scandir")
+        return self.inner.scandir(path)
+
+    def size(self, path: Path) -> int:
+        self.stats.add("lstat")
+        return self.inner.size(path)
+
+    def mkdir(self, path: Path, *, parents: bool = False, exist_ok: bool = False) -> None:
+        self.stats.add("mkdir")
+        self.inner.mkdir(path, parents=parents, exist_ok=exist_ok)
+
+    def unlink(self, path: Path, *, missing_ok: bool = False) -> None:
+        self.stats.add("unlink")
+        self.inner.unlink(path, missing_ok=missing_ok)
+
+    def symlink(self, target: str, path: Path) -> None:
+        self.stats.add("symlink")
+        self.inner.symlink(target, path)
+
+    def replace(self, source: Path, dest: Path) -> None:
+        self.stats.add("rename")
+        self.inner.replace(source, dest)
+
+    def read_text(self, path: Path) -> str:
+        self.stats.add("read")
+        return self.inner.read_text(path)
+
+    def write_text(self, path: Path, text: str) -> None:
+        self.stats.add("write")
+        self.inner.write_text(path, text)
+        self.stats.add("write_bytes", len(text.encode("utf-8")))
+
+    def copy_file(self, source: Path, dest: Path) -> None:
+        self.stats.add("copy")
+        self.inner.copy_file(source, dest)
+        # バイト数の取得は数えない（--stats のときだけの追加コスト）
+        self.stats.add("copy_bytes", self.inner.size(dest))
+
+    def hardlink(self, source: Path, dest: Path) -> None:
+        self.stats.add("link")
+        self.inner.hardlink(source, dest)
+
+    def copy_file_atomic(self, source: Path, dest: Path, temp: Path) -> int:
+        self.stats.add("copy")
+        copied = self.inner.copy_file_atomic(source, dest, temp)
+        self.stats.add("copy_bytes", copied)
+        return copied
+
+    def same_content(self, a: Path, b: Path) -> bool:
+        self.stats.add("compare")
+        return self.inner.same_content(a, b)
+
+    def is_copy_current(self, source: Path, dest: Path) -> bool:
+        self.stats.add("compare")
+        return self.inner.is_copy_current(source, dest)
@@ -0,0 +1,139 @@
+"""テンプレート (*.tmpl) をホストごとの変数で生成するレンダラー.
+
+source/.gitconfig.tmpl のようなファイルを string.Template で展開して
+生成ディレクトリ (state/<インストール先>/generated/) に書き出し、
+インストール先にはその生成物へのリンクを張る。
+
+変数は組み込みの HOSTNAME / USER / HOME / OS と、リポジトリ直下の
+template-vars.json で定義したもの::
+
+    {
+      "vars": {"EMAIL": "me@example.com"},
+      "hosts": {"work-laptop": {"EMAIL": "me@corp.example.com"}}
+    }
+
+hosts の値はホスト名（ドメインを除いた部分）が一致したときだけ vars を上書きする。
+
+生成結果はテンプレートのハッシュと変数のハッシュをキーにキャッシュするので、
+変更のないテンプレートはハッシュを1回計算して辞書を引くだけで済む。
+"""
+
+from __future__ import annotations
+
+import getpass
+import hashlib
+import json
+import os
+import platform
+import socket
+from collections.abc import Iterable
+from pathlib import Path
+from string import Template
+
+TEMPLATE_SUFFIX = ".tmpl"
+GENERATED_DIR_NAME = "generated"
+RENDER_CACHE_NAME = "render-cache.json"
+VARS_FILE_NAME = "template-vars.json"
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def host_variables(vars_file: Path | None = None, *, hostname: str | None = None) -> dict[str, str]:
+    """テンプレートに渡す変数（組み込み + 変数ファイル）を返す."""
+    host = (hostname if hostname is not None else socket.gethostname()).split(".")[0]
+    variables = {
+        "HOSTNAME": host,
+        "USER": getpass.getuser(),
+        "HOME": str(Path.home()),
+        "OS": platform.system(),
+    }
+    if vars_file is not None and vars_file.exists():
+        data = json.loads(vars_file.read_text(encoding="utf-8"))
+        variables.update({k: str(v) for k, v in data.get("vars", {}).items()})
+        variables.update({k: str(v) for k, v in data.get("hosts", {}).get(host, {}).items()})
+    return variables
+
+
+class TemplateRenderer:
+    """テンプレートの生成とキャッシュの管理.
+
+    キャッシュは relative_path ごとに (テンプレートのハッシュ, 変数のハッシュ) を保持する。
+    生成物が存在し両方のハッシュが一致すれば再生成しない。
+    """
+
+    def __init__(self, generated_dir: Path, variables: dict[str, str], cache_path: Path) -> None:
+        self.generated_dir = generated_dir
+        self.variables = variables
+        self.cache_path = cache_path
+        self.vars_hash = _digest(json.dumps(variables, sort_keys=True).encode("utf-8"))
+        try:
+            self._cache: dict[str, list[str]] = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._cache = {}
+        # is_fresh で計算したテンプレートのハッシュ（生成時に再計算しない）
+        self._hashes: dict[str, str] = {}
+
+    @staticmethod
+    def target_of(template_relative: Path) -> Path:
+        """テンプレートの relative_path から、インストール先での relative_path を返す."""
+        return template_relative.with_name(template_relative.name[: -len(TEMPLATE_SUFFIX)])
+
+    def output_path(self, relative: Path) -> Path:
+        return self.generated_dir / relative
+
+    def is_fresh(self, relative: Path, template: Path) -> bool:
+        """前回の生成から、テンプレートも変数も変わっていないか."""
+        key = str(relative)
+        template_hash = _digest(template.read_bytes())
+        self._hashes[key] = template_hash
+        return self._cache.get(key) == [template_hash, self.vars_hash] and os.path.exists(
+            self.output_path(relative)
+        )
+
+    def render_text(self, template: Path) -> str:
+        """テンプレートを展開した内容を返す（ファイルには書かない. 失敗時は KeyError / ValueError）."""
+        return self._substitute(template.read_bytes())
+
+    def _substitute(self, data: bytes) -> str:
+        return Template(data.decode("utf-8")).substitute(self.variables)
+
+    def render_batch(self, items: Iterable[tuple[Path, Path]]) -> dict[Path, str | None]:
+        """(relative_path, テンプレート) をまとめて生成し、キャッシュを1回だけ保存する.
+
+        relative_path ごとにエラーメッセージ（成功時は None）を返す。
+        """
+        results: dict[Path, str | None] = {}
+        for relative, template in items:
+            key = str(relative)
+            try:
+                data = template.read_bytes()
+                text = self._substitute(data)
+            except KeyError as error:
+                results[relative] = f"未定義の変数です: {error.args[0]}"
+                continue
+            except ValueError as error:
+                results[relative] = f"テンプレートの書式が不正です: {error}"
+                continue
+
+            output = self.output_path(relative)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            temp = output.with_name(f".{output.name}.tmp")
+            temp.write_text(text, encoding="utf-8")
+            os.chmod(temp, template.stat().st_mode & 0o777)
+            os.replace(temp, output)
+
+            template_hash = self._hashes.get(key) or _digest(data)
+            self._cache[key] = [template_hash, self.vars_hash]
+            results[relative] = None
+
+        if results:
+            self.save()
+        return results
+
+    def save(self) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.cache_path.with_name(f".{self.cache_path.name}.tmp")
+        temp.write_text(json.dumps(self._cache, sort_keys=True), encoding="utf-8")
+        os.replace(temp, self.cache_path)
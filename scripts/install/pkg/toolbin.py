@@ -0,0 +1,153 @@
+"""~/tools のプログラムを ~/bin にリンクするリンクファーム.
+
+source/bin/README.md の約束どおり、~/tools 以下のプログラムの実体へのリンクを
+~/bin に並べる。PATH には ~/bin だけを通せばよく、ツールが増えてもコマンドの検索は
+1ディレクトリで済む。リンクするプログラムは次の2通りで見つける:
+
+- 実行ビットの立った通常ファイルのうち、~/tools 直下と ~/tools/*/bin/ 直下にあるもの
+  （./configure --prefix=$HOME/tools/<名前> でインストールしたものはこれで拾える）
+- ~/tools/bin.manifest に書いたもの（それ以外の場所にある実体や、別名を付けたいもの）::
+
+      # ~/tools からのパス. "名前 = パス" で ~/bin での名前を指定できる
+      nvim-linux64/bin/nvim
+      rg = ripgrep-14.1.0-x86_64-unknown-linux-musl/rg
+
+マニフェストの指定は実行ビットで見つけたものより優先する。同じ名前のプログラムが
+複数見つかった場合はどれもリンクせず、エラーとして報告する。
+~/bin にあるリンクのうち、リンク先が ~/tools の中でもう存在しないものは削除する。
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+
+TOOLS_DIR_NAME = "tools"
+BIN_DIR_NAME = "bin"
+TOOL_MANIFEST_NAME = "bin.manifest"
+
+
+@dataclass
+class ToolScan:
+    """~/tools を走査した結果."""
+
+    # ~/bin での名前 → 実体（リンクを辿った絶対パス）
+    links: dict[str, Path] = field(default_factory=dict)
+    # 同じ名前の実体が複数あるもの
+    conflicts: dict[str, list[Path]] = field(default_factory=dict)
+    # マニフェストの誤り（行番号付きのメッセージ）
+    problems: list[str] = field(default_factory=list)
+
+
+def _is_executable(path: Path) -> bool:
+    try:
+        mode = path.stat().st_mode
+    except OSError:
+        return False
+    return stat.S_ISREG(mode) and bool(mode & 0o111)
+
+
+class ToolLinker:
+    """~/tools の走査と、~/bin に残った死んだリンクの検出."""
+
+    def __init__(self, home: Path) -> None:
+        self.tools_dir = home / TOOLS_DIR_NAME
+        self.bin_dir = home / BIN_DIR_NAME
+        self.manifest_path = self.tools_dir / TOOL_MANIFEST_NAME
+
+    def scan(self) -> ToolScan:
+        result = ToolScan()
+        found: dict[str, set[Path]] = {}
+        for path in self._discover():
+            found.setdefault(path.name, set()).add(Path(os.path.realpath(path)))
+        explicit = self._read_manifest(result)
+
+        for name, paths in found.items():
+            if name in explicit or name in result.conflicts:
+                continue
+            if len(paths) > 1:
+                result.conflicts[name] = sorted(paths)
+            else:
+                (result.links[name],) = paths
+        result.links.update(explicit)
+        return result
+
+    def search_dirs(self) -> list[Path]:
+        """実行ビットでプログラムを探すディレクトリ（~/tools と ~/tools/*/bin/）."""
+        directories = [self.tools_dir]
+        try:
+            with os.scandir(self.tools_dir) as it:
+                directories.extend(
+                    Path(item.path) / BIN_DIR_NAME
+                    for item in it
+                    if item.is_dir() and not item.name.startswith(".")
+                )
+        except OSError:
+            return []
+        return directories
+
+    def _discover(self) -> list[Path]:
+        programs = []
+        for directory in self.search_dirs():
+            try:
+                with os.scandir(directory) as it:
+                    names = [item.name for item in it if not item.name.startswith(".")]
+            except OSError:
+                continue
+            programs.extend(directory / name for name in names if _is_executable(directory / name))
+        return programs
+
+    def _read_manifest(self, result: ToolScan) -> dict[str, Path]:
+        try:
+            lines = self.manifest_path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return {}
+        except (OSError, UnicodeDecodeError) as error:
+            result.problems.append(f"{TOOL_MANIFEST_NAME} を読めません: {error}")
+            return {}
+
+        explicit: dict[str, Path] = {}
+        for number, line in enumerate(lines, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            name, _, value = line.rpartition("=")
+            relative = Path(os.path.normpath(value.strip()))
+            name = name.strip() or relative.name
+            where = f"{TOOL_MANIFEST_NAME}:{number}"
+            if (
+                not relative.parts
+                or relative.is_absolute()
+                or relative.parts[0] == ".."
+                or "/" in name
+            ):
+                result.problems.append(f"{where}: ~/tools の中のパスではありません ({line})")
+                continue
+            if not _is_executable(self.tools_dir / relative):
+                result.problems.append(f"{where}: {relative} が見つからないか実行できません")
+                continue
+            program = Path(os.path.realpath(self.tools_dir / relative))
+            if name in explicit or name in result.conflicts:
+                paths = result.conflicts.setdefault(name, [])
+                if name in explicit:
+                    paths.append(explicit.pop(name))
+                paths.append(program)
+            else:
+                explicit[name] = program
+        return explicit
+
+    def dead_links(self) -> list[Path]:
+        """~/bin のリンクのうち、~/tools の中の存在しないパスを指すもの."""
+        tools = Path(os.path.realpath(self.tools_dir))
+        dead = []
+        try:
+            with os.scandir(self.bin_dir) as it:
+                links = [Path(item.path) for item in it if item.is_symlink()]
+        except OSError:
+            return []
+        for link in links:
+            if not link.exists() and Path(os.path.realpath(link)).is_relative_to(tools):
+                dead.append(link)
+        return sorted(dead)
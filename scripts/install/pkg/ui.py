@@ -97,6 +97,15 @@ class UserInterface:
                 print("\n入力が終了しました")
                 return None
 
+    def show_preview(self, text: str):
+        """
+        確認の前に差分などのプレビューを表示
+
+        Args:
+            text: 表示する内容（字下げ済みの複数行）
+        """
+        print(text)
+
     def show_summary(self, title: str, items: dict):
         """
         処理概要を表示
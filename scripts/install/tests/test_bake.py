@@ -0,0 +1,161 @@
+"""Baker（インストール結果を tar に書き出す --bake）のテスト."""
+
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.bake import Baker
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.templates import TemplateRenderer
+
+INSTALL_PY = Path(__file__).resolve().parents[3] / "install.py"
+
+
+class _PipeWriter(io.RawIOBase):
+    """seek できない出力先（パイプ相当）. 書き込まれたバイト列を貯める."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+class TestBaker(unittest.TestCase):
+    """空のホームへの Plan を tar に書き出すテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.state = self.tmp_path / "state"
+        (self.source / ".config" / "app").mkdir(parents=True)
+        self.dest.mkdir()
+
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "app" / "run.sh").write_text("#!/bin/sh\n")
+        (self.source / ".config" / "app" / "run.sh").chmod(0o755)
+        (self.source / ".gitconfig.tmpl").write_text("name = $NAME\n")
+        self.renderer = TemplateRenderer(
+            generated_dir=self.state / "generated",
+            variables={"NAME": "me"},
+            cache_path=self.state / "render-cache.json",
+        )
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _bake(self, *, copy_mode: bool = False):
+        builder = PlanBuilder(
+            source_dir=self.source,
+            dest_dir=self.dest,
+            renderer=self.renderer,
+            copy_mode=copy_mode,
+            assume_empty=True,
+        )
+        index = builder.build_index()
+        plan = builder.build(index)
+        output = _PipeWriter()
+        with tarfile.open(fileobj=output, mode="w|") as tar:
+            report = Baker(tar, index, renderer=self.renderer, copy_mode=copy_mode).bake(
+                plan.entries
+            )
+        archive = tarfile.open(fileobj=io.BytesIO(output.getvalue()))
+        return report, {member.name: member for member in archive}, archive
+
+    def test_links_for_empty_home(self):
+        """既存ファイルを見ずに、ディレクトリとリンクを書き出すことを確認."""
+        # 実際のインストール先にあるファイルは結果に影響しない
+        (self.dest / ".bashrc").write_text("# local\n")
+
+        report, members, archive = self._bake()
+        self.assertEqual(report.errors, [])
+        self.assertEqual(
+            sorted(members),
+            [".bashrc", ".config", ".config/app", ".config/app/run.sh", ".gitconfig"],
+        )
+        self.assertTrue(members[".config/app"].isdir())
+        self.assertTrue(members[".bashrc"].issym())
+        self.assertEqual(members[".bashrc"].linkname, str((self.source / ".bashrc").resolve()))
+        # テンプレートは展開した内容をファイルとして入れる
+        self.assertTrue(members[".gitconfig"].isfile())
+        self.assertEqual(archive.extractfile(".gitconfig").read(), b"name = me\n")
+
+        # 実際のファイルシステムは変更しない
+        self.assertEqual((self.dest / ".bashrc").read_text(), "# local\n")
+        self.assertEqual(sorted(p.name for p in self.dest.iterdir()), [".bashrc"])
+        self.assertFalse((self.state / "generated").exists())
+
+    def test_copy_mode_embeds_contents_and_metadata(self):
+        """コピーモードではファイルの中身と権限を書き出すことを確認."""
+        report, members, archive = self._bake(copy_mode=True)
+        self.assertEqual(report.links, 0)
+        self.assertEqual(report.files, 3)
+
+        run = members[".config/app/run.sh"]
+        self.assertTrue(run.isfile())
+        self.assertEqual(run.mode, 0o755)
+        self.assertEqual(archive.extractfile(run).read(), b"#!/bin/sh\n")
+
+    def test_plan_for_empty_home_is_all_create(self):
+        """assume_empty の Plan はすべて新規作成になることを確認."""
+        (self.dest / ".config").mkdir()
+        (self.dest / ".bashrc").symlink_to((self.source / ".bashrc").resolve())
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.dest, assume_empty=True)
+        actions = {e.spec.relative_path: e.action for e in builder.build().entries}
+        self.assertEqual(actions[Path(".config")], ActionType.ENSURE_DIR)
+        self.assertEqual(actions[Path(".bashrc")], ActionType.CREATE)
+
+    def test_template_errors_are_reported(self):
+        """展開できないテンプレートはエラーとして報告し、他は書き出すことを確認."""
+        (self.source / ".gitconfig.tmpl").write_text("name = $UNDEFINED\n")
+        report, members, _ = self._bake()
+        self.assertEqual(len(report.errors), 1)
+        self.assertIn("UNDEFINED", report.errors[0])
+        self.assertNotIn(".gitconfig", members)
+        self.assertIn(".bashrc", members)
+
+
+class TestBakeCli(unittest.TestCase):
+    """install.py --bake のオプションのテスト."""
+
+    def test_bake_and_events_cannot_share_stdout(self):
+        """tar とイベントをどちらも標準出力に書く指定はエラーにすることを確認."""
+        with tempfile.TemporaryDirectory() as dest:
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    str(INSTALL_PY),
+                    "--bake",
+                    "-",
+                    "--events",
+                    "-",
+                    "--dest-dir",
+                    dest,
+                ],
+                capture_output=True,
+            )
+        self.assertEqual(result.returncode, 2)
+        self.assertEqual(result.stdout, b"")
+        self.assertIn(b"--events -", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
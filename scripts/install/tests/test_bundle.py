@@ -0,0 +1,205 @@
+"""ShellBundler（シェルの起動ファイルのバンドル, --bundle）のテスト."""
+
+from __future__ import annotations
+
+import io
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.bake import Baker
+from scripts.install.pkg.bundle import ShellBundler
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.ui import UserInterface
+
+
+class TestShellBundler(unittest.TestCase):
+    """読み込み先の展開とキャッシュのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.state = self.tmp_path / "state"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        (self.source / ".bashrc").write_text(
+            'export EDITOR=vim\nsource "$HOME/.aliases"\n[ -f ~/.bashrc_local ] && . ~/.bashrc_local\n'
+            ". ~/.bashrc_local\n"
+        )
+        (self.source / ".aliases").write_text("alias ll='ls -l'\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _bundler(self) -> ShellBundler:
+        return ShellBundler(
+            layers=[self.source],
+            generated_dir=self.state / "bundled",
+            cache_path=self.state / "bundle-cache.json",
+        )
+
+    def _text(self, relative: str) -> str:
+        bundler = self._bundler()
+        return bundler.bundle_text(Path(relative), self.source / relative)
+
+    def test_inlines_managed_files_only(self):
+        """管理下のファイルは展開し、管理外の _local は読み込みのまま残すことを確認."""
+        lines = self._text(".bashrc").splitlines()
+        self.assertIn("# >>> ~/.aliases (バンドル)", lines)
+        self.assertIn("alias ll='ls -l'", lines)
+        self.assertNotIn('source "$HOME/.aliases"', lines)
+        self.assertIn(". ~/.bashrc_local", lines)
+        self.assertIn("[ -f ~/.bashrc_local ] && . ~/.bashrc_local", lines)
+
+    def test_nested_includes(self):
+        """読み込み先がさらに読み込むファイルも展開することを確認."""
+        (self.source / ".bash_profile").write_text("  . ~/.bashrc\n")
+        lines = self._text(".bash_profile").splitlines()
+        self.assertIn("  # >>> ~/.bashrc (バンドル)", lines)
+        self.assertIn("alias ll='ls -l'", lines)
+        self.assertIn("  # <<< ~/.bashrc", lines)
+
+    def test_self_referencing_file_is_kept(self):
+        """自分のパスを参照するファイルは展開しないことを確認."""
+        (self.source / ".aliases").write_text('here="${BASH_SOURCE[0]}"\n')
+        lines = self._text(".bashrc").splitlines()
+        self.assertIn('source "$HOME/.aliases"', lines)
+
+    def test_file_that_may_return_is_kept(self):
+        """読み込み元ごと抜ける return を含むファイルは展開せず、関数内の return は展開することを確認."""
+        for text in (
+            "return\n",
+            '[ -z "$PS1" ] && return\n',
+            "command -v git >/dev/null || return 0\n",
+            'if [ -z "$PS1" ]; then return; fi\n',
+            "case $- in *i*) ;; *) return;; esac\n",
+            "while true; do return; done\n",
+        ):
+            with self.subTest(text=text):
+                (self.source / ".aliases").write_text(text)
+                lines = self._text(".bashrc").splitlines()
+                self.assertIn('source "$HOME/.aliases"', lines)
+
+        (self.source / ".aliases").write_text("greet() {\n  echo hi\n  return 0\n}\n")
+        lines = self._text(".bashrc").splitlines()
+        self.assertIn("# >>> ~/.aliases (バンドル)", lines)
+
+    def test_cycles_are_not_expanded(self):
+        """互いに読み込み合うファイルは2回目を展開しないことを確認."""
+        (self.source / ".aliases").write_text(". ~/.bashrc\n")
+        lines = self._text(".bashrc").splitlines()
+        self.assertIn(". ~/.bashrc", lines)
+        self.assertEqual(lines.count("# >>> ~/.aliases (バンドル)"), 1)
+
+    def test_fresh_until_include_changes(self):
+        """生成後は新しいままで、読み込み先が変われば作り直しが必要になることを確認."""
+        relative = Path(".bashrc")
+        bundler = self._bundler()
+        self.assertFalse(bundler.is_fresh(relative, self.source / ".bashrc"))
+        self.assertEqual(
+            bundler.bundle_batch([(relative, self.source / ".bashrc")]), {relative: None}
+        )
+
+        reloaded = self._bundler()
+        self.assertTrue(reloaded.is_fresh(relative, self.source / ".bashrc"))
+        (self.source / ".aliases").write_text("alias la='ls -a'\n")
+        self.assertFalse(reloaded.is_fresh(relative, self.source / ".bashrc"))
+
+
+class TestBundleInstall(unittest.TestCase):
+    """PlanBuilder / PlanExecutor / Baker からの利用のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.state = self.tmp_path / "state"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        (self.source / ".bashrc").write_text(". ~/.aliases\n")
+        (self.source / ".aliases").write_text("alias ll='ls -l'\n")
+        self.bundler = ShellBundler(
+            layers=[self.source],
+            generated_dir=self.state / "bundled",
+            cache_path=self.state / "bundle-cache.json",
+        )
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _install(self):
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, bundler=self.bundler).build()
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+            bundler=self.bundler,
+        )
+        return plan, executor.execute(plan)
+
+    def test_links_to_bundle(self):
+        """起動ファイルはバンドルへのリンク、それ以外は source へのリンクになることを確認."""
+        plan, report = self._install()
+
+        actions = [(str(e.spec.relative_path), e.action) for e in plan.entries]
+        self.assertIn((".bashrc", ActionType.RENDER), actions)
+        self.assertIn((".bashrc", ActionType.CREATE), actions)
+        self.assertEqual(report.errors, 0)
+
+        bashrc = self.dest / ".bashrc"
+        self.assertEqual(bashrc.resolve(), (self.state / "bundled" / ".bashrc").resolve())
+        self.assertIn("alias ll='ls -l'", bashrc.read_text())
+        self.assertEqual((self.dest / ".aliases").resolve(), (self.source / ".aliases").resolve())
+
+        plan, _ = self._install()
+        self.assertEqual({e.action for e in plan.entries}, {ActionType.SKIP})
+
+    def test_replaces_unbundled_link_without_confirmation(self):
+        """展開前の source を指すリンクは確認なしでバンドルに置き換えることを確認."""
+        (self.dest / ".bashrc").symlink_to(self.source / ".bashrc")
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, bundler=self.bundler).build()
+
+        (entry,) = [
+            e
+            for e in plan.entries
+            if e.spec.relative_path == Path(".bashrc") and e.action is not ActionType.RENDER
+        ]
+        self.assertEqual(entry.action, ActionType.UPDATE)
+        self.assertFalse(entry.needs_confirmation)
+
+    def test_bake_writes_bundle_contents(self):
+        """bake ではバンドルへのリンクではなく展開した内容を書き出すことを確認."""
+        builder = PlanBuilder(
+            source_dir=self.source, dest_dir=self.dest, bundler=self.bundler, assume_empty=True
+        )
+        index = builder.build_index()
+        plan = builder.build(index)
+        output = io.BytesIO()
+        with tarfile.open(fileobj=output, mode="w") as tar:
+            report = Baker(tar, index, bundler=self.bundler).bake(plan.entries)
+        self.assertEqual(report.errors, [])
+
+        output.seek(0)
+        with tarfile.open(fileobj=output) as archive:
+            member = archive.getmember(".bashrc")
+            self.assertTrue(member.isfile())
+            data = archive.extractfile(member).read().decode()
+        self.assertIn("alias ll='ls -l'", data)
+
+
+if __name__ == "__main__":
+    unittest.main()
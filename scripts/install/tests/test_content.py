@@ -0,0 +1,170 @@
+"""ファイルのコピー (content) とコピーモードのインストールのテスト."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from scripts.install.pkg import content
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.content import copy_file_atomic, is_copy_current
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor, temp_link_path
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.ui import UserInterface
+
+
+class TestCopyFileAtomic(unittest.TestCase):
+    """copy_file_atomic と is_copy_current のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "script.sh"
+        self.dest = self.tmp_path / "copy.sh"
+        self.source.write_bytes(b"#!/bin/sh\necho hi\n" * 1000)
+        self.source.chmod(0o755)
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _copy(self) -> int:
+        return copy_file_atomic(self.source, self.dest, temp_link_path(self.dest))
+
+    def test_copies_content_mode_and_mtime(self):
+        """内容・権限・mtime がコピーされ、一時ファイルが残らないことを確認."""
+        size = self._copy()
+
+        self.assertEqual(size, self.source.stat().st_size)
+        self.assertEqual(self.dest.read_bytes(), self.source.read_bytes())
+        self.assertEqual(self.dest.stat().st_mode & 0o777, 0o755)
+        self.assertEqual(self.dest.stat().st_mtime_ns, self.source.stat().st_mtime_ns)
+        self.assertFalse(temp_link_path(self.dest).exists())
+        self.assertTrue(is_copy_current(self.source, self.dest))
+
+    def test_falls_back_to_plain_copy(self):
+        """reflink も copy_file_range も使えない環境でもコピーできることを確認."""
+        with (
+            mock.patch.object(content, "_clone", return_value=False),
+            mock.patch.object(content, "_copy_range", return_value=False),
+        ):
+            self._copy()
+        self.assertEqual(self.dest.read_bytes(), self.source.read_bytes())
+
+    def test_copy_file_range_returning_zero(self):
+        """copy_file_range が何もコピーしなければ通常のコピーに戻り、途中で止まればエラーになることを確認."""
+        self.dest.write_text("old\n")
+        with (
+            mock.patch.object(content, "_clone", return_value=False),
+            mock.patch.object(os, "copy_file_range", return_value=0, create=True),
+        ):
+            self._copy()
+        self.assertEqual(self.dest.read_bytes(), self.source.read_bytes())
+
+        self.dest.write_text("old\n")
+        with (
+            mock.patch.object(content, "_clone", return_value=False),
+            mock.patch.object(os, "copy_file_range", side_effect=[100, 0], create=True),
+            self.assertRaises(OSError),
+        ):
+            self._copy()
+        self.assertEqual(self.dest.read_text(), "old\n")
+        self.assertFalse(temp_link_path(self.dest).exists())
+
+    def test_failed_copy_keeps_old_file(self):
+        """コピーに失敗しても既存のファイルはそのまま残ることを確認."""
+        self.dest.write_text("old\n")
+        with (
+            mock.patch.object(content, "_clone", side_effect=OSError("boom")),
+            self.assertRaises(OSError),
+        ):
+            self._copy()
+        self.assertEqual(self.dest.read_text(), "old\n")
+        self.assertFalse(temp_link_path(self.dest).exists())
+
+    def test_is_copy_current(self):
+        """サイズ・mtime・内容の順に判定されることを確認."""
+        self.assertFalse(is_copy_current(self.source, self.dest))
+        self._copy()
+
+        # mtime だけ違っても内容が同じなら最新とみなす
+        os.utime(self.dest, ns=(0, 0))
+        self.assertTrue(is_copy_current(self.source, self.dest))
+
+        # サイズが同じでも内容が違えば最新ではない
+        data = bytearray(self.source.read_bytes())
+        data[0] ^= 1
+        self.dest.write_bytes(bytes(data))
+        self.assertFalse(is_copy_current(self.source, self.dest))
+
+        # リンクはコピーとはみなさない
+        self.dest.unlink()
+        self.dest.symlink_to(self.source)
+        self.assertFalse(is_copy_current(self.source, self.dest))
+
+
+class TestCopyModeInstall(unittest.TestCase):
+    """PlanBuilder / PlanExecutor のコピーモードのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        (self.source / ".config").mkdir(parents=True)
+        self.dest.mkdir()
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "app.toml").write_text("# app\n")
+        # 以前のリンクモードで張ったリンク
+        (self.dest / ".bashrc").symlink_to((self.source / ".bashrc").resolve())
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _install(self):
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, copy_mode=True).build()
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+            copy_mode=True,
+        )
+        return plan, executor.execute(plan)
+
+    def test_copies_and_then_skips(self):
+        """コピーでインストールされ、2回目は変更なしになることを確認."""
+        plan, report = self._install()
+
+        bashrc = next(e for e in plan.entries if str(e.spec.relative_path) == ".bashrc")
+        self.assertEqual(bashrc.action, ActionType.UPDATE)
+        self.assertFalse(bashrc.needs_confirmation)
+        self.assertEqual(report.errors, 0)
+        for name in (".bashrc", ".config/app.toml"):
+            self.assertFalse((self.dest / name).is_symlink())
+            self.assertEqual((self.dest / name).read_text(), (self.source / name).read_text())
+
+        plan, _ = self._install()
+        self.assertEqual({e.action for e in plan.entries}, {ActionType.SKIP})
+
+    def test_modified_copy_needs_confirmation(self):
+        """インストール先で編集されたコピーは確認とバックアップが必要になることを確認."""
+        self._install()
+        (self.dest / ".bashrc").write_text("# edited\n")
+
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, copy_mode=True).build()
+        bashrc = next(e for e in plan.entries if str(e.spec.relative_path) == ".bashrc")
+        self.assertEqual(bashrc.action, ActionType.UPDATE)
+        self.assertTrue(bashrc.needs_confirmation)
+        self.assertTrue(bashrc.needs_backup)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""PlanDaemon（Unix ソケットで問い合わせに答えるデーモン）のテスト."""
+
+from __future__ import annotations
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.daemon import DaemonAlreadyRunningError, PlanDaemon, query
+
+
+class TestPlanDaemon(unittest.TestCase):
+    """索引・変更検知・ソケット経由の問い合わせのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.socket_path = self.tmp_path / "daemon.sock"
+        (self.source / ".config").mkdir(parents=True)
+        self.dest.mkdir()
+
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "app.toml").write_text("# app\n")
+        (self.dest / ".bashrc").symlink_to((self.source / ".bashrc").resolve())
+
+        self.daemon = PlanDaemon(self.source, self.dest, self.socket_path, poll_interval=60)
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _serve(self) -> None:
+        thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.daemon.shutdown)
+        for _ in range(200):
+            try:
+                query(self.socket_path, {"op": "ping"})
+                break
+            except OSError:
+                threading.Event().wait(0.01)
+
+    def test_answers_queries_from_index(self):
+        """managed / drift / status に索引から答えることを確認."""
+        index = self.daemon.refresh()
+
+        managed = index.answer({"op": "managed", "path": str(self.dest / ".bashrc")})
+        self.assertEqual(managed["action"], "SKIP")
+        self.assertTrue(managed["managed"])
+        # source/ 側のパスでも引ける
+        by_source = index.answer({"op": "managed", "path": str(self.source / ".bashrc")})
+        self.assertEqual(by_source["path"], ".bashrc")
+        self.assertFalse(index.answer({"op": "managed", "path": "/etc/hosts"})["managed"])
+
+        drift = index.answer({"op": "drift"})
+        self.assertEqual([d["path"] for d in drift["drifted"]], [".config", ".config/app.toml"])
+        self.assertFalse(index.answer({"op": "unknown"})["ok"])
+
+    def test_poll_rebuilds_only_on_change(self):
+        """監視対象のディレクトリが変わったときだけ作り直すことを確認."""
+        self.daemon.refresh()
+        self.assertFalse(self.daemon.poll())
+
+        (self.dest / ".config").mkdir()
+        os.symlink((self.source / ".config" / "app.toml").resolve(), self.dest / ".config/app.toml")
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual(self.daemon.index.generation, 2)
+        self.assertEqual(self.daemon.index.answer({"op": "drift"})["count"], 0)
+
+        (self.source / ".vimrc").write_text("# vimrc\n")
+        self.assertTrue(self.daemon.poll())
+        managed = self.daemon.index.answer({"op": "managed", "path": str(self.dest / ".vimrc")})
+        self.assertEqual(managed["action"], "CREATE")
+
+    def test_poll_detects_in_place_edits(self):
+        """ディレクトリの mtime が変わらないその場での編集も検知することを確認."""
+        (self.dest / ".gitconfig").write_text("[user]\n")
+        (self.source / ".gitconfig").write_text("[user]\n")
+        self.daemon.refresh()
+        self.assertEqual(self._action(".gitconfig"), "ADOPT")
+        directories = [os.stat(p).st_mtime_ns for p in (self.source, self.dest)]
+
+        with (self.dest / ".gitconfig").open("a") as stream:
+            stream.write("  name = me\n")
+        os.utime(self.dest / ".gitconfig", ns=(1, 1))
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual(self._action(".gitconfig"), "UPDATE")
+
+        with (self.source / ".config" / "app.toml").open("a") as stream:
+            stream.write("key = 1\n")
+        os.utime(self.source / ".config" / "app.toml", ns=(1, 1))
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual([os.stat(p).st_mtime_ns for p in (self.source, self.dest)], directories)
+
+    def _action(self, relative: str) -> str:
+        answer = self.daemon.index.answer({"op": "managed", "path": str(self.dest / relative)})
+        return answer["action"]
+
+    def test_socket_round_trip(self):
+        """ソケット経由で問い合わせられ、停止後はソケットが消えることを確認."""
+        self._serve()
+
+        response = query(self.socket_path, {"op": "status"})
+        self.assertEqual(response["entries"], 3)
+
+        # 1つの接続で複数のリクエストを送れる
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(self.socket_path))
+            stream = client.makefile("rwb")
+            for _ in range(3):
+                stream.write(b'{"op": "ping"}\n')
+                stream.flush()
+                self.assertEqual(stream.readline(), b'{"ok":true}\n')
+            stream.write(b"not json\n")
+            stream.flush()
+            self.assertIn(b'"ok":false', stream.readline())
+
+        self.daemon.shutdown()
+        for _ in range(200):
+            if not self.socket_path.exists():
+                break
+            threading.Event().wait(0.01)
+        self.assertFalse(self.socket_path.exists())
+
+    def test_refuses_second_daemon(self):
+        """同じソケットで2つ目のデーモンは起動できないことを確認."""
+        self._serve()
+
+        second = PlanDaemon(self.source, self.dest, self.socket_path)
+        with self.assertRaises(DaemonAlreadyRunningError):
+            second.serve_forever()
+
+    def test_replaces_stale_socket(self):
+        """前回の残骸のソケットファイルは置き換えて起動することを確認."""
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(self.socket_path))
+        stale.close()
+
+        self._serve()
+        self.assertTrue(query(self.socket_path, {"op": "ping"})["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
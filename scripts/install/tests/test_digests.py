@@ -0,0 +1,173 @@
+"""DigestCache（inode・サイズ・mtime をキーにしたダイジェストのキャッシュ）のテスト."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.content import same_content
+from scripts.install.pkg.digests import MAGIC, RECORD, DigestCache, hash_file
+from scripts.install.pkg.fs import PosixFS
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.model import ActionType
+
+# 記録される程度に古い mtime（ナノ秒）
+OLD_MTIME_NS = 1_600_000_000 * 10**9
+
+
+def _write_old(path: Path, text: str) -> None:
+    path.write_text(text)
+    os.utime(path, ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+
+
+class TestDigestCache(unittest.TestCase):
+    """ダイジェストの計算・再利用・保存のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.cache_path = self.tmp_path / "rollbacks.digests"
+        self.file = self.tmp_path / "file"
+        _write_old(self.file, "content\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_reused_across_runs(self):
+        """保存したダイジェストを次の実行では読まずに返すことを確認."""
+        cache = DigestCache.load(self.cache_path)
+        digest = cache.digest(self.file)
+        self.assertEqual(digest, hash_file(self.file))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        cache.save()
+        self.assertEqual(self.cache_path.stat().st_size, len(MAGIC) + RECORD.size)
+
+        reloaded = DigestCache.load(self.cache_path)
+        self.assertEqual(reloaded.digest(self.file), digest)
+        self.assertEqual((reloaded.hits, reloaded.misses), (1, 0))
+
+    def test_concurrent_saves_are_merged(self):
+        """保存時に、読み込んだ後で他のプロセスが保存した記録を残すことを確認."""
+        other = self.tmp_path / "other"
+        _write_old(other, "other\n")
+        mine = DigestCache.load(self.cache_path)
+        mine.digest(self.file)
+        theirs = DigestCache.load(self.cache_path)
+        theirs.digest(other)
+        theirs.save()
+        mine.save()
+
+        reloaded = DigestCache.load(self.cache_path)
+        self.assertEqual(len(reloaded.entries), 2)
+        self.assertEqual(reloaded.digest(other), hash_file(other))
+        self.assertEqual(reloaded.hits, 1)
+
+        # open() は使うまで読み込まない
+        lazy = DigestCache.open(self.cache_path)
+        self.assertEqual(lazy.entries, {})
+        lazy.digest(self.file)
+        self.assertEqual((len(lazy.entries), lazy.hits), (2, 1))
+
+    def test_changed_file_is_rehashed(self):
+        """内容を変えるとキーが変わり、計算し直すことを確認."""
+        cache = DigestCache.load(self.cache_path)
+        before = cache.digest(self.file)
+        _write_old(self.file, "changed\n")
+        os.utime(self.file, ns=(OLD_MTIME_NS + 1, OLD_MTIME_NS + 1))
+        self.assertNotEqual(cache.digest(self.file), before)
+        self.assertEqual(cache.misses, 2)
+
+    def test_recent_files_are_not_recorded(self):
+        """mtime が新しすぎるファイルはダイジェストを返すが記録しないことを確認."""
+        recent = self.tmp_path / "recent"
+        recent.write_text("just written\n")
+        cache = DigestCache.load(self.cache_path)
+        self.assertEqual(cache.digest(recent), hash_file(recent))
+        self.assertEqual(cache.entries, {})
+        cache.save()
+        self.assertFalse(self.cache_path.exists())
+
+    def test_corrupt_cache_is_ignored(self):
+        """壊れたキャッシュファイルは空として扱うことを確認."""
+        self.cache_path.write_bytes(MAGIC + b"\x00" * 5)
+        cache = DigestCache.load(self.cache_path)
+        self.assertEqual(cache.entries, {})
+        self.assertIsNone(cache.digest(self.tmp_path / "missing"))
+
+
+class TestDigestCacheUsers(unittest.TestCase):
+    """same_content・PlanBuilder・BackupManager からの利用のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.source.mkdir()
+        self.dest.mkdir()
+        self.cache = DigestCache.load(self.tmp_path / "rollbacks.digests")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_builder_compares_by_cached_digest(self):
+        """同じ内容の判定を記録し、2回目の計画ではどちらも読まないことを確認."""
+        _write_old(self.source / ".bashrc", "# same\n")
+        _write_old(self.dest / ".bashrc", "# same\n")
+        _write_old(self.source / ".vimrc", "# new\n")
+        _write_old(self.dest / ".vimrc", "# old\n")
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.dest, fs=PosixFS(self.cache))
+
+        actions = {e.spec.relative_path: e.action for e in builder.build().entries}
+        self.assertEqual(actions[Path(".bashrc")], ActionType.ADOPT)
+        self.assertEqual(actions[Path(".vimrc")], ActionType.UPDATE)
+        # 最後まで比べた .bashrc の2つだけが記録される
+        self.assertEqual(len(self.cache.entries), 2)
+
+        builder.build()
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_backup_links_unchanged_files(self):
+        """直前のアーカイブと同じ内容のバックアップはハードリンクにすることを確認."""
+        _write_old(self.dest / ".bashrc", "# same\n")
+        _write_old(self.dest / ".vimrc", "# first\n")
+        rollbacks = self.tmp_path / "rollbacks"
+        first = BackupManager(rollbacks_root=rollbacks, digests=self.cache)
+        first_archive = first.start()
+        first.backup(self.dest / ".bashrc", Path(".bashrc"))
+        first.backup(self.dest / ".vimrc", Path(".vimrc"))
+
+        _write_old(self.dest / ".vimrc", "# second\n")
+        second = BackupManager(rollbacks_root=rollbacks, digests=self.cache)
+        archive = second.start()
+        self.assertEqual(second.backup(self.dest / ".bashrc", Path(".bashrc")), 0)
+        self.assertEqual(second.backup(self.dest / ".vimrc", Path(".vimrc")), len("# second\n"))
+
+        self.assertTrue((archive / ".bashrc").samefile(first_archive / ".bashrc"))
+        self.assertFalse((archive / ".vimrc").samefile(first_archive / ".vimrc"))
+        self.assertEqual((archive / ".vimrc").read_text(), "# second\n")
+        self.assertEqual(second.bytes_written, len("# second\n"))
+
+    def test_different_files_stop_early(self):
+        """記録がなく内容が違うファイルは先頭から比べてやめ、何も記録しないことを確認."""
+        left, right = self.tmp_path / "left", self.tmp_path / "right"
+        _write_old(left, "a" + "x" * 4096)
+        _write_old(right, "b" + "x" * 4096)
+        self.assertFalse(same_content(left, right, digests=self.cache))
+        self.assertEqual(self.cache.entries, {})
+
+        # 片方だけ記録があっても、もう片方を読んで比べる
+        self.cache.digest(left)
+        self.assertFalse(same_content(left, right, digests=self.cache))
+        self.assertTrue(same_content(left, left, digests=self.cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""EventWriter と PlanExecutor のイベント出力のテスト."""
+
+from __future__ import annotations
+
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.events import EventWriter
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.ui import UserInterface
+
+
+def read_events(buffer: io.BytesIO) -> list[dict]:
+    return [json.loads(line) for line in buffer.getvalue().decode("utf-8").splitlines()]
+
+
+class TestEventWriter(unittest.TestCase):
+    """EventWriter のテスト."""
+
+    def test_buffered_until_flush(self):
+        """batch_size に達するまで書き込まれないことを確認."""
+        buffer = io.BytesIO()
+        writer = EventWriter(buffer, batch_size=3)
+
+        writer.emit("a")
+        writer.emit("b")
+        self.assertEqual(buffer.getvalue(), b"")
+
+        writer.emit("c")
+        self.assertEqual([e["event"] for e in read_events(buffer)], ["a", "b", "c"])
+
+    def test_phase_records_start_and_end(self):
+        """フェーズの開始・終了イベントが出力されることを確認."""
+        buffer = io.BytesIO()
+        writer = EventWriter(buffer)
+
+        with writer.phase("plan") as extra:
+            extra["entries"] = 3
+
+        events = read_events(buffer)
+        self.assertEqual([e["event"] for e in events], ["phase_start", "phase_end"])
+        self.assertEqual(events[1]["phase"], "plan")
+        self.assertEqual(events[1]["status"], "ok")
+        self.assertEqual(events[1]["entries"], 3)
+        self.assertIn("duration", events[1])
+
+
+class TestExecutorEvents(unittest.TestCase):
+    """PlanExecutor の結果イベントのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.rollbacks = self.tmp_path / "rollbacks"
+
+        self.source.mkdir()
+        self.dest.mkdir()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_result_per_entry(self):
+        """エントリごとに結果とバックアップサイズが出力されることを確認."""
+        (self.source / ".bashrc").write_text("# new bashrc\n")
+        (self.source / ".vimrc").write_text("# vimrc\n")
+        (self.dest / ".bashrc").write_text("# existing bashrc\n")
+
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        buffer = io.BytesIO()
+        events = EventWriter(buffer)
+        ui = UserInterface()
+        ui.confirm = lambda msg, default_yes=True: True
+        executor = PlanExecutor(
+            ui=ui,
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.rollbacks),
+            events=events,
+        )
+
+        executor.execute(plan)
+        events.flush()
+
+        results = {e["path"]: e for e in read_events(buffer) if e["event"] == "result"}
+        self.assertEqual(set(results), {".bashrc", ".vimrc"})
+        self.assertEqual(results[".bashrc"]["action"], "UPDATE")
+        self.assertEqual(results[".bashrc"]["status"], "applied")
+        self.assertEqual(results[".bashrc"]["backup_bytes"], len("# existing bashrc\n"))
+        self.assertEqual(results[".vimrc"]["backup_bytes"], 0)
+        self.assertIsNone(results[".vimrc"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""FileSystem（PosixFS / MemoryFS）と、MemoryFS 上での計画・実行・ロールバックのテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.fs import MemoryFS, PosixFS
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.rollback_manager import RollbackManager
+from scripts.install.pkg.ui import UserInterface
+
+
+class FileSystemContract:
+    """PosixFS と MemoryFS が同じように振る舞うことを確認するテスト（root 配下で操作する）."""
+
+    fs: PosixFS | MemoryFS
+    root: Path
+
+    def test_files_links_and_dirs(self):
+        """種類の判定とリンクの解決が同じになることを確認."""
+        fs, root = self.fs, self.root
+        fs.mkdir(root / "a" / "b", parents=True)
+        fs.write_text(root / "a" / "b" / "file", "data")
+        fs.symlink(str(root / "a"), root / "link-dir")
+        fs.symlink("b/file", root / "a" / "rel-link")
+        fs.symlink(str(root / "missing"), root / "broken")
+
+        self.assertTrue(fs.is_dir(root / "link-dir"))
+        self.assertTrue(fs.is_symlink(root / "link-dir"))
+        self.assertTrue(fs.is_file(root / "link-dir" / "b" / "file"))
+        self.assertEqual(fs.read_text(root / "a" / "rel-link"), "data")
+        self.assertEqual(fs.resolve(root / "a" / "rel-link"), fs.resolve(root / "a" / "b" / "file"))
+        self.assertEqual(fs.readlink(root / "a" / "rel-link"), "b/file")
+        self.assertFalse(fs.exists(root / "broken"))
+        self.assertTrue(fs.is_symlink(root / "broken"))
+        self.assertEqual(fs.resolve(root / "broken"), fs.resolve(root) / "missing")
+        self.assertEqual(fs.size(root / "a" / "b" / "file"), 4)
+
+        entries = {e.name: (e.is_dir, e.is_symlink) for e in fs.scandir(root)}
+        self.assertEqual(
+            entries, {"a": (True, False), "link-dir": (True, True), "broken": (False, True)}
+        )
+
+    def test_errors_match_os(self):
+        """エラーが os と同じ例外になることを確認."""
+        fs, root = self.fs, self.root
+        fs.mkdir(root / "dir")
+        fs.write_text(root / "file", "x")
+        with self.assertRaises(FileExistsError):
+            fs.mkdir(root / "dir")
+        fs.mkdir(root / "dir", exist_ok=True)
+        with self.assertRaises(FileNotFoundError):
+            fs.mkdir(root / "x" / "y")
+        with self.assertRaises(FileNotFoundError):
+            fs.unlink(root / "nothing")
+        fs.unlink(root / "nothing", missing_ok=True)
+        with self.assertRaises(FileExistsError):
+            fs.symlink("target", root / "file")
+        with self.assertRaises(OSError):
+            fs.readlink(root / "file")
+        with self.assertRaises(IsADirectoryError):
+            fs.replace(root / "file", root / "dir")
+
+    def test_replace_and_copy(self):
+        """rename での置き換えと、内容の比較・コピーを確認."""
+        fs, root = self.fs, self.root
+        fs.write_text(root / "src", "same")
+        fs.write_text(root / "other", "same")
+        fs.symlink("src", root / "tmp")
+        fs.replace(root / "tmp", root / "other")
+        self.assertTrue(fs.is_symlink(root / "other"))
+
+        fs.copy_file(root / "src", root / "copy")
+        self.assertTrue(fs.same_content(root / "src", root / "copy"))
+        self.assertTrue(fs.is_copy_current(root / "src", root / "copy"))
+        # リンクはコピーとして最新とはみなさない
+        self.assertFalse(fs.is_copy_current(root / "src", root / "other"))
+        self.assertEqual(fs.copy_file_atomic(root / "src", root / "atomic", root / ".tmp"), 4)
+        self.assertFalse(fs.exists(root / ".tmp"))
+
+
+class TestPosixFS(FileSystemContract, unittest.TestCase):
+    """PosixFS のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.test_dir.name)
+        self.fs = PosixFS()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+
+class TestMemoryFS(FileSystemContract, unittest.TestCase):
+    """MemoryFS のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.fs = MemoryFS()
+        self.root = Path("/work")
+        self.fs.mkdir(self.root)
+
+    def test_symlink_loop(self):
+        """リンクの循環は ELOOP の OSError になることを確認."""
+        self.fs.symlink(str(self.root / "b"), self.root / "a")
+        self.fs.symlink(str(self.root / "a"), self.root / "b")
+        self.assertFalse(self.fs.exists(self.root / "a"))
+        with self.assertRaises(OSError):
+            self.fs.resolve(self.root / "a")
+
+    def test_latency_is_injected_per_operation(self):
+        """操作ごとに latency だけ待つことを確認."""
+        fs = MemoryFS(latency=0.01)
+        fs.add_file(Path("/f"), "x")
+        started = time.perf_counter()
+        for _ in range(5):
+            fs.exists(Path("/f"))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+
+class TestInstallOnMemoryFS(unittest.TestCase):
+    """MemoryFS 上での計画・実行・バックアップ・ロールバックのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.fs = MemoryFS()
+        self.source = Path("/repo/source")
+        self.home = Path("/home/me")
+        self.rollbacks = Path("/repo/rollbacks")
+        self.fs.mkdir(self.home, parents=True)
+
+    def _executor(self) -> PlanExecutor:
+        return PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.rollbacks, fs=self.fs),
+            fs=self.fs,
+        )
+
+    def test_large_tree_plan_and_execute(self):
+        """大量のファイルでも実ファイルシステムを使わずに計画・実行できることを確認."""
+        for d in range(100):
+            for f in range(100):
+                self.fs.add_file(self.source / f"dir{d}" / f"file{f}", f"{d}/{f}")
+
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.home, fs=self.fs)
+        plan = builder.build()
+        self.assertEqual(plan.summary().counts[ActionType.CREATE], 10_000)
+
+        report = self._executor().execute(plan, dry_run=False)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(report.applied, 10_100)
+        self.assertEqual(self.fs.read_text(self.home / "dir42" / "file7"), "42/7")
+
+        replanned = builder.build()
+        self.assertEqual({e.action for e in replanned.entries}, {ActionType.SKIP})
+
+    def test_backup_and_rollback(self):
+        """上書き時のバックアップと、そこからの復元を確認."""
+        self.fs.add_file(self.source / ".bashrc", "# new\n")
+        self.fs.add_file(self.home / ".bashrc", "# local\n")
+        self.fs.add_file(self.source / ".vimrc", "# vimrc\n")
+        self.fs.add_symlink(self.home / ".vimrc", "/elsewhere/vimrc")
+
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.home, fs=self.fs).build()
+        self._executor().execute(plan, dry_run=False)
+        self.assertEqual(self.fs.read_text(self.home / ".bashrc"), "# new\n")
+
+        (archive,) = [e.path for e in self.fs.scandir(self.rollbacks)]
+        manager = RollbackManager(target_root=self.home, ui=UserInterface(), fs=self.fs)
+        manager.restore_archive(archive, restore_all=True)
+        self.assertFalse(self.fs.is_symlink(self.home / ".bashrc"))
+        self.assertEqual(self.fs.read_text(self.home / ".bashrc"), "# local\n")
+        self.assertEqual(self.fs.readlink(self.home / ".vimrc"), "/elsewhere/vimrc")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""世代モード（GenerationStore と、それを使う PlanBuilder / PlanExecutor）のテスト."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.generations import GenerationStore
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.templates import TemplateRenderer
+from scripts.install.pkg.ui import UserInterface
+
+
+class TestGenerationStore(unittest.TestCase):
+    """世代の作成・切り替え・削除のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.store = GenerationStore(self.tmp_path / "generations")
+        self.target = self.tmp_path / "bashrc"
+        self.target.write_text("# bashrc\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_create_and_activate(self):
+        """リンクファームを作り、current を切り替えられることを確認."""
+        self.assertIsNone(self.store.current())
+        number = self.store.create([(Path(".config/app/bashrc"), self.target, False)])
+        self.assertEqual(number, 1)
+        # 有効化するまで current は作られない
+        self.assertFalse(self.store.current_path.exists())
+
+        self.store.activate(number)
+        self.assertEqual(self.store.current(), 1)
+        link = self.store.link_path(Path(".config/app/bashrc"))
+        self.assertEqual(link.read_text(), "# bashrc\n")
+
+    def test_switch_is_single_rename(self):
+        """切り替えは current の置き換えだけで、古い世代は残ることを確認."""
+        first = self.store.create([(Path("a"), self.target, False)])
+        second = self.store.create([(Path("b"), self.target, False)])
+        self.store.activate(second)
+        self.assertEqual(self.store.previous(), first)
+
+        self.store.activate(first)
+        self.assertTrue(self.store.link_path(Path("a")).exists())
+        self.assertFalse(self.store.link_path(Path("b")).exists())
+        self.assertEqual(self.store.list(), [1, 2])
+        self.assertIsNone(self.store.previous())
+
+        with self.assertRaises(ValueError):
+            self.store.activate(5)
+
+    def test_copy_pins_content(self):
+        """コピー指定のファイルは、元が書き換わっても世代の内容が変わらないことを確認."""
+        number = self.store.create([(Path("out"), self.target, True)])
+        self.target.write_text("# changed\n")
+        self.assertEqual((self.store.root / str(number) / "out").read_text(), "# bashrc\n")
+
+    def test_unfinished_generation_is_ignored(self):
+        """作成途中で中断した世代は一覧に含まれず、次の作成で作り直されることを確認."""
+        (self.store.root / "1.building").mkdir(parents=True)
+        self.assertEqual(self.store.list(), [])
+        self.assertEqual(self.store.create([]), 1)
+        self.assertFalse((self.store.root / "1.building").exists())
+
+    def test_prune_keeps_current(self):
+        """古い世代を削除しても、現在の世代は残ることを確認."""
+        for _ in range(4):
+            self.store.create([])
+        self.store.activate(1)
+        self.assertEqual(self.store.prune(2), [2])
+        self.assertEqual(self.store.list(), [1, 3, 4])
+
+
+class TestGenerationInstall(unittest.TestCase):
+    """世代モードでの計画と実行のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.rollbacks = self.tmp_path / "rollbacks"
+        self.state = self.tmp_path / "state"
+        (self.source / ".config").mkdir(parents=True)
+        self.dest.mkdir()
+
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "app.toml").write_text("# app\n")
+        self.store = GenerationStore(self.state / "generations")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _install(
+        self, renderer: TemplateRenderer | None = None, overlays: list[Path] | None = None
+    ):
+        builder = PlanBuilder(
+            source_dir=self.source,
+            dest_dir=self.dest,
+            overlays=overlays or [],
+            renderer=renderer,
+            link_root=self.store.current_path,
+        )
+        plan = builder.build()
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.rollbacks),
+            renderer=renderer,
+            generations=self.store,
+        )
+        return plan, executor.execute(plan, dry_run=False)
+
+    def test_links_point_through_current(self):
+        """インストール先のリンクが current 経由で source を指すことを確認."""
+        _, report = self._install()
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(self.store.current(), 1)
+
+        bashrc = self.dest / ".bashrc"
+        self.assertEqual(os.readlink(bashrc), str(self.store.current_path / ".bashrc"))
+        self.assertEqual(bashrc.resolve(), (self.source / ".bashrc").resolve())
+
+        # 2回目は何も変わらない（新しい世代は作るがリンクは張り直さない）
+        plan, report = self._install()
+        self.assertEqual({e.action for e in plan.entries}, {ActionType.SKIP})
+        self.assertEqual(report.applied, 0)
+
+    def test_rollback_switches_all_files(self):
+        """1つ前の世代に戻すと、インストール先のリンクを触らずに全体が戻ることを確認."""
+        self._install()
+        work = self.tmp_path / "source.work"
+        work.mkdir()
+        (work / ".bashrc").write_text("# work\n")
+        (self.source / ".vimrc").write_text("# vimrc\n")
+        self._install(overlays=[work])
+        self.assertEqual((self.dest / ".bashrc").read_text(), "# work\n")
+
+        self.store.activate(self.store.previous())
+        self.assertEqual((self.dest / ".bashrc").read_text(), "# bashrc\n")
+        # 前の世代にないファイルは見えなくなる
+        self.assertTrue((self.dest / ".vimrc").is_symlink())
+        self.assertFalse((self.dest / ".vimrc").exists())
+
+    def test_direct_link_is_repointed_without_confirmation(self):
+        """source を直接指す以前のリンクは、確認なしで世代経由に張り替えることを確認."""
+        (self.dest / ".bashrc").symlink_to((self.source / ".bashrc").resolve())
+        builder = PlanBuilder(
+            source_dir=self.source, dest_dir=self.dest, link_root=self.store.current_path
+        )
+        entry = next(e for e in builder.build().entries if e.spec.relative_path == Path(".bashrc"))
+        self.assertEqual(entry.action, ActionType.UPDATE)
+        self.assertFalse(entry.needs_confirmation)
+
+    def test_rendered_output_is_pinned_per_generation(self):
+        """テンプレートの生成物は世代ごとに固定され、戻すと前の内容になることを確認."""
+        (self.source / ".gitconfig.tmpl").write_text("name = $NAME\n")
+        renderer = TemplateRenderer(
+            generated_dir=self.state / "generated",
+            variables={"NAME": "first"},
+            cache_path=self.state / "render-cache.json",
+        )
+        self._install(renderer)
+        self.assertEqual((self.dest / ".gitconfig").read_text(), "name = first\n")
+
+        renderer = TemplateRenderer(
+            generated_dir=self.state / "generated",
+            variables={"NAME": "second"},
+            cache_path=self.state / "render-cache.json",
+        )
+        self._install(renderer)
+        self.assertEqual((self.dest / ".gitconfig").read_text(), "name = second\n")
+
+        self.store.activate(self.store.previous())
+        self.assertEqual((self.dest / ".gitconfig").read_text(), "name = first\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
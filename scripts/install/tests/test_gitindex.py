@@ -0,0 +1,134 @@
+"""GitIndexEnumerator（git のインデックスからの source/ の列挙, --git-index）のテスト."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.gitindex import GitIndexEnumerator, GitIndexError, parse_index
+from scripts.install.pkg.plan.builder import PlanBuilder
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+@unittest.skipUnless(shutil.which("git"), "git が必要です")
+class TestGitIndex(unittest.TestCase):
+    """インデックスの読み込みと PlanBuilder からの利用のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.repo = self.tmp_path / "repo"
+        self.source = self.repo / "source"
+        self.dest = self.tmp_path / "dest"
+        (self.source / ".config" / "nvim").mkdir(parents=True)
+        self.dest.mkdir()
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "nvim" / "init.vim").write_text("set number\n")
+        (self.source / ".vimrc").symlink_to(".config/nvim/init.vim")
+        (self.repo / "README.md").write_text("# repo\n")
+        _git(self.repo, "init", "-q")
+        _git(self.repo, "add", ".")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _entries(self) -> list[tuple[str, int]]:
+        data = (self.repo / ".git" / "index").read_bytes()
+        return [(entry.path, entry.mode) for entry in parse_index(data)]
+
+    def test_matches_ls_files(self):
+        """バージョン 2 と 4 のどちらでも git ls-files と同じパスを読むことを確認."""
+        expected = _git(self.repo, "ls-files", "-z").split("\0")[:-1]
+        self.assertEqual([path for path, _ in self._entries()], expected)
+
+        _git(self.repo, "update-index", "--index-version", "4")
+        self.assertEqual([path for path, _ in self._entries()], expected)
+        self.assertIn(("source/.vimrc", 0o120000), self._entries())
+
+    def test_deleted_but_tracked_files_are_not_listed(self):
+        """作業ツリーで消しただけのファイルは列挙せず、種別の変わったものは取り直すことを確認."""
+        (self.source / ".bashrc").unlink()
+        (self.source / ".vimrc").unlink()
+        (self.source / ".vimrc").write_text("set nocompatible\n")
+
+        tracked = {e.path: e for e in GitIndexEnumerator().list_layer(self.source)}
+        self.assertNotIn(".bashrc", tracked)
+        self.assertFalse(tracked[".vimrc"].is_symlink)
+
+        index = PlanBuilder(
+            source_dir=self.source, dest_dir=self.dest, git_index=GitIndexEnumerator()
+        ).build_index()
+        self.assertNotIn(Path(".bashrc"), index.entries)
+
+        # ファイルがディレクトリに変わったレイヤーは走査に戻る
+        (self.source / ".vimrc").unlink()
+        (self.source / ".vimrc").mkdir()
+        self.assertIsNone(GitIndexEnumerator().list_layer(self.source))
+
+    def test_skip_worktree_entries_are_excluded(self):
+        """sparse checkout で作業ツリーにないエントリは列挙しないことを確認."""
+        _git(self.repo, "update-index", "--skip-worktree", "source/.bashrc")
+        self.assertNotIn("source/.bashrc", [path for path, _ in self._entries()])
+
+    def test_corrupt_index(self):
+        """壊れたインデックスは GitIndexError になり、レイヤーは走査に戻ることを確認."""
+        index = self.repo / ".git" / "index"
+        with self.assertRaises(GitIndexError):
+            parse_index(index.read_bytes()[:40])
+        index.write_bytes(b"DIRC\x00\x00\x00\x09")
+        self.assertIsNone(GitIndexEnumerator().list_layer(self.source))
+
+    def test_submodules(self):
+        """レイヤーの外のサブモジュールは無視し、レイヤーの下にあれば走査に戻ることを確認."""
+        # サブモジュールのコミットは参照しないので、適当なオブジェクト ID でよい
+        oid = "0" * 39 + "1"
+        _git(self.repo, "update-index", "--add", "--cacheinfo", f"160000,{oid},vendor/plugin")
+        self.assertIsNotNone(GitIndexEnumerator().list_layer(self.source))
+
+        _git(self.repo, "update-index", "--add", "--cacheinfo", f"160000,{oid},source/.vim/plugin")
+        self.assertIsNone(GitIndexEnumerator().list_layer(self.source))
+
+    def test_builder_ignores_untracked_files(self):
+        """追跡していないファイルは計画に入らず、それ以外は走査と同じ索引になることを確認."""
+        scanned = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build_index()
+        (self.source / ".bashrc.swp").write_text("junk")
+        (self.source / "build").mkdir()
+        (self.source / "build" / "out.o").write_text("junk")
+
+        builder = PlanBuilder(
+            source_dir=self.source, dest_dir=self.dest, git_index=GitIndexEnumerator()
+        )
+        self.assertEqual(builder.build_index().entries, scanned.entries)
+        paths = {entry.spec.relative_path for entry in builder.build().entries}
+        self.assertIn(Path(".config/nvim/init.vim"), paths)
+        self.assertNotIn(Path(".bashrc.swp"), paths)
+        self.assertNotIn(Path("build"), paths)
+
+    def test_untracked_layer_is_scanned(self):
+        """追跡中のファイルがないレイヤー（git 管理外の overlay）は走査することを確認."""
+        overlay = self.tmp_path / "source.work"
+        overlay.mkdir()
+        (overlay / ".gitconfig").write_text("[user]\n")
+
+        index = PlanBuilder(
+            source_dir=self.source,
+            dest_dir=self.dest,
+            overlays=[overlay],
+            git_index=GitIndexEnumerator(),
+        ).build_index()
+        self.assertIn(Path(".gitconfig"), index.entries)
+        self.assertIn(Path(".bashrc"), index.entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""InstallJournal と PlanExecutor.resume のテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor, temp_link_path
+from scripts.install.pkg.plan.journal import InstallJournal
+from scripts.install.pkg.plan.model import ActionType
+
+
+class InterruptingUI:
+    """指定したパスの確認で KeyboardInterrupt を送出するモック UI."""
+
+    def __init__(self, interrupt_on: str | None = None):
+        self.interrupt_on = interrupt_on
+
+    def confirm(self, message: str, default_yes: bool = True) -> bool:
+        if self.interrupt_on is not None and self.interrupt_on in message:
+            raise KeyboardInterrupt
+        return True
+
+
+class TestInstallJournal(unittest.TestCase):
+    """ジャーナルを使った中断・再開のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.rollbacks = self.tmp_path / "rollbacks"
+        self.journal_path = self.tmp_path / "state" / "journal.jsonl"
+
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        for name in (".aliases", ".bashrc", ".vimrc", ".zshrc"):
+            (self.source / name).write_text(f"# {name}\n")
+        # .bashrc と .zshrc は既存ファイルなので確認 + バックアップが必要
+        (self.dest / ".bashrc").write_text("# existing bashrc\n")
+        (self.dest / ".zshrc").write_text("# existing zshrc\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _executor(self, ui, journal) -> PlanExecutor:
+        return PlanExecutor(
+            ui=ui,
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.rollbacks),
+            journal=journal,
+        )
+
+    def _interrupted_install(self):
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        journal = InstallJournal.create(self.journal_path, {"dest": str(self.dest)})
+        executor = self._executor(InterruptingUI(interrupt_on=".zshrc"), journal)
+        with self.assertRaises(KeyboardInterrupt):
+            executor.execute(plan)
+
+    def test_interrupted_install_leaves_pending_entries(self):
+        """中断後のジャーナルに未完了のエントリだけが残ることを確認."""
+        self._interrupted_install()
+
+        state = InstallJournal.load(self.journal_path)
+        self.assertIsNotNone(state)
+        self.assertFalse(state.finished)
+        self.assertIsNotNone(state.archive)
+        pending = [str(entry.spec.relative_path) for _, entry in state.pending()]
+        self.assertEqual(pending, [".zshrc"])
+
+    def test_resume_finishes_remaining_entries(self):
+        """再開でのこりのエントリが適用され、ジャーナルが削除されることを確認."""
+        self._interrupted_install()
+        state = InstallJournal.load(self.journal_path)
+
+        # source/ を走査しないことを確認するため、計画外のファイルを追加しておく
+        (self.source / ".tmux.conf").write_text("# tmux\n")
+
+        executor = self._executor(InterruptingUI(), InstallJournal.reopen(self.journal_path))
+        report = executor.resume(state)
+
+        self.assertEqual(report.applied, 1)
+        self.assertFalse(self.journal_path.exists())
+        zshrc = self.dest / ".zshrc"
+        self.assertTrue(zshrc.is_symlink())
+        self.assertEqual(zshrc.resolve(), (self.source / ".zshrc").resolve())
+        self.assertFalse((self.dest / ".tmux.conf").exists())
+
+        # バックアップは中断前と同じアーカイブに追記される
+        self.assertEqual((state.archive / ".zshrc").read_text(), "# existing zshrc\n")
+        self.assertEqual((state.archive / ".bashrc").read_text(), "# existing bashrc\n")
+        # 中断前に書き込んだ分と今回の分を区別できる（--stats は今回の分だけを数える）
+        manager = executor.backup_manager
+        self.assertEqual(manager.resumed_bytes, len("# existing bashrc\n"))
+        self.assertEqual(manager.bytes_written - manager.resumed_bytes, len("# existing zshrc\n"))
+
+    def test_resume_cleans_half_done_entries(self):
+        """rename 前の一時リンクや適用済みのエントリが自動で片付くことを確認."""
+        self._interrupted_install()
+        state = InstallJournal.load(self.journal_path)
+
+        # 適用後・done 記録前にクラッシュした状態と、一時リンクが残った状態を再現
+        zshrc = self.dest / ".zshrc"
+        zshrc.unlink()
+        zshrc.symlink_to((self.source / ".zshrc").resolve())
+        temp_link_path(zshrc).symlink_to("/nonexistent")
+
+        ui = InterruptingUI(interrupt_on=".zshrc")  # 確認が発生したら失敗する
+        executor = self._executor(ui, InstallJournal.reopen(self.journal_path))
+        report = executor.resume(state)
+
+        self.assertEqual(report.errors, 0)
+        self.assertFalse(temp_link_path(zshrc).is_symlink())
+        self.assertFalse(self.journal_path.exists())
+
+    def test_load_ignores_torn_last_line(self):
+        """途中まで書かれた最終行が無視されることを確認."""
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        journal = InstallJournal.create(self.journal_path, {})
+        journal.record_intents(enumerate(plan.entries))
+        journal.close()
+        with self.journal_path.open("a") as stream:
+            stream.write('{"type": "done", "se')
+
+        state = InstallJournal.load(self.journal_path)
+        self.assertEqual(len(state.pending()), len(plan.entries))
+        self.assertTrue(all(e.action is not ActionType.ERROR for _, e in state.pending()))
+
+
+if __name__ == "__main__":
+    unittest.main()
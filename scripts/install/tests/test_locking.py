@@ -0,0 +1,106 @@
+"""DestinationLock / RollbacksLock と BackupManager のアーカイブ名のテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.locking import DestinationLock, LockTimeoutError, RollbacksLock
+
+
+class TestDestinationLock(unittest.TestCase):
+    """DestinationLock のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.home_a = self.tmp_path / "home_a"
+        self.home_b = self.tmp_path / "home_b"
+        self.home_a.mkdir()
+        self.home_b.mkdir()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_same_destination_is_serialized(self):
+        """同じインストール先への2つ目のロックが待機後にタイムアウトすることを確認."""
+        waited = []
+        with DestinationLock(self.home_a):
+            second = DestinationLock(
+                self.home_a, timeout=0.2, poll_interval=0.05, on_wait=lambda: waited.append(1)
+            )
+            with self.assertRaises(LockTimeoutError):
+                second.acquire()
+        self.assertEqual(waited, [1])
+
+        # 解放後は取得できる
+        with DestinationLock(self.home_a, timeout=0):
+            pass
+
+    def test_different_destinations_run_in_parallel(self):
+        """異なるインストール先のロックは同時に取得できることを確認."""
+        with DestinationLock(self.home_a), DestinationLock(self.home_b, timeout=0):
+            pass
+
+
+class TestRollbacksLock(unittest.TestCase):
+    """RollbacksLock のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.rollbacks = Path(self.test_dir.name) / "rollbacks"
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_nested_acquire_releases_at_outermost(self):
+        """入れ子で取得でき、最も外側の解放までロックが保持されることを確認."""
+        lock = RollbacksLock(self.rollbacks)
+        with lock:
+            with lock:
+                pass
+            with self.assertRaises(LockTimeoutError):
+                RollbacksLock(self.rollbacks, timeout=0).acquire()
+        with RollbacksLock(self.rollbacks, timeout=0):
+            pass
+
+    def test_backup_manager_takes_lock(self):
+        """BackupManager.start() は他の処理が rollbacks/ をロック中なら待つことを確認."""
+        manager = BackupManager(
+            rollbacks_root=self.rollbacks, lock=RollbacksLock(self.rollbacks, timeout=0.2)
+        )
+        with RollbacksLock(self.rollbacks), self.assertRaises(LockTimeoutError):
+            manager.start()
+        self.assertTrue(manager.start().is_dir())
+
+
+class TestBackupArchiveNames(unittest.TestCase):
+    """BackupManager.start() のアーカイブ名のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.rollbacks = Path(self.test_dir.name) / "rollbacks"
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_start_in_same_second_does_not_collide(self):
+        """連続して start() しても別々のアーカイブが作られることを確認."""
+        archives = [BackupManager(rollbacks_root=self.rollbacks).start() for _ in range(20)]
+
+        self.assertEqual(len({a.name for a in archives}), 20)
+        self.assertTrue(all(a.is_dir() for a in archives))
+        # タイムスタンプ順に並ぶことを確認
+        self.assertEqual(sorted(a.name for a in archives), [a.name for a in archives])
+
+
+if __name__ == "__main__":
+    unittest.main()
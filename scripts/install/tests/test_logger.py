@@ -7,7 +7,13 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from scripts.install.pkg.logger import ColorCode, ColoredFormatter, ColoredLogger, FileHandler
+from scripts.install.pkg.logger import (
+    SUCCESS,
+    ColorCode,
+    ColoredFormatter,
+    ColoredLogger,
+    FileHandler,
+)
 
 
 class TestColoredFormatter(unittest.TestCase):
@@ -90,6 +96,42 @@ class TestColoredFormatter(unittest.TestCase):
                 self.assertIn(icon, result)
                 self.assertIn(color, result)
 
+    def test_success_level(self):
+        """SUCCESS レベルのファイル用メッセージにレベル名が入ることを確認."""
+        record = logging.LogRecord(
+            name="test",
+            level=SUCCESS,
+            pathname="test.py",
+            lineno=1,
+            msg="成功",
+            args=(),
+            exc_info=None,
+        )
+
+        result = self.formatter_no_color.format(record)
+
+        self.assertIn("[SUCCESS]", result)
+        self.assertEqual(self.formatter.icons[SUCCESS], ColorCode.SUCCESS)
+        self.assertEqual(self.formatter.colors[SUCCESS], ColorCode.GREEN)
+
+    def test_no_file_message_when_detached(self):
+        """attach_file_message=False ではファイル用メッセージを作らないことを確認."""
+        formatter = ColoredFormatter(use_color=True, attach_file_message=False)
+        formatter.use_color = True
+        record = logging.LogRecord(
+            name="test",
+            level=logging.INFO,
+            pathname="test.py",
+            lineno=1,
+            msg="メッセージ",
+            args=(),
+            exc_info=None,
+        )
+
+        formatter.format(record)
+
+        self.assertFalse(hasattr(record, "file_message"))
+
 
 class TestFileHandler(unittest.TestCase):
     """FileHandler クラスのテスト."""
@@ -176,6 +218,28 @@ class TestFileHandler(unittest.TestCase):
         # メッセージは含まれている
         self.assertIn("エラーメッセージ", content)
 
+    def test_flush_every_zero_buffers_until_flush(self):
+        """flush_every=0 の場合は flush() まで書き込まれないことを確認."""
+        handler = FileHandler(self.log_file, mode="w", encoding="utf-8", flush_every=0)
+        handler.setFormatter(ColoredFormatter(use_color=False))
+
+        record = logging.LogRecord(
+            name="test",
+            level=logging.INFO,
+            pathname="test.py",
+            lineno=1,
+            msg="バッファされるメッセージ",
+            args=(),
+            exc_info=None,
+        )
+
+        handler.emit(record)
+        self.assertEqual(self.log_file.read_text(), "")
+
+        handler.flush()
+        self.assertIn("バッファされるメッセージ", self.log_file.read_text())
+        handler.close()
+
 
 class TestColoredLogger(unittest.TestCase):
     """ColoredLogger クラスのテスト."""
@@ -239,6 +303,24 @@ class TestColoredLogger(unittest.TestCase):
         # （実際の色は目視確認が必要だが、少なくとも動作することを確認）
         logger.success("成功メッセージ")
 
+    def test_queue_mode_writes_file_in_background(self):
+        """use_queue=True でもファイルに全メッセージが書き込まれることを確認."""
+        logger = ColoredLogger("test_queue", log_file=self.log_file, use_queue=True)
+        # ファイルハンドラーはロガーに直接ではなくキュー経由で接続される
+        self.assertEqual(len(logger.logger.handlers), 2)
+
+        for i in range(100):
+            logger.info(f"メッセージ{i}")
+        logger.success("成功メッセージ")
+        logger.flush()
+
+        content = self.log_file.read_text()
+        self.assertIn("メッセージ99", content)
+        self.assertIn("[SUCCESS] 成功メッセージ", content)
+
+        logger.close()
+        self.assertEqual(logger.logger.handlers, [])
+
     def test_multiple_loggers_independent(self):
         """複数のロガーが独立して動作することを確認."""
         log_file1 = self.tmp_path / "test1.log"
@@ -0,0 +1,96 @@
+"""インストール記録 (links.manifest) のテスト."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.manifest import (
+    MANIFEST_HEADER,
+    find_drift,
+    links_from_entries,
+    load_manifest,
+    write_manifest,
+)
+from scripts.install.pkg.plan.builder import PlanBuilder
+
+
+class TestLinkManifest(unittest.TestCase):
+    """記録の作成・読み込み・差分検出のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.manifest = self.tmp_path / "state" / "links.manifest"
+        (self.source / ".config").mkdir(parents=True)
+        (self.dest / ".config").mkdir(parents=True)
+
+        (self.source / ".bashrc").write_text("# bashrc\n")
+        (self.source / ".config" / "app.toml").write_text("# app\n")
+        (self.source / ".vimrc").write_text("# vimrc\n")
+        (self.dest / ".bashrc").symlink_to((self.source / ".bashrc").resolve())
+        (self.dest / ".config" / "app.toml").symlink_to("../../source/.config/app.toml")
+        # ユーザーがスキップした既存ファイル
+        (self.dest / ".vimrc").write_text("# local vimrc\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _links(self) -> dict[bytes, bytes]:
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        return links_from_entries(plan.entries)
+
+    def test_records_only_links_to_source(self):
+        """source を指すリンクだけが記録され、相対リンクはそのまま保存されることを確認."""
+        links = self._links()
+
+        dest = os.fsencode(self.dest)
+        self.assertEqual(
+            links,
+            {
+                dest + b"/.bashrc": os.fsencode((self.source / ".bashrc").resolve()),
+                dest + b"/.config/app.toml": b"../../source/.config/app.toml",
+            },
+        )
+        self.assertEqual(find_drift(links), [])
+
+    def test_round_trip(self):
+        """書き込んだ記録がそのまま読み込めることを確認."""
+        links = self._links()
+        write_manifest(self.manifest, links)
+
+        self.assertTrue(self.manifest.read_bytes().startswith(MANIFEST_HEADER))
+        self.assertEqual(load_manifest(self.manifest), links)
+
+    def test_load_rejects_missing_or_broken(self):
+        """記録がない・形式が違う場合は None を返すことを確認."""
+        self.assertIsNone(load_manifest(self.manifest))
+
+        self.manifest.parent.mkdir()
+        self.manifest.write_bytes(MANIFEST_HEADER + b"\0/only-dest")
+        self.assertIsNone(load_manifest(self.manifest))
+
+        self.manifest.write_bytes(b"something else")
+        self.assertIsNone(load_manifest(self.manifest))
+
+    def test_find_drift(self):
+        """消えたリンク・付け替えられたリンクが検出されることを確認."""
+        links = self._links()
+        (self.dest / ".bashrc").unlink()
+        (self.dest / ".config" / "app.toml").unlink()
+        (self.dest / ".config" / "app.toml").symlink_to("/etc/hosts")
+
+        self.assertEqual(
+            sorted(find_drift(links)),
+            [str(self.dest / ".bashrc"), str(self.dest / ".config" / "app.toml")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.builder import PlanBuilder, overlay_dirs
 from scripts.install.pkg.plan.model import ActionType
 
 
@@ -172,6 +174,21 @@ class TestPlanBuilder(unittest.TestCase):
         self.assertEqual(str(confirmations[0].spec.relative_path), ".bashrc")
         self.assertEqual(confirmations[0].action, ActionType.UPDATE)
 
+    def test_identical_file_is_adopted(self):
+        """中身が同じ既存ファイルは確認もバックアップも不要な ADOPT になることを確認."""
+        self._setup_basic_source()
+        (self.dest / ".bashrc").write_text("# test bashrc\n")
+        (self.dest / ".zshrc").write_text("# test zshrX\n")  # 同じサイズで内容が違う
+
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+
+        entries = {str(e.spec.relative_path): e for e in plan.entries}
+        self.assertEqual(entries[".bashrc"].action, ActionType.ADOPT)
+        self.assertFalse(entries[".bashrc"].needs_confirmation)
+        self.assertFalse(entries[".bashrc"].needs_backup)
+        self.assertEqual(entries[".zshrc"].action, ActionType.UPDATE)
+        self.assertEqual([str(e.spec.relative_path) for e in plan.iter_confirmations()], [".zshrc"])
+
     def test_skip_existing_directory(self):
         """既に存在するディレクトリに対して ENSURE_DIR が生成されないことを確認."""
         # source/ に .config/test.conf を作成
@@ -194,5 +211,85 @@ class TestPlanBuilder(unittest.TestCase):
         self.assertEqual(str(creates[0].spec.relative_path), ".config/test.conf")
 
 
+class TestPlanBuilderOverlays(unittest.TestCase):
+    """source/ にレイヤーを重ねたときの PlanBuilder のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+
+        self.source = self.tmp_path / "source"
+        self.work = self.tmp_path / "source.work"
+        self.host = self.tmp_path / "source.myhost"
+        self.dest = self.tmp_path / "dest"
+        for directory in (self.source, self.work, self.host, self.dest):
+            directory.mkdir()
+
+        (self.source / ".gitconfig").write_text("# base\n")
+        (self.source / ".zshrc").write_text("# base\n")
+        (self.source / ".config").mkdir()
+        (self.source / ".config" / "base.toml").write_text("# base\n")
+        (self.work / ".gitconfig").write_text("# work\n")
+        (self.host / ".gitconfig").write_text("# host\n")
+        (self.host / ".config").mkdir()
+        (self.host / ".config" / "host.toml").write_text("# host\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _builder(self) -> PlanBuilder:
+        return PlanBuilder(
+            source_dir=self.source, dest_dir=self.dest, overlays=[self.work, self.host]
+        )
+
+    def test_later_layers_shadow_earlier(self):
+        """同じパスは後のレイヤーが優先され、上書きが記録されることを確認."""
+        builder = self._builder()
+        index = builder.build_index()
+        plan = builder.build(index)
+
+        sources = {str(e.spec.relative_path): e.spec.source for e in plan.entries}
+        self.assertEqual(sources[".gitconfig"], self.host / ".gitconfig")
+        self.assertEqual(sources[".zshrc"], self.source / ".zshrc")
+        self.assertEqual(index.shadowed, {Path(".gitconfig"): [0, 1, 2]})
+
+    def test_directories_are_merged(self):
+        """ディレクトリはレイヤー間でマージされることを確認."""
+        plan = self._builder().build()
+
+        paths = [str(e.spec.relative_path) for e in plan.entries]
+        self.assertEqual(paths.count(".config"), 1)
+        self.assertIn(".config/base.toml", paths)
+        self.assertIn(".config/host.toml", paths)
+
+    def test_kind_conflict_is_reported(self):
+        """ファイルとディレクトリが衝突したパスはエラーになることを確認."""
+        (self.work / ".zshrc").mkdir()
+
+        plan = self._builder().build()
+
+        errors = [e for e in plan.entries if e.action == ActionType.ERROR]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(str(errors[0].spec.relative_path), ".zshrc")
+        self.assertIn("source.work: ディレクトリ", errors[0].message)
+
+    def test_each_directory_is_scanned_once(self):
+        """レイヤーごとに各ディレクトリを1回だけ走査することを確認."""
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self._builder().build()
+        # source/, source/.config, source.work/, source.myhost/, source.myhost/.config
+        self.assertEqual(scandir.call_count, 5)
+
+    def test_overlay_dirs(self):
+        """指定したレイヤーのあとにホスト名のレイヤーが続くことを確認."""
+        self.assertEqual(
+            overlay_dirs(self.source, ["work"], hostname="myhost.example.com"),
+            [self.work, self.host],
+        )
+        self.assertEqual(overlay_dirs(self.source, [], hostname="other"), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,119 @@
+"""Plan の差分とスナップショットのテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.diff import ChangeKind, diff_plans, sorted_entries
+from scripts.install.pkg.plan.model import ActionType, InstallSpec, PlanEntry
+from scripts.install.pkg.plan.snapshot import is_snapshot, iter_snapshot, write_snapshot
+
+
+def make_entry(path: str, action: ActionType = ActionType.CREATE) -> PlanEntry:
+    relative = Path(path)
+    return PlanEntry(
+        spec=InstallSpec(source=Path("/src") / relative, relative_path=relative, dest=relative),
+        action=action,
+    )
+
+
+class TestPlanDiff(unittest.TestCase):
+    """ソート済みマージによる差分のテスト."""
+
+    def test_added_removed_changed(self):
+        """追加・削除・アクションの変更だけが順に出ることを確認."""
+        before = [make_entry(".a"), make_entry(".b", ActionType.SKIP), make_entry(".c")]
+        after = [make_entry(".b", ActionType.UPDATE), make_entry(".c"), make_entry(".d")]
+
+        changes = list(diff_plans(before, after))
+        self.assertEqual(
+            [(c.kind, c.path) for c in changes],
+            [
+                (ChangeKind.REMOVED, ".a"),
+                (ChangeKind.CHANGED, ".b"),
+                (ChangeKind.ADDED, ".d"),
+            ],
+        )
+        self.assertEqual(changes[1].describe(), "~ .b: SKIP → UPDATE")
+
+    def test_rejects_unsorted_input(self):
+        """昇順でない入力はエラーになることを確認."""
+        with self.assertRaises(ValueError):
+            list(diff_plans([make_entry(".b"), make_entry(".a")], []))
+
+    def test_streams_large_inputs(self):
+        """入力を先読みせず、1件ずつ消費しながら差分を返すことを確認."""
+        consumed = []
+
+        def entries(prefix: str):
+            for i in range(20_000):
+                consumed.append(prefix)
+                yield make_entry(f"{prefix}{i:06d}")
+
+        changes = diff_plans(entries("a"), entries("b"))
+        first = next(changes)
+        self.assertEqual((first.kind, first.path), (ChangeKind.REMOVED, "a000000"))
+        self.assertLess(len(consumed), 10)
+        self.assertEqual(sum(1 for _ in changes), 39_999)
+
+
+class TestPlanSnapshot(unittest.TestCase):
+    """スナップショットの保存・読み込みのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        (self.source / ".config").mkdir(parents=True)
+        self.dest.mkdir()
+        (self.source / ".zshrc").write_text("# zshrc\n")
+        (self.source / ".config" / "app.toml").write_text("# app\n")
+        (self.dest / ".zshrc").write_text("# existing\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_round_trip_is_sorted(self):
+        """保存したエントリが昇順で読み出せ、元の計画と差分がないことを確認."""
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        snapshot = self.tmp_path / "plan.jsonl"
+        write_snapshot(snapshot, plan.entries, dest=str(self.dest))
+
+        self.assertTrue(is_snapshot(snapshot))
+        self.assertFalse(is_snapshot(self.source))
+        loaded = list(iter_snapshot(snapshot))
+        self.assertEqual(
+            [str(e.spec.relative_path) for e in loaded],
+            [".config", ".config/app.toml", ".zshrc"],
+        )
+        self.assertEqual(list(diff_plans(loaded, sorted_entries(plan.entries))), [])
+
+    def test_snapshot_against_changed_destination(self):
+        """保存後にインストール先が変われば差分として出ることを確認."""
+        snapshot = self.tmp_path / "plan.jsonl"
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        write_snapshot(snapshot, plan.entries)
+
+        (self.dest / ".zshrc").unlink()
+        (self.dest / ".zshrc").symlink_to((self.source / ".zshrc").resolve())
+        today = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+
+        changes = list(diff_plans(iter_snapshot(snapshot), sorted_entries(today.entries)))
+        self.assertEqual([c.describe() for c in changes], ["~ .zshrc: UPDATE → SKIP"])
+
+    def test_rejects_other_files(self):
+        """スナップショット以外のファイルは読み込めないことを確認."""
+        other = self.tmp_path / "other.jsonl"
+        other.write_text('{"type": "begin"}\n')
+        with self.assertRaises(ValueError):
+            list(iter_snapshot(other))
+
+
+if __name__ == "__main__":
+    unittest.main()
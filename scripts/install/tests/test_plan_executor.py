@@ -320,6 +320,28 @@ class TestPlanExecutorEdgeCases(unittest.TestCase):
         backup_dirs = list(self.rollbacks.glob("*"))
         self.assertEqual(len(backup_dirs), 0)
 
+    def test_adopt_identical_file_without_backup(self):
+        """中身が同じ既存ファイルは確認なし・バックアップなしでリンクになることを確認."""
+        (self.source / ".bashrc").write_text("# same bashrc\n")
+        (self.dest / ".bashrc").write_text("# same bashrc\n")
+
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.dest)
+        plan = builder.build()
+
+        logger = ColoredLogger(name="test")
+        ui = UserInterface()
+        ui.confirm = lambda msg, default_yes=True: self.fail("確認は不要なはず")
+        backup_manager = BackupManager(rollbacks_root=self.rollbacks)
+        executor = PlanExecutor(ui=ui, logger=logger, backup_manager=backup_manager)
+
+        report = executor.execute(plan, dry_run=False)
+
+        self.assertEqual(report.applied, 1)
+        bashrc = self.dest / ".bashrc"
+        self.assertTrue(bashrc.is_symlink())
+        self.assertEqual(bashrc.resolve(), (self.source / ".bashrc").resolve())
+        self.assertEqual(list(self.rollbacks.glob("*")), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,141 @@
+"""AnswerPolicy と、PlanExecutor / RollbackManager での利用のテスト."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager, list_archives
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.policy import RESTORE_ACTION, Answer, AnswerPolicy, PolicyRule
+from scripts.install.pkg.rollback_manager import RollbackManager
+
+
+class FailingUI:
+    """確認が呼ばれたらテストを失敗させる UI."""
+
+    def confirm(self, message: str, default_yes: bool = True) -> bool:
+        raise AssertionError(f"対話的な確認は発生しないはず: {message}")
+
+
+class TestAnswerPolicy(unittest.TestCase):
+    """AnswerPolicy のマッチングのテスト."""
+
+    def test_first_matching_rule_wins(self):
+        """先に書かれたルールが優先されることを確認."""
+        policy = AnswerPolicy(
+            [
+                PolicyRule(".config/secret/*", Answer.SKIP),
+                PolicyRule(".config/*", Answer.OVERWRITE),
+                PolicyRule(".config/app.conf", Answer.SKIP),
+            ]
+        )
+
+        self.assertEqual(policy.decide(Path(".config/secret/key"), "UPDATE"), Answer.SKIP)
+        self.assertEqual(policy.decide(Path(".config/app.conf"), "UPDATE"), Answer.OVERWRITE)
+        self.assertEqual(policy.decide(Path(".bashrc"), "UPDATE"), Answer.ASK)
+
+    def test_action_filter(self):
+        """action を指定したルールはそのアクションにだけ適用されることを確認."""
+        policy = AnswerPolicy(
+            [PolicyRule("*", Answer.OVERWRITE, actions=frozenset({RESTORE_ACTION}))],
+            default=Answer.SKIP,
+        )
+
+        self.assertEqual(policy.decide(".bashrc", RESTORE_ACTION), Answer.OVERWRITE)
+        self.assertEqual(policy.decide(".bashrc", "UPDATE"), Answer.SKIP)
+
+    def test_load(self):
+        """JSON ファイルから読み込めることを確認."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "policy.json"
+            path.write_text(
+                json.dumps(
+                    {
+                        "default": "skip",
+                        "rules": [
+                            {"path": ".bashrc", "action": "update", "answer": "overwrite"},
+                        ],
+                    }
+                )
+            )
+            policy = AnswerPolicy.load(path)
+
+            self.assertEqual(policy.decide(".bashrc", "UPDATE"), Answer.OVERWRITE)
+            self.assertEqual(policy.decide(".zshrc", "UPDATE"), Answer.SKIP)
+
+            path.write_text(json.dumps({"rules": [{"path": "*", "answer": "maybe"}]}))
+            with self.assertRaises(ValueError):
+                AnswerPolicy.load(path)
+
+
+class TestPolicyInExecution(unittest.TestCase):
+    """ポリシーによる無人実行のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.rollbacks = self.tmp_path / "rollbacks"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        for name in (".bashrc", ".vimrc", ".zshrc"):
+            (self.source / name).write_text(f"# new {name}\n")
+            (self.dest / name).write_text(f"# existing {name}\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_executor_follows_policy(self):
+        """skip / overwrite / backup-and-overwrite がそれぞれ適用されることを確認."""
+        policy = AnswerPolicy(
+            [
+                PolicyRule(".bashrc", Answer.SKIP),
+                PolicyRule(".vimrc", Answer.OVERWRITE),
+                PolicyRule(".zshrc", Answer.BACKUP_AND_OVERWRITE),
+            ]
+        )
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        executor = PlanExecutor(
+            ui=FailingUI(),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.rollbacks),
+            policy=policy,
+        )
+
+        report = executor.execute(plan)
+
+        self.assertEqual(report.applied, 2)
+        self.assertFalse((self.dest / ".bashrc").is_symlink())
+        self.assertTrue((self.dest / ".vimrc").is_symlink())
+        self.assertTrue((self.dest / ".zshrc").is_symlink())
+
+        archive = list_archives(self.rollbacks)[0]
+        self.assertFalse((archive / ".vimrc").exists())
+        self.assertEqual((archive / ".zshrc").read_text(), "# existing .zshrc\n")
+
+    def test_rollback_follows_policy(self):
+        """ロールバック時も RESTORE のルールで確認なしに判断されることを確認."""
+        archive = self.rollbacks / "20240101_120000"
+        archive.mkdir(parents=True)
+        (archive / ".bashrc").write_text("# backup bashrc\n")
+        (archive / ".vimrc").write_text("# backup vimrc\n")
+
+        policy = AnswerPolicy([PolicyRule(".bashrc", Answer.SKIP)], default=Answer.OVERWRITE)
+        manager = RollbackManager(target_root=self.dest, ui=FailingUI(), policy=policy)
+        manager.restore_archive(archive)
+
+        self.assertEqual((self.dest / ".bashrc").read_text(), "# existing .bashrc\n")
+        self.assertEqual((self.dest / ".vimrc").read_text(), "# backup vimrc\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
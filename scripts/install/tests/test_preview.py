@@ -0,0 +1,178 @@
+"""DiffPreviewer（確認時の差分プレビュー）のテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType, PlanEntry
+from scripts.install.pkg.preview import DiffPreviewer
+from scripts.install.pkg.templates import TemplateRenderer
+from scripts.install.pkg.ui import UserInterface
+
+
+class _RecordingUI(UserInterface):
+    """表示したプレビューを記録し、確認にはすべて No と答える."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.previews: list[str] = []
+
+    def show_preview(self, text: str):
+        self.previews.append(text)
+
+    def confirm(self, message: str, default_yes: bool = True) -> bool:
+        return False
+
+
+class _CountingPreviewer(DiffPreviewer):
+    """render を呼んだエントリを記録する."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.rendered: list[Path] = []
+        self._lock = threading.Lock()
+
+    def render(self, entry: PlanEntry) -> str:
+        with self._lock:
+            self.rendered.append(entry.spec.relative_path)
+        return super().render(entry)
+
+
+class TestDiffPreviewer(unittest.TestCase):
+    """差分の内容と先読みのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _write(self, name: str, old: str | bytes, new: str | bytes) -> None:
+        for root, data in ((self.dest, old), (self.source, new)):
+            if isinstance(data, str):
+                (root / name).write_text(data)
+            else:
+                (root / name).write_bytes(data)
+
+    def _confirmations(self) -> list[PlanEntry]:
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        return list(plan.iter_confirmations())
+
+    def test_unified_diff(self):
+        """既存ファイルから source への unified diff を字下げして返すことを確認."""
+        self._write(".bashrc", "alias ll='ls -l'\nexport A=1\n", "alias ll='ls -l'\nexport A=2\n")
+        (entry,) = self._confirmations()
+        self.assertEqual(entry.action, ActionType.UPDATE)
+
+        with DiffPreviewer([entry]) as previewer:
+            lines = previewer.preview(entry).splitlines()
+        self.assertIn(f"    --- {self.dest / '.bashrc'}", lines)
+        self.assertIn("    -export A=1", lines)
+        self.assertIn("    +export A=2", lines)
+
+    def test_long_diff_is_cut(self):
+        """max_lines を超える差分は打ち切って残りの行数を表示することを確認."""
+        self._write(".long", "".join(f"{i}\n" for i in range(100)), "changed\n")
+        (entry,) = self._confirmations()
+        with DiffPreviewer([entry], max_lines=10) as previewer:
+            lines = previewer.preview(entry).splitlines()
+        self.assertEqual(len(lines), 11)
+        self.assertIn("残り 94 行", lines[-1])
+
+    def test_binary_and_large_files_are_summarized(self):
+        """バイナリと大きなファイルはサイズとダイジェストだけを表示することを確認."""
+        self._write(".bin", b"\x00\x01old", b"\x00\x01new!")
+        self._write(".big", "a" * 2048, "b" * 2048)
+        entries = {e.spec.relative_path.name: e for e in self._confirmations()}
+
+        with DiffPreviewer(list(entries.values()), max_bytes=1024) as previewer:
+            binary = previewer.preview(entries[".bin"])
+            large = previewer.preview(entries[".big"])
+        self.assertIn("バイナリファイル", binary)
+        self.assertIn("現在: 5 バイト blake2b:", binary)
+        self.assertIn("新規: 6 バイト blake2b:", binary)
+        self.assertIn("大きなファイルのため差分を省略", large)
+        self.assertNotIn("+bbb", large)
+
+    def test_symlink_to_elsewhere(self):
+        """別の場所へのリンクはリンク先と、その内容との差分を表示することを確認."""
+        other = self.tmp_path / "other"
+        other.write_text("old\n")
+        (self.dest / ".vimrc").symlink_to(other)
+        (self.source / ".vimrc").write_text("new\n")
+        (entry,) = self._confirmations()
+
+        with DiffPreviewer([entry]) as previewer:
+            text = previewer.preview(entry)
+        self.assertIn(f"現在のリンク先: {other}", text)
+        self.assertIn("+new", text)
+
+    def test_template_not_yet_rendered(self):
+        """まだ生成されていないテンプレートは、メモリ上で展開した内容と比べることを確認."""
+        (self.source / ".gitconfig.tmpl").write_text("[user]\n  email = ${EMAIL}\n")
+        (self.dest / ".gitconfig").write_text("[user]\n  email = old@example.com\n")
+        renderer = TemplateRenderer(
+            generated_dir=self.tmp_path / "state" / "generated",
+            variables={"EMAIL": "me@example.com"},
+            cache_path=self.tmp_path / "state" / "render-cache.json",
+        )
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, renderer=renderer).build()
+        (entry,) = plan.iter_confirmations()
+        self.assertFalse(entry.spec.source.exists())
+
+        with DiffPreviewer([entry], renders=plan.entries, renderer=renderer) as previewer:
+            lines = previewer.preview(entry).splitlines()
+        self.assertIn("    -  email = old@example.com", lines)
+        self.assertIn("    +  email = me@example.com", lines)
+        self.assertFalse(entry.spec.source.exists())
+
+    def test_lazy_with_prefetch(self):
+        """表示したエントリと、その後ろ prefetch 件だけを計算することを確認."""
+        for i in range(10):
+            self._write(f".file{i}", f"old {i}\n", f"new {i}\n")
+        entries = self._confirmations()
+
+        relative = [e.spec.relative_path for e in entries]
+        previewer = _CountingPreviewer(entries, prefetch=2)
+        self.assertEqual(previewer.rendered, [])
+        for entry in entries[:3]:
+            self.assertIn(f"+new {entry.spec.relative_path.name[5:]}", previewer.preview(entry))
+        previewer.close()
+        # 表示した3件は計算済み. 先読みは最後に表示したものの後ろ2件まで
+        self.assertEqual(previewer.rendered[:3], relative[:3])
+        self.assertLessEqual(set(previewer.rendered), set(relative[:5]))
+
+    def test_executor_shows_preview_before_confirm(self):
+        """確認を求める前に差分を表示することを確認."""
+        self._write(".bashrc", "old\n", "new\n")
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        ui = _RecordingUI()
+        with DiffPreviewer(list(plan.iter_confirmations())) as previewer:
+            PlanExecutor(
+                ui=ui,
+                logger=ColoredLogger(name="test"),
+                backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+                previewer=previewer,
+            ).execute(plan, dry_run=False)
+
+        (text,) = ui.previews
+        self.assertIn("+new", text)
+        self.assertEqual((self.dest / ".bashrc").read_text(), "old\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""ProgressRenderer と PlanExecutor のサマリーのみモードのテスト."""
+
+from __future__ import annotations
+
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.progress import ProgressRenderer
+from scripts.install.pkg.ui import UserInterface
+
+
+class FakeClock:
+    """手動で進める時計."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TtyStream(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+class TestProgressRenderer(unittest.TestCase):
+    """ProgressRenderer のテスト."""
+
+    def test_tty_redraw_is_rate_limited(self):
+        """TTY では min_interval ごとにしか再描画しないことを確認."""
+        clock = FakeClock()
+        stream = TtyStream()
+        progress = ProgressRenderer(stream, min_interval=0.25, clock=clock)
+
+        progress.start("実行中", 1000)
+        for _ in range(1000):
+            clock.now += 0.001
+            progress.advance(ActionType.SKIP)
+        progress.finish()
+
+        output = stream.getvalue()
+        # 開始 + 1秒間に最大4回 + 終了
+        self.assertLessEqual(output.count("\r"), 6)
+        self.assertTrue(output.endswith("\n"))
+        self.assertIn("1000/1000", output)
+        self.assertIn("SKIP:1000", output)
+
+    def test_plain_lines_when_not_tty(self):
+        """TTY でない場合は定期的にプレーンな行を出すことを確認."""
+        clock = FakeClock()
+        stream = io.StringIO()
+        progress = ProgressRenderer(stream, plain_interval=5.0, clock=clock)
+
+        progress.start("実行中", 20)
+        for _ in range(20):
+            clock.now += 1.0
+            progress.advance(ActionType.CREATE)
+        progress.finish()
+
+        lines = stream.getvalue().splitlines()
+        self.assertNotIn("\r", stream.getvalue())
+        # 開始 + 5秒ごとに4回 + 終了
+        self.assertEqual(len(lines), 6)
+        self.assertIn("[実行中] 20/20 1件/秒", lines[-1])
+        self.assertIn("CREATE:20", lines[-1])
+
+
+class TestExecutorSummaryOnly(unittest.TestCase):
+    """progress を渡したときの PlanExecutor の出力のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_per_entry_lines_are_suppressed(self):
+        """エントリごとの行は出ず、警告だけが表示されることを確認."""
+        for i in range(5):
+            (self.source / f".file{i}").write_text(f"{i}\n")
+        (self.source / ".link").symlink_to(self.source / ".file0")
+
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            logger = ColoredLogger(name="test_quiet")
+            executor = PlanExecutor(
+                ui=UserInterface(),
+                logger=logger,
+                backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+                progress=ProgressRenderer(output),
+            )
+            report = executor.execute(plan)
+
+        self.assertEqual(report.applied, 5)
+        text = output.getvalue()
+        self.assertNotIn("適用: .file", text)
+        self.assertIn("シンボリックリンクは未対応", text)
+        self.assertIn("CREATE:5", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
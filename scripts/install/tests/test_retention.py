@@ -0,0 +1,204 @@
+"""RetentionPolicy / RollbackGarbageCollector のテスト."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import ArchiveSizeIndex, BackupManager, list_archives
+from scripts.install.pkg.locking import LockTimeoutError, RollbacksLock
+from scripts.install.pkg.plan.journal import JOURNAL_NAME, InstallJournal
+from scripts.install.pkg.retention import (
+    RetentionPolicy,
+    RollbackGarbageCollector,
+    parse_count,
+    parse_size,
+)
+
+INSTALL_PY = Path(__file__).resolve().parents[3] / "install.py"
+
+
+class TestParseSize(unittest.TestCase):
+    """parse_size のテスト."""
+
+    def test_units(self):
+        """単位付きのサイズ指定を解釈できることを確認."""
+        self.assertEqual(parse_size("100"), 100)
+        self.assertEqual(parse_size("2K"), 2048)
+        self.assertEqual(parse_size("1.5M"), 1536 * 1024)
+        self.assertEqual(parse_size("1GiB"), 1024**3)
+
+    def test_invalid(self):
+        """不正な形式で ValueError になることを確認."""
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+    def test_zero_is_rejected(self):
+        """0 バイトの上限は ValueError になることを確認."""
+        with self.assertRaises(ValueError):
+            parse_size("0")
+        with self.assertRaises(ValueError):
+            parse_size("0.5")
+
+
+class TestRetentionArguments(unittest.TestCase):
+    """保持ポリシーの引数のテスト."""
+
+    def test_parse_count(self):
+        """1 以上の整数だけを受け付けることを確認."""
+        self.assertEqual(parse_count("1"), 1)
+        self.assertEqual(parse_count("10"), 10)
+        for text in ("0", "-1", "many"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_count(text)
+
+    def test_values_below_one_exit_with_usage_error(self):
+        """0 以下の保持数・サイズは引数の解析時に終了コード 2 で拒否することを確認."""
+        for option, value in (
+            ("--keep-last", "0"),
+            ("--keep-daily", "-1"),
+            ("--keep-weekly", "0"),
+            ("--max-rollback-size", "0"),
+        ):
+            with self.subTest(option=option), tempfile.TemporaryDirectory() as tmp:
+                result = subprocess.run(
+                    [sys.executable, str(INSTALL_PY), "--gc-rollbacks", option, value],
+                    capture_output=True,
+                    cwd=tmp,
+                )
+                self.assertEqual(result.returncode, 2)
+                self.assertIn(option.encode(), result.stderr)
+
+
+class TestRollbackGarbageCollector(unittest.TestCase):
+    """RollbackGarbageCollector のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.rollbacks = self.tmp_path / "rollbacks"
+        self.rollbacks.mkdir()
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _make_archive(self, name: str, size: int = 10) -> Path:
+        archive = self.rollbacks / name
+        archive.mkdir()
+        (archive / ".bashrc").write_bytes(b"x" * size)
+        return archive
+
+    def test_keep_last(self):
+        """最新 N 件だけが残ることを確認."""
+        for day in range(1, 6):
+            self._make_archive(f"2024010{day}_120000")
+
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks)
+        report = collector.collect(RetentionPolicy(keep_last=2))
+
+        self.assertEqual(len(report.removed), 3)
+        names = [p.name for p in list_archives(self.rollbacks)]
+        self.assertEqual(names, ["20240105_120000", "20240104_120000"])
+        # ゴミ箱ディレクトリが残っていないことを確認
+        self.assertEqual([p.name for p in self.rollbacks.glob(".trash-*")], [])
+
+    def test_keep_daily(self):
+        """各日の最新のみが保持されることを確認."""
+        self._make_archive("20240101_080000")
+        self._make_archive("20240101_200000")
+        self._make_archive("20240102_080000")
+        self._make_archive("20240103_080000")
+
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks)
+        collector.collect(RetentionPolicy(keep_daily=2))
+
+        names = [p.name for p in list_archives(self.rollbacks)]
+        self.assertEqual(names, ["20240103_080000", "20240102_080000"])
+
+    def test_max_total_bytes(self):
+        """合計サイズの上限を超える古いアーカイブが削除されることを確認."""
+        self._make_archive("20240101_120000", size=100)
+        self._make_archive("20240102_120000", size=100)
+        self._make_archive("20240103_120000", size=100)
+
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks)
+        report = collector.collect(RetentionPolicy(max_total_bytes=250))
+
+        self.assertEqual([i.path.name for i in report.removed], ["20240101_120000"])
+        self.assertEqual(report.freed_bytes, 100)
+
+    def test_dry_run_keeps_everything(self):
+        """ドライランでは何も削除されないことを確認."""
+        for day in range(1, 4):
+            self._make_archive(f"2024010{day}_120000")
+
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks)
+        report = collector.collect(RetentionPolicy(keep_last=1), dry_run=True)
+
+        self.assertEqual(len(report.removed), 2)
+        self.assertEqual(len(list_archives(self.rollbacks)), 3)
+
+    def test_uses_cached_size(self):
+        """BackupManager が記録したサイズがそのまま使われることを確認."""
+        source = self.tmp_path / ".bashrc"
+        source.write_text("# bashrc\n")
+
+        manager = BackupManager(rollbacks_root=self.rollbacks)
+        archive = manager.start()
+        manager.backup(source, Path(".bashrc"))
+        manager.finish()
+
+        index_path = ArchiveSizeIndex(rollbacks_root=self.rollbacks).path
+        sizes = json.loads(index_path.read_text())
+        self.assertEqual(sizes[archive.name], len("# bashrc\n"))
+
+        # キャッシュ値を書き換えると GC はその値を参照する
+        sizes[archive.name] = 12345
+        index_path.write_text(json.dumps(sizes))
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks)
+        report = collector.collect(RetentionPolicy(keep_last=1))
+        self.assertEqual(report.kept[0].size, 12345)
+
+    def test_keeps_archive_of_interrupted_install(self):
+        """未完了のジャーナルが参照するアーカイブは、ポリシーによらず残すことを確認."""
+        for day in range(1, 4):
+            self._make_archive(f"2024010{day}_120000")
+        journal = InstallJournal.create(self.tmp_path / "state" / "home-1" / JOURNAL_NAME, {})
+        journal.record_archive(self.rollbacks / "20240101_120000")
+        journal.close()
+
+        collector = RollbackGarbageCollector(
+            rollbacks_root=self.rollbacks, state_root=self.tmp_path / "state"
+        )
+        report = collector.collect(RetentionPolicy(keep_last=1))
+
+        self.assertEqual([i.path.name for i in report.removed], ["20240102_120000"])
+        names = [p.name for p in list_archives(self.rollbacks)]
+        self.assertEqual(names, ["20240103_120000", "20240101_120000"])
+
+    def test_waits_for_rollbacks_lock(self):
+        """アーカイブの作成中（rollbacks/ のロック中）は削除しないことを確認."""
+        for day in range(1, 4):
+            self._make_archive(f"2024010{day}_120000")
+
+        collector = RollbackGarbageCollector(rollbacks_root=self.rollbacks, lock_timeout=0.2)
+        with RollbacksLock(self.rollbacks), self.assertRaises(LockTimeoutError):
+            collector.collect(RetentionPolicy(keep_last=1))
+        self.assertEqual(len(list_archives(self.rollbacks)), 3)
+
+    def test_list_archives_ignores_hidden_entries(self):
+        """GC 途中のゴミ箱などドットで始まるエントリがアーカイブ扱いされないことを確認."""
+        self._make_archive("20240101_120000")
+        (self.rollbacks / ".trash-1").mkdir()
+
+        self.assertEqual([p.name for p in list_archives(self.rollbacks)], ["20240101_120000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""install.py --check の読み込むモジュール（-X importtime）と終了コードのテスト."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.benchmarks.check_startup import parse_importtime
+from scripts.install.pkg.manifest import MANIFEST_NAME, links_from_entries, write_manifest
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.state import STATE_ROOT_ENV, state_dir_name
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+INSTALL_PY = REPO_ROOT / "install.py"
+
+# --check の経路で読み込んではいけないモジュール
+FORBIDDEN_MODULES = {
+    "argparse",
+    "logging",
+    "shutil",
+    "datetime",
+    "json",
+    "pathlib",
+    "dataclasses",
+    "enum",
+    "scripts.install.pkg.backup_store",
+    "scripts.install.pkg.events",
+    "scripts.install.pkg.locking",
+    "scripts.install.pkg.logger",
+    "scripts.install.pkg.plan.builder",
+    "scripts.install.pkg.plan.executor",
+    "scripts.install.pkg.plan.journal",
+    "scripts.install.pkg.plan.model",
+    "scripts.install.pkg.policy",
+    "scripts.install.pkg.progress",
+    "scripts.install.pkg.retention",
+    "scripts.install.pkg.rollback_manager",
+    "scripts.install.pkg.ui",
+}
+
+
+class TestCheckStartup(unittest.TestCase):
+    """--check の起動経路のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        # インストール済み（変更なし）の状態とその記録を作る
+        for name in (".bashrc", ".vimrc", ".zshrc"):
+            (self.source / name).write_text(f"# {name}\n")
+            (self.dest / name).symlink_to((self.source / name).resolve())
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest).build()
+        # 状態はリポジトリの state/ ではなく一時ディレクトリに置く
+        self.state_root = self.tmp_path / "state"
+        self.state_dir = self.state_root / state_dir_name(self.dest)
+        write_manifest(self.state_dir / MANIFEST_NAME, links_from_entries(plan.entries))
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _run(self, *options: str, importtime: bool = False) -> subprocess.CompletedProcess:
+        command = [sys.executable]
+        if importtime:
+            command += ["-X", "importtime"]
+        command += [str(INSTALL_PY), "--check", "--dest-dir", str(self.dest), *options]
+        env = {
+            **os.environ,
+            "PYTHONDONTWRITEBYTECODE": "1",
+            STATE_ROOT_ENV: str(self.state_root),
+        }
+        return subprocess.run(command, capture_output=True, text=True, env=env, cwd=REPO_ROOT)
+
+    def test_converged_exits_zero_silently(self):
+        """変更がなければ何も出力せず 0 で終わることを確認."""
+        result = self._run()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "")
+        self.assertEqual(result.stderr, "")
+
+    def test_drift_exits_one(self):
+        """リンク先が変わっていれば 1 で終わることを確認."""
+        (self.dest / ".vimrc").unlink()
+        (self.dest / ".vimrc").write_text("# local\n")
+
+        result = self._run()
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(".vimrc", result.stderr)
+
+    def test_drift_detects_removed_link(self):
+        """記録したリンクが消えていれば 1 で終わることを確認."""
+        (self.dest / ".zshrc").unlink()
+
+        result = self._run()
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(".zshrc", result.stderr)
+
+    def test_source_changes_are_not_scanned(self):
+        """source/ に増えたファイルは見ず、記録したリンクだけを確認することを確認."""
+        (self.source / ".tmux.conf").write_text("# tmux\n")
+
+        result = self._run()
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_unknown_without_manifest(self):
+        """記録がなければ 3 で終わることを確認."""
+        shutil.rmtree(self.state_dir)
+
+        result = self._run()
+        self.assertEqual(result.returncode, 3)
+
+    def test_check_with_other_options_uses_full_parser(self):
+        """--check 以外のオプションがあっても同じ結果になることを確認."""
+        result = self._run("--verbose")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_check_skips_heavy_imports(self):
+        """--check の経路で重いモジュールを読み込まないことを確認."""
+        result = self._run(importtime=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        loaded = {name for name, _, _ in parse_importtime(result.stderr)}
+        self.assertEqual(loaded & FORBIDDEN_MODULES, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
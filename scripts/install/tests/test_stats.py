@@ -0,0 +1,82 @@
+"""IOStats / CountingFS（--stats のファイルシステム操作の計数）のテスト."""
+
+from __future__ import annotations
+
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.fs import MemoryFS, PosixFS
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.stats import NO_PHASE, CountingFS, IOStats
+from scripts.install.pkg.ui import UserInterface
+
+
+class TestIOStats(unittest.TestCase):
+    """フェーズごとの計数のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.memory = MemoryFS()
+        self.stats = IOStats()
+        self.fs = CountingFS(self.memory, self.stats)
+        self.source = Path("/repo/source")
+        self.home = Path("/home/me")
+        self.memory.mkdir(self.home, parents=True)
+        self.memory.add_file(self.source / ".bashrc", "# new\n")
+        self.memory.add_file(self.source / ".config" / "app.toml", "# app\n")
+        self.memory.add_file(self.home / ".bashrc", "# local\n")
+
+    def test_counts_per_phase(self):
+        """計画と実行の操作がそれぞれのフェーズに数えられることを確認."""
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.home, fs=self.fs)
+        with self.stats.phase("scan"):
+            index = builder.build_index()
+        with self.stats.phase("plan"):
+            plan = builder.build(index)
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=Path("/repo/rollbacks"), fs=self.fs),
+            fs=self.fs,
+        )
+        with self.stats.phase("execute"):
+            executor.execute(plan, dry_run=False)
+
+        counts = self.stats.counts
+        self.assertEqual(counts["scan"]["scandir"], 2)
+        self.assertNotIn("symlink", counts["plan"])
+        self.assertEqual(counts["execute"]["symlink"], 2)
+        self.assertEqual(counts["execute"]["copy"], 1)
+        # バックアップした既存ファイルの大きさ
+        self.assertEqual(counts["execute"]["copy_bytes"], len("# local\n"))
+        self.assertNotIn(NO_PHASE, counts)
+
+        total = self.stats.total()
+        self.assertEqual(total["scandir"], counts["scan"]["scandir"])
+        lines = self.stats.format_lines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("合計", lines[-1])
+
+    def test_nested_and_unphased_operations(self):
+        """入れ子のフェーズは内側に、フェーズ外の操作は NO_PHASE に数えることを確認."""
+        self.fs.exists(self.home)
+        with self.stats.phase("outer"):
+            self.fs.is_symlink(self.home)
+            with self.stats.phase("inner"):
+                self.fs.exists(self.home)
+            self.fs.exists(self.home)
+        self.assertEqual(self.stats.counts[NO_PHASE]["stat"], 1)
+        self.assertEqual(dict(self.stats.counts["outer"]), {"lstat": 1, "stat": 1})
+        self.assertEqual(dict(self.stats.counts["inner"]), {"stat": 1})
+
+    def test_disabled_by_default(self):
+        """指定しなければ計数用のラッパーを通らないことを確認."""
+        builder = PlanBuilder(source_dir=self.source, dest_dir=self.home)
+        self.assertIs(type(builder.fs), PosixFS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""テンプレートの生成 (TemplateRenderer) と RENDER アクションのテスト."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.templates import TemplateRenderer, host_variables
+from scripts.install.pkg.ui import UserInterface
+
+
+class TestTemplateRenderer(unittest.TestCase):
+    """テンプレートの生成と、生成結果のキャッシュのテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name)
+
+        self.source = self.tmp_path / "source"
+        self.dest = self.tmp_path / "dest"
+        self.state = self.tmp_path / "state"
+        self.source.mkdir()
+        self.dest.mkdir()
+
+        self.template = self.source / ".gitconfig.tmpl"
+        self.template.write_text("[user]\n  email = ${EMAIL}\n")
+        (self.source / ".vimrc").write_text("# vimrc\n")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _renderer(self, **variables: str) -> TemplateRenderer:
+        return TemplateRenderer(
+            generated_dir=self.state / "generated",
+            variables={"EMAIL": "me@example.com", **variables},
+            cache_path=self.state / "render-cache.json",
+        )
+
+    def _install(self, renderer: TemplateRenderer):
+        plan = PlanBuilder(source_dir=self.source, dest_dir=self.dest, renderer=renderer).build()
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+            renderer=renderer,
+        )
+        return plan, executor.execute(plan)
+
+    def test_render_and_link(self):
+        """テンプレートが生成され、インストール先は生成物へのリンクになることを確認."""
+        plan, report = self._install(self._renderer())
+
+        actions = {str(e.spec.relative_path): e.action for e in plan.entries}
+        self.assertEqual(actions[".gitconfig.tmpl"], ActionType.RENDER)
+        self.assertEqual(actions[".gitconfig"], ActionType.CREATE)
+        self.assertEqual(report.errors, 0)
+
+        gitconfig = self.dest / ".gitconfig"
+        self.assertEqual(gitconfig.resolve(), (self.state / "generated" / ".gitconfig").resolve())
+        self.assertEqual(gitconfig.read_text(), "[user]\n  email = me@example.com\n")
+
+    def test_unchanged_template_is_not_rendered_again(self):
+        """テンプレートも変数も変わらなければ RENDER が計画されないことを確認."""
+        self._install(self._renderer())
+
+        plan, _ = self._install(self._renderer())
+        self.assertEqual({e.action for e in plan.entries}, {ActionType.SKIP})
+
+    def test_changes_invalidate_cache(self):
+        """テンプレートか変数が変われば生成し直すことを確認."""
+        self._install(self._renderer())
+
+        plan, _ = self._install(self._renderer(EMAIL="me@corp.example.com"))
+        self.assertIn(ActionType.RENDER, {e.action for e in plan.entries})
+        self.assertIn("me@corp.example.com", (self.dest / ".gitconfig").read_text())
+
+        self.template.write_text("[user]\n  name = ${EMAIL}\n")
+        plan, _ = self._install(self._renderer(EMAIL="me@corp.example.com"))
+        self.assertIn(ActionType.RENDER, {e.action for e in plan.entries})
+        self.assertIn("name =", (self.dest / ".gitconfig").read_text())
+
+    def test_undefined_variable_blocks_link(self):
+        """未定義の変数があればエラーになり、リンクも張らないことを確認."""
+        self.template.write_text("${UNDEFINED}\n")
+
+        _, report = self._install(self._renderer())
+        self.assertEqual(report.errors, 2)
+        self.assertFalse((self.dest / ".gitconfig").is_symlink())
+        self.assertTrue((self.dest / ".vimrc").is_symlink())
+
+    def test_host_variables(self):
+        """変数ファイルの hosts はホスト名が一致したときだけ vars を上書きすることを確認."""
+        vars_file = self.tmp_path / "template-vars.json"
+        vars_file.write_text(
+            json.dumps(
+                {
+                    "vars": {"EMAIL": "me@example.com"},
+                    "hosts": {"work": {"EMAIL": "me@corp.example.com"}},
+                }
+            )
+        )
+
+        work = host_variables(vars_file, hostname="work.corp.example.com")
+        self.assertEqual(work["EMAIL"], "me@corp.example.com")
+        self.assertEqual(work["HOSTNAME"], "work")
+        self.assertEqual(host_variables(vars_file, hostname="home")["EMAIL"], "me@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
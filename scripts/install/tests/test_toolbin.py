@@ -0,0 +1,159 @@
+"""ToolLinker（~/tools のプログラムを ~/bin にリンクするリンクファーム）のテスト."""
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.install.pkg.backup_store import BackupManager
+from scripts.install.pkg.logger import ColoredLogger
+from scripts.install.pkg.plan.builder import PlanBuilder
+from scripts.install.pkg.plan.executor import PlanExecutor
+from scripts.install.pkg.plan.model import ActionType
+from scripts.install.pkg.toolbin import ToolLinker
+from scripts.install.pkg.ui import UserInterface
+
+
+def _program(path: Path, *, executable: bool = True) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755 if executable else 0o644)
+    return path
+
+
+class TestToolScan(unittest.TestCase):
+    """~/tools の走査のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.home = Path(self.test_dir.name).resolve()
+        self.tools = self.home / "tools"
+        self.linker = ToolLinker(self.home)
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def test_discovers_by_exec_bit(self):
+        """~/tools 直下と ~/tools/*/bin/ 直下の実行ファイルだけを見つけることを確認."""
+        foo = _program(self.tools / "foo")
+        bar = _program(self.tools / "pkg" / "bin" / "bar")
+        _program(self.tools / "pkg" / "bin" / "data", executable=False)
+        _program(self.tools / "pkg" / "libexec" / "helper")
+        (self.tools / "README.md").write_text("# tools\n")
+
+        scan = self.linker.scan()
+        self.assertEqual(scan.links, {"foo": foo, "bar": bar})
+        self.assertEqual((scan.conflicts, scan.problems), ({}, []))
+
+    def test_same_name_is_conflict_until_manifest_chooses(self):
+        """同じ名前は衝突として報告し、マニフェストで選べば解消することを確認."""
+        _program(self.tools / "a" / "bin" / "x")
+        chosen = _program(self.tools / "b" / "bin" / "x")
+        self.assertEqual(list(self.linker.scan().conflicts), ["x"])
+
+        (self.tools / "bin.manifest").write_text("# 選ぶ\nx = b/bin/x\n")
+        scan = self.linker.scan()
+        self.assertEqual((scan.links, scan.conflicts), ({"x": chosen}, {}))
+
+    def test_manifest_aliases_and_problems(self):
+        """マニフェストの別名と、見つからないパスの報告を確認."""
+        rg = _program(self.tools / "ripgrep-14" / "rg")
+        (self.tools / "bin.manifest").write_text("grep2 = ripgrep-14/rg\nmissing/tool\n../escape\n")
+
+        scan = self.linker.scan()
+        self.assertEqual(scan.links["grep2"], rg)
+        self.assertEqual(len(scan.problems), 2)
+        self.assertIn("bin.manifest:2", scan.problems[0])
+
+
+class TestToolLinks(unittest.TestCase):
+    """PlanBuilder / PlanExecutor からの利用のテスト."""
+
+    def setUp(self):
+        """各テストの前に実行される共通セットアップ."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.test_dir.name).resolve()
+        self.source = self.tmp_path / "source"
+        self.home = self.tmp_path / "home"
+        (self.source / "bin").mkdir(parents=True)
+        (self.source / "bin" / "README.md").write_text("# bin\n")
+        self.tool = _program(self.home / "tools" / "nvim" / "bin" / "nvim")
+
+    def tearDown(self):
+        """各テストの後に実行されるクリーンアップ."""
+        self.test_dir.cleanup()
+
+    def _plan(self, **kwargs):
+        return PlanBuilder(
+            source_dir=self.source,
+            dest_dir=self.home,
+            tool_linker=ToolLinker(self.home),
+            **kwargs,
+        ).build()
+
+    def _install(self):
+        plan = self._plan()
+        executor = PlanExecutor(
+            ui=UserInterface(force_mode=True),
+            logger=ColoredLogger(name="test"),
+            backup_manager=BackupManager(rollbacks_root=self.tmp_path / "rollbacks"),
+        )
+        return plan, executor.execute(plan)
+
+    def _entry(self, plan, name: str):
+        (entry,) = [e for e in plan.entries if e.spec.relative_path == Path("bin") / name]
+        return entry
+
+    def test_links_and_is_incremental(self):
+        """ツールへのリンクを張り、2回目はすべてスキップになることを確認."""
+        plan, report = self._install()
+        self.assertEqual(self._entry(plan, "nvim").action, ActionType.CREATE)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual((self.home / "bin" / "nvim").resolve(), self.tool)
+
+        plan, _ = self._install()
+        self.assertEqual({e.action for e in plan.entries}, {ActionType.SKIP})
+
+    def test_prunes_dead_links(self):
+        """リンク先のツールがなくなったリンクだけを削除することを確認."""
+        self._install()
+        old = _program(self.home / "tools" / "old" / "bin" / "old")
+        self._install()
+        old.unlink()
+        outside = self.home / "bin" / "outside"
+        outside.symlink_to(self.tmp_path / "missing")
+
+        plan, report = self._install()
+        self.assertEqual(self._entry(plan, "old").action, ActionType.PRUNE)
+        self.assertEqual(report.applied, 1)
+        self.assertFalse((self.home / "bin" / "old").is_symlink())
+        self.assertTrue(outside.is_symlink())
+
+    def test_existing_file_is_conflict(self):
+        """~/bin の同名の既存ファイルは上書きせずエラーにすることを確認."""
+        (self.home / "bin").mkdir()
+        (self.home / "bin" / "nvim").write_text("my own script\n")
+        self.assertEqual(self._entry(self._plan(), "nvim").action, ActionType.ERROR)
+
+    def test_relinks_previous_tool_version(self):
+        """~/tools の別のバージョンを指すリンクは確認なしで張り替えることを確認."""
+        old = _program(self.home / "tools" / "nvim-0.9" / "nvim")
+        (self.home / "tools" / "bin.manifest").write_text("nvim/bin/nvim\n")
+        (self.home / "bin").mkdir()
+        (self.home / "bin" / "nvim").symlink_to(old)
+
+        entry = self._entry(self._plan(), "nvim")
+        self.assertEqual(entry.action, ActionType.UPDATE)
+        self.assertFalse(entry.needs_confirmation)
+
+    def test_not_planned_in_copy_mode(self):
+        """コピーモードではツールのリンクを計画しないことを確認."""
+        plan = self._plan(copy_mode=True)
+        self.assertNotIn(Path("bin/nvim"), [e.spec.relative_path for e in plan.entries])
+
+
+if __name__ == "__main__":
+    unittest.main()